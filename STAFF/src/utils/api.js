@@ -63,17 +63,18 @@ export const fetchResources = async (limit = 20) => {
 export const fetchResourceById = async (id) => {
   try {
     console.log(`Fetching resource with ID: ${id}`);
-    // First fetch all resources
-    const resources = await fetchAllResources();
-    
-    // Find the resource with matching ID
-    const resource = resources.find(r => r.id === parseInt(id));
+    const response = await fetch(`${API_BASE_URL}/resources/${parseInt(id)}`, {credentials: 'include'});
     
-    if (!resource) {
+    if (response.status === 404) {
       console.error(`Resource with ID ${id} not found`);
       return null;
     }
     
+    if (!response.ok) {
+      throw new Error('Failed to fetch resource');
+    }
+    
+    const resource = await response.json();
     console.log(`Resource found:`, resource);
     return resource;
   } catch (error) {
@@ -641,16 +642,21 @@ export const updateTransaction = async (transactionId, payload) => {
   }
 };
 
-export const fetchMonthlyBorrows = async () => {
+// Pass { year } for January to December of a year, or { range } for the last N months
+export const fetchMonthlyBorrows = async ({ year, range } = {}) => {
   try {
-    const res = await fetch(`${API_BASE_URL}/stats/monthly-borrows`,{
+    const params = new URLSearchParams();
+    if (year) params.append('year', year);
+    if (range) params.append('range', range);
+    const query = params.toString() ? `?${params}` : '';
+    const res = await fetch(`${API_BASE_URL}/stats/monthly-borrows${query}`,{
       headers: {
         'Content-Type': 'application/json',
       },
       credentials: "include",
     });
     const data = await res.json();
-    return data; // Expected: [{ month: "Jan", borrows: 40 }, ...]
+    return data; // Expected: [{ year: 2025, month: "Jan", borrows: 40, by_type: {...} }, ...]
   } catch (err) {
     console.error(err);
     return [];
@@ -920,6 +926,38 @@ export const fetchLogs = async () => {
   }
 };
 
+/**
+ * Fetches one page of logs, newest first
+ * @param {Object} filters - { limit, after, staff_id, staff_email, from, to, q }
+ * @returns {Promise<Object>} - { logs: Array, next_cursor: string|null }
+ */
+export const fetchLogsPage = async (filters = {}) => {
+  try {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') params.append(key, value);
+    });
+
+    const response = await fetch(`${API_BASE_URL}/logs?${params.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      credentials: 'include',
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch logs');
+    }
+
+    const data = await response.json();
+    return { logs: data.logs, next_cursor: data.next_cursor };
+  } catch (error) {
+    console.error('Error fetching logs:', error);
+    return { logs: [], next_cursor: null };
+  }
+};
+
 export const assignPrivilegesToUserType = async (userTypeId, privileges) => {
   try {
     const res = await fetch(`${API_BASE_URL}/staff-types/${userTypeId}/privileges`, {
@@ -1178,13 +1216,43 @@ export const importResources = async (file) => {
       const errorData = await response.json();
       throw new Error(errorData.error || 'Failed to import resources');
     }
-    return await response.json();
+    // The import runs as a background job; poll it until it is done
+    // (the server may also answer with the finished job directly)
+    let job = await response.json();
+    while (!job.done) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      job = await fetchImportJob(job.job_id);
+    }
+
+    if (job.status === 'failed') {
+      throw new Error(job.message || 'Failed to import resources');
+    }
+    return job;
   } catch (error) {
     console.error('Error importing resources:', error);
     throw error;
   }
 };
 
+// Progress of a resource import job: rows_processed, rows_imported, rows_failed, rows_per_second
+export const fetchImportJob = async (jobId) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/resources/import/${jobId}`, {
+      method: 'GET',
+      credentials: 'include'
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.error || 'Failed to fetch import job');
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('Error fetching import job:', error);
+    throw error;
+  }
+};
+
 export const deleteComment = async (commentId) => {
   try {
     const response = await fetch(`${API_BASE_URL}/comments/${commentId}`, {
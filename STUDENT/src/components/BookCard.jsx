@@ -1,27 +1,32 @@
 // src/components/BookCard.jsx
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { fetchBookCover } from '../utils/api';
+import { fetchBookCover, coverThumbnailUrl } from '../utils/api';
 
-const BookCard = ({ book }) => {
-  const [thumbnail, setThumbnail] = useState(null);
+const BookCard = ({ book, cover: prefetchedCover }) => {
+  const [thumbnail, setThumbnail] = useState(prefetchedCover || null);
   // Ensure we have a valid book object
   if (!book) {
     return null;
   }
   useEffect(() => {
+    // Covers prefetched by the parent list need no request of their own
+    if (prefetchedCover !== undefined) {
+      setThumbnail(prefetchedCover);
+      return;
+    }
     const fetchCover = async () => {
       const coverData = await fetchBookCover(book.title, book.author);
-      setThumbnail(coverData.thumbnail);
+      setThumbnail(coverData?.thumbnail);
     };
     fetchCover();
-  }, [book]);
+  }, [book, prefetchedCover]);
 
   // Handle both resource and book property names
   const title = book.r_title || book.title || 'Untitled';
   const author = book.r_author || book.author || 'Unknown Author';
   const id = book.r_id || book.id;
-  const cover = thumbnail || book.image_url || '/assets/books/blue_cpp.png';
+  const cover = (thumbnail || book.image_url) ? coverThumbnailUrl(id, 240, book.cover_version) : '/assets/books/blue_cpp.png';
 
   return (
     <Link to={`/book/${id}`} className="book-card-link">
@@ -30,6 +35,7 @@ const BookCard = ({ book }) => {
           <img 
             src={cover} 
             alt={title} 
+            loading="lazy"
             onError={(e) => {
               e.target.src = '/default-book-cover.jpg';
             }}
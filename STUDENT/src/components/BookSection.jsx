@@ -2,12 +2,13 @@ import React, { useState, useEffect } from 'react';
 import { FaArrowRight } from 'react-icons/fa';
 import BookCard from './BookCard';
 import { useParams, useNavigate, Link } from 'react-router-dom';
-import { fetchAllResources } from '../utils/api';
+import { fetchAllResources, fetchBookCovers } from '../utils/api';
 
 const BookSection = ({ title, showViewAll = true, number = 5 }) => {
     const { id } = useParams();
     const navigate = useNavigate();
     const [books, setBooks] = useState([]);
+    const [covers, setCovers] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -16,7 +17,9 @@ const BookSection = ({ title, showViewAll = true, number = 5 }) => {
             try {
                 const resources = await fetchAllResources();
                 // Limit the number of books displayed
-                setBooks(resources.slice(0, number));
+                const shown = resources.slice(0, number);
+                setCovers(await fetchBookCovers(shown.map((book) => book.id)));
+                setBooks(shown);
                 setLoading(false);
             } catch (err) {
                 setError(err.message);
@@ -51,7 +54,7 @@ const BookSection = ({ title, showViewAll = true, number = 5 }) => {
             </div>
             <div className="books-grid">
                 {books.map((book) => (
-                    <BookCard key={book.r_id} book={book} />
+                    <BookCard key={book.id} book={book} cover={covers ? covers[book.id] ?? null : undefined} />
                 ))}
             </div>
         </div>
@@ -25,6 +25,32 @@ export const fetchAllResources = async () => {
   }
 };
 
+/**
+ * Fetches one page of resources using cursor pagination
+ * @param {Object} options - { limit, after, sort, type, status }
+ * @returns {Promise<Object>} - { resources: Array, next_cursor: string|null }
+ */
+export const fetchResourcesPage = async ({ limit = 20, after, sort, type, status } = {}) => {
+  try {
+    const params = new URLSearchParams({ limit });
+    if (after) params.append('after', after);
+    if (sort) params.append('sort', sort);
+    if (type !== undefined && type !== null) params.append('type', type);
+    if (status !== undefined && status !== null) params.append('status', status);
+
+    const response = await fetch(`${API_BASE_URL}/resources?${params.toString()}`);
+    
+    if (!response.ok) {
+      throw new Error('Failed to fetch resources page');
+    }
+    
+    return await response.json();
+  } catch (error) {
+    console.error('Error fetching resources page:', error);
+    return { resources: [], next_cursor: null };
+  }
+};
+
 export const fetchLoginAttempts = async (email) => {
   try {
     const response = await fetch(`${API_BASE_URL}/student/login-attempts?email=${encodeURIComponent(email)}`);
@@ -78,6 +104,32 @@ export const fetchBookCover = async (title, author) => {
   }
 };
 
+// Resized cover served (and cached) by the backend, much lighter than the original image.
+// Pass the resource's cover_version so the browser can keep the image until the cover changes.
+export const coverThumbnailUrl = (resourceId, width = 240, version) =>
+  `${API_BASE_URL}/covers/${resourceId}?w=${width}${version ? `&v=${version}` : ''}`;
+
+// Prefetch the covers of a list of resources in one request: { [resourceId]: thumbnail }
+export const fetchBookCovers = async (resourceIds) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/book-covers`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ resource_ids: resourceIds }),
+    });
+    if (!response.ok) {
+      throw new Error('Failed to fetch book covers');
+    }
+    const data = await response.json();
+    return data.covers;
+  } catch (error) {
+    console.error('Error fetching book covers:', error);
+    return null;
+  }
+};
+
 
 export const fetchUserTypes = async () => {
   try {
@@ -155,17 +207,18 @@ export const fetchResources = async (limit = 20) => {
 export const fetchResourceById = async (id) => {
   try {
     console.log(`Fetching resource with ID: ${id}`);
-    // First fetch all resources
-    const resources = await fetchAllResources();
+    const response = await fetch(`${API_BASE_URL}/resources/${parseInt(id)}`);
     
-    // Find the resource with matching ID
-    const resource = resources.find(r => r.id === parseInt(id));
-    
-    if (!resource) {
+    if (response.status === 404) {
       console.error(`Resource with ID ${id} not found`);
       return null;
     }
     
+    if (!response.ok) {
+      throw new Error('Failed to fetch resource');
+    }
+    
+    const resource = await response.json();
     console.log(`Resource found:`, resource);
     return resource;
   } catch (error) {
@@ -213,26 +266,12 @@ export const fetchLatestResources = async (limit = 5) => {
  */
 export const fetchPopularResources = async (limit = 5) => {
   try {
-    const resources = await fetchAllResources();
-    console.log(`Fetched ${resources.length} resources for popular books`);
-    
-    console.log(resources);
-    if (!resources || resources.length === 0) {
-      console.error('No resources found in the database for popular books');
-      return [];
+    // Ranked by recent borrows on the server (decayed counts), no need to load the catalog
+    const response = await fetch(`${API_BASE_URL}/resources/trending?limit=${limit}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch popular resources');
     }
-    
-    // For demo purposes, we'll just use status to determine popularity
-    const sortedResources = resources
-      .sort((a, b) => {
-        const statusA = a.status || 0;
-        const statusB = b.status || 0;
-        return statusB - statusA; // Descending order
-      })
-      .slice(0, limit);
-    
-    console.log(`Returning ${sortedResources.length} popular books from database`);
-    return sortedResources;
+    return await response.json();
   } catch (error) {
     console.error('Error fetching popular resources:', error);
     return [];
@@ -251,26 +290,13 @@ export const searchResources = async (query) => {
       return [];
     }
     
-    const resources = await fetchAllResources();
+    const response = await fetch(`${API_BASE_URL}/resources/search?q=${encodeURIComponent(query.trim())}`);
     
-    if (!resources || resources.length === 0) {
-      return [];
+    if (!response.ok) {
+      throw new Error('Failed to search resources');
     }
     
-    const normalizedQuery = query.toLowerCase().trim();
-    
-    // Search through title, author and observation fields
-    return resources.filter(resource => {
-      const title = (resource.title || '').toLowerCase();
-      const author = (resource.author || '').toLowerCase();
-      const observation = (resource.observation || '').toLowerCase();
-      const isbn = String(resource.isbn || '').toLowerCase();
-      
-      return title.includes(normalizedQuery) || 
-             author.includes(normalizedQuery) || 
-             observation.includes(normalizedQuery) ||
-             isbn.includes(normalizedQuery);
-    });
+    return await response.json();
   } catch (error) {
     console.error('Error searching resources:', error);
     return [];
@@ -0,0 +1,322 @@
+"""
+In-process rollups of the Reservation table for the statistics endpoints.
+
+MonthlyBorrowCounts keeps a count per (year, month, res_type). It is built
+once from the reservation history (one paged scan) and then kept current by
+create_reservation / update_reservation / delete_reservation and the overdue
+marking, so /api/stats/monthly-borrows costs O(months) instead of a scan of
+every reservation ever made.
+
+TopBorrowed keeps the K resources with the most borrows (r_num_of_borrows)
+and TrendingBorrows exponentially decayed borrow counts over a sliding
+window; both are updated on every borrow in create_reservation.
+
+Each process keeps its own copy; it is rebuilt from the database every
+`max_age` seconds so writes made by another process show up eventually.
+"""
+
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def month_key(res_date):
+    """
+    (year, month) of an ISO date / date-time string, or None.
+    """
+    if not res_date or len(res_date) < 7:
+        return None
+    try:
+        return int(res_date[:4]), int(res_date[5:7])
+    except ValueError:
+        return None
+
+
+def last_months(count, now=None):
+    """
+    The `count` (year, month) pairs ending with the current month, oldest first.
+    """
+    now = now or time.localtime()
+    year, month = now.tm_year, now.tm_mon
+    months = []
+    for _ in range(count):
+        months.append((year, month))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return months[::-1]
+
+
+class _MaintainedView:
+    """
+    State loaded from the database once and then updated by the write paths.
+    Subclasses implement _load() (read the database), _install(state) and
+    _apply(*event) (one write, applied idempotently).
+    """
+
+    def __init__(self, max_age):
+        """
+        :param max_age: Seconds before the state is reloaded from the database.
+        """
+        self.max_age = max_age
+        self._built_at = None
+        self._journal = None  # Writes made while a reload is reading the database
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def _fresh(self):
+        return self._built_at is not None and time.monotonic() - self._built_at < self.max_age
+
+    def _ensure_built(self):
+        if self._fresh():
+            return
+        with self._build_lock:
+            if self._fresh():
+                return
+            with self._lock:
+                self._journal = []
+            try:
+                state = self._load()
+            except Exception:
+                with self._lock:
+                    self._journal = None
+                raise
+            with self._lock:
+                journal, self._journal = self._journal, None
+                self._install(state)
+                # Writes that happened during the load may or may not be in it; replaying is idempotent
+                for event in journal:
+                    self._apply(*event)
+                self._built_at = time.monotonic()
+
+    def _write(self, *event):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(event)
+            self._apply(*event)
+
+    def invalidate(self):
+        """
+        Reload from the database on the next read.
+        """
+        self._built_at = None
+
+
+class MonthlyBorrowCounts(_MaintainedView):
+    """
+    Reservation counts per (year, month, res_type).
+    """
+
+    def __init__(self, load_reservations, max_age=3600):
+        """
+        :param load_reservations: Callable yielding every reservation as a dict with
+                                  res_id, res_date and res_type.
+        :param max_age: Seconds before the counts are rebuilt from the database.
+        """
+        super().__init__(max_age)
+        self.load_reservations = load_reservations
+        self._months = {}  # (year, month) -> Counter of res_type
+        self._keys = {}  # res_id -> (year, month, res_type)
+
+    def _load(self):
+        months, keys = {}, {}
+        for reservation in self.load_reservations():
+            month = month_key(reservation.get('res_date'))
+            if month is not None:
+                keys[reservation['res_id']] = (*month, reservation.get('res_type'))
+                months.setdefault(month, Counter())[reservation.get('res_type')] += 1
+        return months, keys
+
+    def _install(self, state):
+        self._months, self._keys = state
+
+    def _apply(self, res_id, key):
+        old = self._keys.pop(res_id, None)
+        if old is not None:
+            counts = self._months[old[:2]]
+            counts[old[2]] -= 1
+            if not counts[old[2]]:
+                del counts[old[2]]
+        if key is not None:
+            self._keys[res_id] = key
+            self._months.setdefault(key[:2], Counter())[key[2]] += 1
+
+    def record(self, res_id, res_date, res_type):
+        """
+        A reservation was created or changed.
+        """
+        month = month_key(res_date)
+        self._write(res_id, (*month, res_type) if month else None)
+
+    def retype(self, res_ids, res_type):
+        """
+        Reservations changed type without changing date (e.g. marked late).
+        """
+        with self._lock:
+            keys = {res_id: self._keys.get(res_id) for res_id in res_ids}
+        for res_id, key in keys.items():
+            if key is not None:
+                self._write(res_id, (key[0], key[1], res_type))
+
+    def remove(self, res_id):
+        """
+        A reservation was deleted.
+        """
+        self._write(res_id, None)
+
+    def monthly(self, months, res_types=None):
+        """
+        Counts for the given (year, month) pairs.
+        :param res_types: Reservation types counted in `borrows` (all types when None).
+        :return: List of {'year', 'month' (short name), 'borrows', 'by_type'} in the given order.
+        """
+        self._ensure_built()
+        with self._lock:
+            by_month = [dict(self._months.get(month, ())) for month in months]
+        result = []
+        for (year, month), by_type in zip(months, by_month):
+            borrows = sum(count for res_type, count in by_type.items()
+                          if res_types is None or res_type in res_types)
+            result.append({
+                'year': year,
+                'month': MONTH_NAMES[month - 1],
+                'borrows': borrows,
+                'by_type': {str(res_type): count for res_type, count in by_type.items()}
+            })
+        return result
+
+
+class TopBorrowed(_MaintainedView):
+    """
+    The `capacity` resources with the highest r_num_of_borrows.
+
+    Borrow counts only grow, so a resource enters the top as soon as its count
+    passes the smallest one kept; only deleting a resource needs a reload.
+    """
+
+    def __init__(self, load_top, capacity=50, max_age=3600):
+        """
+        :param load_top: Callable(n) returning the n most borrowed Resource rows
+                         (with r_id and r_num_of_borrows).
+        """
+        super().__init__(max_age)
+        self.load_top = load_top
+        self.capacity = capacity
+        self._rows = {}  # r_id -> Resource row
+
+    def _load(self):
+        return {row['r_id']: row for row in self.load_top(self.capacity)}
+
+    def _install(self, state):
+        self._rows = state
+
+    def _apply(self, row):
+        rows = self._rows
+        if row['r_id'] not in rows and len(rows) >= self.capacity:
+            smallest = min(rows.values(), key=lambda r: r['r_num_of_borrows'] or 0)
+            if (row['r_num_of_borrows'] or 0) <= (smallest['r_num_of_borrows'] or 0):
+                return
+            del rows[smallest['r_id']]
+        rows[row['r_id']] = row
+
+    def update(self, row):
+        """
+        A resource was borrowed; `row` carries its new r_num_of_borrows.
+        """
+        self._write(dict(row))
+
+    def remove(self, resource_id):
+        """
+        A resource was deleted: its place is refilled from the database on the next read.
+        """
+        with self._lock:
+            self._rows.pop(resource_id, None)
+        self.invalidate()
+
+    def top(self, limit):
+        """
+        Most borrowed resources, at most min(limit, capacity).
+        """
+        self._ensure_built()
+        with self._lock:
+            rows = list(self._rows.values())
+        rows.sort(key=lambda r: (-(r['r_num_of_borrows'] or 0), r['r_id']))
+        return rows[:limit]
+
+
+def date_timestamp(res_date):
+    """
+    POSIX timestamp of the date part of an ISO date / date-time string (midnight UTC), or None.
+    """
+    try:
+        return datetime.fromisoformat(res_date[:10]).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class TrendingBorrows(_MaintainedView):
+    """
+    Borrow counts that decay with a half-life, over the last `window_days` days.
+
+    Each borrow weighs 2 ** ((t - origin) / half_life); multiplying by
+    2 ** ((origin - now) / half_life) gives its decayed weight now. That factor
+    is the same for every resource, so the ranking needs no per-read decay step.
+    Borrows that fall out of the window are dropped when the view is rebuilt.
+    """
+
+    def __init__(self, load_borrows, half_life_days=7, window_days=30, max_age=3600):
+        """
+        :param load_borrows: Callable(since) yielding the borrows made on or after the ISO
+                             date `since`, as dicts with res_id, res_resource_id and res_date.
+        """
+        super().__init__(max_age)
+        self.load_borrows = load_borrows
+        self.half_life = half_life_days * 86400
+        self.window_days = window_days
+        self._origin = time.time()
+        self._weights = Counter()  # r_id -> weight relative to _origin
+        self._seen = set()  # res_ids already counted
+
+    def _load(self):
+        since = datetime.now(timezone.utc) - timedelta(days=self.window_days)
+        origin = since.timestamp()
+        weights, seen = Counter(), set()
+        for borrow in self.load_borrows(since.date().isoformat()):
+            timestamp = date_timestamp(borrow.get('res_date'))
+            if timestamp is not None and borrow['res_id'] not in seen:
+                seen.add(borrow['res_id'])
+                weights[borrow['res_resource_id']] += 2 ** ((timestamp - origin) / self.half_life)
+        return origin, weights, seen
+
+    def _install(self, state):
+        self._origin, self._weights, self._seen = state
+
+    def _apply(self, res_id, resource_id, timestamp):
+        if res_id in self._seen:
+            return
+        self._seen.add(res_id)
+        self._weights[resource_id] += 2 ** ((timestamp - self._origin) / self.half_life)
+
+    def record(self, res_id, resource_id, res_date):
+        """
+        A resource was borrowed.
+        """
+        timestamp = date_timestamp(res_date)
+        if timestamp is not None:
+            self._write(res_id, resource_id, timestamp)
+
+    def top(self, limit):
+        """
+        [(r_id, score)] of the `limit` resources with the highest decayed borrow count,
+        where score is the number of borrows weighted by age (one borrow now = 1.0).
+        """
+        self._ensure_built()
+        with self._lock:
+            best = heapq.nlargest(limit, self._weights.items(), key=lambda item: item[1])
+            decay = 2 ** ((self._origin - time.time()) / self.half_life)
+        return [(resource_id, weight * decay) for resource_id, weight in best]
@@ -0,0 +1,94 @@
+"""
+Small in-process caches shared by the data-access functions.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded least-recently-used cache.
+    With a `ttl`, entries also expire `ttl` seconds after they were set, so data
+    written by another process is picked up eventually.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl if self.ttl is not None else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire after `ttl` seconds.
+    Entries are filled on demand by a loader and can be invalidated explicitly
+    by the functions that write the underlying data.
+    """
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._data = {}
+        self._generation = {}
+        self._cleared = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() to (re)fill it when
+        it is missing or expired. Exceptions from the loader are not cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            generation = (self._generation.get(key, 0), self._cleared)
+        value = loader()
+        with self._lock:
+            # Don't store a value that was loaded before an invalidation
+            if (self._generation.get(key, 0), self._cleared) == generation:
+                self._data[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation[key] = self._generation.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            # Also covers keys that are being loaded and not stored yet
+            self._cleared += 1
+            self._data.clear()
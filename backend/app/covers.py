@@ -0,0 +1,258 @@
+"""
+Book cover lookup through the Google Books API.
+
+Answers are kept in a local SQLite cache keyed by the normalized ISBN, or
+title and author when there is no ISBN, so a title is looked up upstream once
+and not on every page view. "No cover" answers are cached too (for a shorter
+time); upstream errors are not, so the next request retries.
+
+Lookups share one pooled requests.Session with connect/read timeouts, and
+concurrent lookups of the same key wait for a single upstream request.
+resolve_many() prefetches the covers of a whole list of resources.
+
+The API URL comes from GOOGLE_BOOKS_API_URL, so the resolver can be pointed
+at a local HTTP stub.
+"""
+
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GOOGLE_BOOKS_API_URL = 'https://www.googleapis.com/books/v1/volumes'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS covers (
+    key TEXT PRIMARY KEY,
+    thumbnail TEXT,
+    fetched_at REAL NOT NULL
+);
+"""
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _normalize_text(value):
+    return _WHITESPACE_RE.sub(' ', str(value or '')).strip().lower()
+
+
+def normalize_isbn(value):
+    """
+    ISBN digits (and a final X) without dashes or spaces; '' when there is none.
+    """
+    return re.sub(r'[^0-9X]', '', str(value or '').upper())
+
+
+def cover_key(title=None, author=None, isbn=None):
+    """
+    Cache key of a lookup: the ISBN when there is one, otherwise title and author.
+    Returns None when there is nothing to look up.
+    """
+    isbn = normalize_isbn(isbn)
+    if isbn:
+        return f'isbn:{isbn}'
+    title = _normalize_text(title)
+    if not title:
+        return None
+    return f'title:{title}|{_normalize_text(author)}'
+
+
+class CoverCache:
+    """
+    SQLite table of key -> thumbnail URL (None for "no cover").
+    """
+
+    def __init__(self, path, ttl=30 * 24 * 3600, negative_ttl=24 * 3600):
+        """
+        :param ttl: Seconds a found cover is kept.
+        :param negative_ttl: Seconds a "no cover" answer is kept.
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return (found, thumbnail); found is False when the key is missing or expired.
+        """
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT thumbnail, fetched_at FROM covers WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading the cover cache: {e}")
+            return False, None
+        if row is None:
+            return False, None
+        thumbnail, fetched_at = row
+        ttl = self.ttl if thumbnail else self.negative_ttl
+        if time.time() - fetched_at > ttl:
+            return False, None
+        return True, thumbnail
+
+    def put(self, key, thumbnail):
+        try:
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO covers (key, thumbnail, fetched_at) VALUES (?, ?, ?)",
+                                 (key, thumbnail, time.time()))
+        except sqlite3.Error as e:
+            print(f"Error writing the cover cache: {e}")
+
+
+class NullCoverCache:
+    """
+    Cache that keeps nothing, used when the SQLite file cannot be opened:
+    every lookup goes upstream, as before the cache existed.
+    """
+
+    def get(self, key):
+        return False, None
+
+    def put(self, key, thumbnail):
+        pass
+
+
+class _Lookup:
+    """
+    An upstream lookup in progress; other threads asking for the same key wait on it.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.thumbnail = None
+
+
+class CoverResolver:
+    """
+    Resolves cover thumbnails: cache first, then one coalesced upstream request per key.
+    """
+
+    def __init__(self, cache, api_url=GOOGLE_BOOKS_API_URL, api_key=None, timeout=(3, 5),
+                 pool_size=10, session=None):
+        """
+        :param cache: CoverCache.
+        :param timeout: (connect, read) timeout in seconds for upstream requests.
+        :param pool_size: Pooled connections kept to the API, also the prefetch concurrency.
+        :param session: requests.Session to use (a pooled one is created by default).
+        """
+        self.cache = cache
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    def resolve(self, title=None, author=None, isbn=None):
+        """
+        Thumbnail URL of a book, or None when there is no cover (or the API failed).
+        """
+        key = cover_key(title, author, isbn)
+        if key is None:
+            return None
+        found, thumbnail = self.cache.get(key)
+        if found:
+            self.stats['hits'] += 1
+            return thumbnail
+
+        with self._lock:
+            lookup = self._inflight.get(key)
+            owner = lookup is None
+            if owner:
+                lookup = self._inflight[key] = _Lookup()
+        if not owner:
+            self.stats['coalesced'] += 1
+            lookup.done.wait(sum(self.timeout))
+            return lookup.thumbnail
+
+        self.stats['misses'] += 1
+        try:
+            lookup.thumbnail = self._fetch(title, author, normalize_isbn(isbn))
+            self.cache.put(key, lookup.thumbnail)
+        except (requests.RequestException, ValueError) as e:
+            self.stats['errors'] += 1
+            print(f"Error fetching book cover for {key}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            lookup.done.set()
+        return lookup.thumbnail
+
+    def resolve_many(self, books):
+        """
+        Resolve several books concurrently.
+        :param books: List of dicts with title, author and isbn keys.
+        :return: List of thumbnails, in the same order.
+        """
+        if not books:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(books))) as executor:
+            return list(executor.map(
+                lambda book: self.resolve(book.get('title'), book.get('author'), book.get('isbn')), books
+            ))
+
+    def _fetch(self, title, author, isbn):
+        if isbn:
+            query = f'isbn:{isbn}'
+        else:
+            query = f'intitle:{title.strip()}'
+            if author and author.strip():
+                query += f' inauthor:{author.strip()}'
+        params = {'q': query, 'maxResults': 1}
+        if self.api_key:
+            params['key'] = self.api_key
+        response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        items = response.json().get('items') or []
+        if not items:
+            return None
+        return items[0].get('volumeInfo', {}).get('imageLinks', {}).get('thumbnail')
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_cover_resolver():
+    """
+    Return the process-wide cover resolver, created on first use.
+
+    Reads COVER_CACHE_PATH (SQLite file, default cover_cache.sqlite3 in the
+    system temporary directory, the only writable place on Vercel),
+    GOOGLE_BOOKS_API_URL, GOOGLE_BOOKS_API_KEY (optional), COVER_TIMEOUT (read
+    timeout in seconds, default 5) and COVER_POOL_SIZE (default 10).
+    Lookups are not cached when the cache file cannot be opened.
+    """
+    global _resolver
+    if _resolver is not None:
+        return _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            path = os.getenv('COVER_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'cover_cache.sqlite3'))
+            try:
+                cache = CoverCache(path)
+            except sqlite3.Error as e:
+                print(f"Error opening the cover cache {path}, covers will not be cached: {e}")
+                cache = NullCoverCache()
+            _resolver = CoverResolver(
+                cache,
+                api_url=os.getenv('GOOGLE_BOOKS_API_URL', GOOGLE_BOOKS_API_URL),
+                api_key=os.getenv('GOOGLE_BOOKS_API_KEY'),
+                timeout=(3, float(os.getenv('COVER_TIMEOUT', 5))),
+                pool_size=int(os.getenv('COVER_POOL_SIZE', 10)),
+            )
+    return _resolver
@@ -1,9 +1,25 @@
 import os
 from supabase import create_client
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import calendar
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.search_index import catalog_index
+from app.pagination import encode_cursor, decode_cursor
+from app.projection import select_columns, project
+from app.cache import LRUCache, TTLCache
+from app.log_writer import create_log_writer
+from app.overdue_scheduler import OverdueScheduler
+from app.import_jobs import ImportJobManager
+from app.borrow_stats import MonthlyBorrowCounts, TopBorrowed, TrendingBorrows, last_months
+from app.resource_import import normalize_identifier
+from app.thumbnails import cover_version
+from app import due_dates
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import re
+import time
 
 
 # Load environment variables
@@ -14,30 +30,108 @@ supabase_url = os.environ.get("SUPABASE_URL")
 supabase_key = os.environ.get("SUPABASE_KEY")
 supabase = create_client(supabase_url, supabase_key)
 
-def get_readers_by_status(status=1):
+# Reference tables (user/resource/staff types, privileges) change maybe once a term.
+# They are cached process-wide and invalidated by the functions that write them.
+REFERENCE_TTL = 600
+reference_cache = TTLCache(ttl=REFERENCE_TTL)
+
+# Dashboard counters (get_stats); invalidated by every insert/delete on User, Resource and Reservation
+STATS_TTL = int(os.getenv('STATS_TTL', 30))
+stats_cache = TTLCache(ttl=STATS_TTL)
+
+def _user_type_rows():
+    """
+    User_type rows keyed by ut_id.
+    """
+    return reference_cache.get_or_load('user_types', lambda: {
+        row['ut_id']: row for row in
+        supabase.from_("User_type").select("ut_id, ut_name, ut_borrow, ut_books, ut_renew").execute().data
+    })
+
+def _resource_type_rows():
+    """
+    Resource_type rows keyed by rt_id.
+    """
+    return reference_cache.get_or_load('resource_types', lambda: {
+        row['rt_id']: row for row in
+        supabase.from_("Resource_type").select("rt_id, rt_name, rt_borrow").execute().data
+    })
+
+def _staff_type_rows():
+    """
+    Staff_type rows keyed by st_id.
+    """
+    return reference_cache.get_or_load('staff_types', lambda: {
+        row['st_id']: row for row in
+        supabase.from_("Staff_type").select("st_id, st_name").execute().data
+    })
+
+def _privilege_ids():
+    """
+    Privilege IDs keyed by privilege name.
+    """
+    return reference_cache.get_or_load('privileges', lambda: {
+        row['name']: row['id'] for row in
+        supabase.table('privileges').select('id, name').execute().data
+    })
+
+def _staff_type_privileges():
+    """
+    Privilege names granted to each staff type, keyed by staff_type_id.
+    """
+    def load():
+        granted = {}
+        rows = supabase.from_('staff_type_privileges').select('staff_type_id, privileges(name)').execute().data
+        for row in rows:
+            if row.get('privileges'):
+                granted.setdefault(row['staff_type_id'], []).append(row['privileges']['name'])
+        return granted
+    return reference_cache.get_or_load('staff_type_privileges', load)
+
+def get_user_type_policy(user_type_id):
+    """
+    Return the cached User_type row (ut_borrow, ut_renew, ut_books) for a type ID, or None.
+    """
+    if user_type_id is None:
+        return None
+    return _user_type_rows().get(user_type_id)
+
+def get_resource_type_policy(resource_type_id):
+    """
+    Return the cached Resource_type row (rt_borrow) for a type ID, or None.
+    """
+    if resource_type_id is None:
+        return None
+    return _resource_type_rows().get(resource_type_id)
+
+# Public reader keys -> (Supabase columns, getter on the raw row)
+READER_FIELDS = {
+    'id': (['u_id'], lambda u: u['u_id']),
+    'name': (['u_name'], lambda u: u['u_name']),
+    'email': (['u_email'], lambda u: u['u_email']),
+    'birthDate': (['u_birthDate'], lambda u: u['u_birthDate']),
+    'phone': (['u_phone'], lambda u: u['u_phone']),
+    'type': (['User_type (ut_name)'], lambda u: u['User_type']['ut_name'] if u.get('User_type') else 'No type'),
+    'status': (['u_status'], lambda u: u['u_status']),
+    'rfid': (['u_rfid'], lambda u: u['u_rfid']),
+}
+
+def get_readers_by_status(status=1, fields=None):
     """
     Retrieve readers with the given u_status from the database.
     u_status: 1 for verified, 0 for pending
+    fields: Optional list of public keys to return (see READER_FIELDS).
     """
     try:
         user_response = (
             supabase
             .from_("User")
-            .select("u_id, u_name, u_email, u_birthDate, u_phone, User_type (ut_name), u_status, u_rfid")
+            .select(select_columns(READER_FIELDS, fields))
             .eq("u_status", status)
             .execute()
         )
         
-        readers = [{
-            'id': user['u_id'],
-            'name': user['u_name'],
-            'email': user['u_email'],
-            'birthDate': user['u_birthDate'],
-            'phone': user['u_phone'],
-            'type': user['User_type']['ut_name'] if user.get('User_type') else 'No type',
-            'status': user['u_status'],
-            'rfid': user['u_rfid']
-        } for user in user_response.data]
+        readers = [project(READER_FIELDS, user, fields) for user in user_response.data]
         
         return readers
 
@@ -92,17 +186,14 @@ def update_reader_status_in_db(reader_id, new_status):
 
 def get_user_types():
     try:
-        # Then get all users with that user_type
-        user_response = supabase.from_("User_type").select("ut_id, ut_name, ut_borrow, ut_books, ut_renew").execute()
-        
-        # Transform the response to a simpler format
+        # Transform the cached rows to a simpler format
         types = [{
             'id': user_type['ut_id'],
             'name': user_type['ut_name'],
             'borrow': user_type['ut_borrow'],
             'ut_books': user_type['ut_books'],
             'ut_renew': user_type['ut_renew']
-        } for user_type in user_response.data]
+        } for user_type in _user_type_rows().values()]
         
         return types
     except Exception as e:
@@ -118,6 +209,7 @@ def add_user_type(user_email, user_type_data):
         response = supabase.from_("User_type").insert(user_type_data).execute()
 
         if response.data:
+            reference_cache.invalidate('user_types')
             add_log(user_email,f"added a user type: {user_type_data['ut_name']}")
             return {'success': True, 'user_type': response.data[0]}
             
@@ -136,6 +228,7 @@ def delete_user_type(user_type_id):
         response = supabase.from_("User_type").delete().eq("ut_id", user_type_id).execute()
 
         if response.data:
+            reference_cache.invalidate('user_types')
             return {'success': True, 'message': 'User type deleted successfully'}
         else:
             return {'success': False, 'error': 'User type not found or could not be deleted'}
@@ -153,6 +246,7 @@ def update_user_type(user_type_id, user_type_data):
         response = supabase.from_("User_type").update(user_type_data).eq("ut_id", user_type_id).execute()
 
         if response.data:
+            reference_cache.invalidate('user_types')
             return {
                 'success': True,
                 'user_type': response.data[0],
@@ -199,6 +293,7 @@ def add_reader(user_email,reader_data):
         response = supabase.from_("User").insert(reader_data).execute()
 
         if response.data:
+            stats_cache.invalidate('dashboard')
             add_log(user_email, f"added a new reader with name: {reader_data['u_name']}")
             return {'success': True, 'reader': response.data[0]}
         else:
@@ -217,6 +312,7 @@ def delete_reader(user_email,reader_id):
         response = supabase.from_("User").delete().eq("u_id", reader_id).execute()
 
         if response.data:
+            stats_cache.invalidate('dashboard')
             add_log(user_email, f"deleted a reader with ID: {reader_id}")
             return {'success': True, 'message': 'Reader deleted successfully'}
         else:
@@ -226,35 +322,36 @@ def delete_reader(user_email,reader_id):
         return {'success': False, 'error': str(e)}
 
 
-def get_transactions():
+TRANSACTION_TYPE_MAP = {
+    1: "Borrow",
+    2: "Return",
+    3: "Renew_1",
+    4: "Late",
+    5: "Renew_2"
+}
+
+# Public transaction keys -> (Supabase columns, getter on the raw row)
+TRANSACTION_FIELDS = {
+    'id': (['res_id'], lambda t: t['res_id']),
+    'borrower_name': (['User(u_id, u_name)'], lambda t: t['User']['u_name']),
+    'title': (['Resource(r_id, r_title)'], lambda t: t['Resource']['r_title']),
+    'type': (['res_type'], lambda t: TRANSACTION_TYPE_MAP.get(t['res_type'])),
+    'date': (['res_date'], lambda t: t['res_date']),
+}
+
+def get_transactions(fields=None):
     """
     Retrieve all reservations (transactions) from the database, 
     joining with User and Resource tables for borrower name and book title.
+    :param fields: Optional list of public keys to return (see TRANSACTION_FIELDS).
     """
     try:
-        response = supabase.from_("Reservation").select(
-            "res_id, res_type, res_date,"
-            "User(u_id, u_name), "
-            "Resource(r_id, r_title)"
-        ).execute()
+        response = supabase.from_("Reservation").select(select_columns(TRANSACTION_FIELDS, fields)).execute()
 
         if not response.data:
             return []
         
-        type_map = {
-            1: "Borrow",
-            2: "Return",
-            3: "Renew_1",
-            4: "Late",
-            5: "Renew_2"
-        }
-        transactions = [{
-            'id': transaction['res_id'],
-            'borrower_name': transaction['User']['u_name'],  # Using email as identifier
-            'title': transaction['Resource']['r_title'],
-            'type': type_map.get(transaction['res_type']),  # Assuming all are reservations
-            'date': transaction['res_date']  # Add actual date if available
-        } for transaction in response.data]
+        transactions = [project(TRANSACTION_FIELDS, transaction, fields) for transaction in response.data]
 
         return transactions
     except Exception as e:
@@ -276,59 +373,251 @@ def get_transactions_by_user(user_id):
         print(f"Error fetching transactions: {e}")
         return []
 
-def get_resources():
+RESOURCE_STATUS_MAP = {
+    0:"Not Available",
+    1:"Available",
+}
+
+# Public resource keys -> (Supabase columns, getter on the raw row)
+RESOURCE_FIELDS = {
+    'id': (['r_id'], lambda r: r['r_id']),
+    'inventoryNum': (['r_inventoryNum'], lambda r: r['r_inventoryNum']),
+    'title': (['r_title'], lambda r: r['r_title']),
+    'author': (['r_author'], lambda r: r['r_author']),
+    'editor': (['r_editor'], lambda r: r['r_editor']),
+    'edition': (['r_edition'], lambda r: r['r_edition']),
+    'resume': (['r_resume'], lambda r: r['r_resume']),
+    'isbn': (['r_ISBN'], lambda r: r['r_ISBN']),
+    'price': (['r_price'], lambda r: r['r_price']),
+    'cote': (['r_cote'], lambda r: r['r_cote']),
+    'receivingDate': (['r_receivingDate'], lambda r: r['r_receivingDate']),
+    'status': (['r_status'], lambda r: r['r_status']),
+    'numofborrows': (['r_num_of_borrows'], lambda r: r['r_num_of_borrows']),
+    'observation': (['r_observation'], lambda r: r['r_observation']),
+    'type': (['r_type'], lambda r: r['r_type']),
+    'description': (['r_description'], lambda r: r['r_description']),
+    'type_name': (['Resource_type(rt_name)'], lambda r: r['Resource_type']['rt_name'] if r.get('Resource_type') else None),
+    'status_name': (['r_status'], lambda r: RESOURCE_STATUS_MAP.get(r['r_status'], "Unknown")),
+    'image_url': (['cover_url'], lambda r: r['cover_url']),
+    'rfid': (['r_rfid'], lambda r: r['r_rfid']),
+    'cover_version': (['cover_url', 'r_title', 'r_author', 'r_ISBN'],
+                      lambda r: cover_version(r['cover_url'], r['r_title'], r['r_author'], r['r_ISBN'])),
+}
+
+RESOURCE_COLUMNS = select_columns(RESOURCE_FIELDS)
+
+# Default spreadsheet columns: cover_version only matters to the cover URLs
+RESOURCE_EXPORT_FIELDS = [key for key in RESOURCE_FIELDS if key != 'cover_version']
+
+def format_resource(resource, fields=None):
+    """
+    Turn a raw Resource row (joined with Resource_type) into the API resource dict.
+    :param fields: Optional list of public keys to build (all keys when None).
+    """
+    return project(RESOURCE_FIELDS, resource, fields)
+
+def get_resources(fields=None):
     """
     Retrieve all resources (books) from the database.
+    :param fields: Optional list of public keys to return (see RESOURCE_FIELDS).
     """
     try:
-        response = supabase.from_("Resource").select(
-            "r_id,r_inventoryNum, r_title, r_author, r_editor, r_ISBN, r_price, r_cote,r_edition, r_resume, r_receivingDate, r_status, r_num_of_borrows,r_observation,r_description,r_type,cover_url,r_rfid, "
-            "Resource_type(rt_name)"
-        ).execute()
-        status_map = {
-            0:"Not Available",
-            1:"Available",
-        }
-        resources = [{
-            'id': resource['r_id'],
-            'inventoryNum': resource['r_inventoryNum'],
-            'title': resource['r_title'],
-            'author': resource['r_author'],
-            'editor': resource['r_editor'],
-            'edition': resource['r_edition'],
-            'resume': resource['r_resume'],
-            'isbn': resource['r_ISBN'],
-            'price': resource['r_price'],
-            'cote': resource['r_cote'],
-            'receivingDate': resource['r_receivingDate'],
-            'status': resource['r_status'],
-            'numofborrows': resource['r_num_of_borrows'],
-            'observation': resource['r_observation'],
-            'type': resource['r_type'],
-            'description': resource['r_description'],
-            'type_name': resource['Resource_type']['rt_name'] if resource.get('Resource_type') else None,
-            'status_name': status_map.get(resource['r_status'], "Unknown"),
-            'image_url': resource['cover_url'],
-            'rfid': resource['r_rfid']
-        } for resource in response.data]
+        response = supabase.from_("Resource").select(select_columns(RESOURCE_FIELDS, fields)).execute()
+        resources = [format_resource(resource, fields) for resource in response.data]
 
         return resources
     except Exception as e:
         print(f"Error fetching resources: {e}")
         return []
 
+RESOURCE_SORT_KEYS = {
+    'id': 'r_id',
+    'receivingDate': 'r_receivingDate',
+}
+
+_CURSOR_DATE_RE = re.compile(r"^[0-9T:.+\- Z]+$")
+
+def get_resources_page(limit=50, after=None, sort='id', resource_type=None, status=None, fields=None):
+    """
+    Retrieve one page of resources using keyset pagination.
+    The filters, ordering and page boundary are pushed down into the Supabase query
+    so only `limit` rows are ever read.
+    :param limit: Number of resources per page.
+    :param after: Cursor returned as `next_cursor` by the previous page (None for the first page).
+    :param sort: 'id' or 'receivingDate', prefixed with '-' for descending order.
+    :param resource_type: Optional r_type to filter on.
+    :param status: Optional r_status to filter on.
+    :param fields: Optional list of public keys to return (see RESOURCE_FIELDS).
+    :return: {'resources': [...], 'next_cursor': str or None}
+    Raises ValueError for an unknown sort key or a malformed cursor.
+    """
+    desc = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in RESOURCE_SORT_KEYS:
+        raise ValueError(f"Invalid sort: {sort}. Expected one of: {', '.join(RESOURCE_SORT_KEYS)}")
+    column = RESOURCE_SORT_KEYS[sort_key]
+
+    # The keyset columns are always read so the next cursor can be built
+    query = supabase.from_("Resource").select(select_columns(RESOURCE_FIELDS, fields, required=['r_id', column]))
+    if resource_type is not None:
+        query = query.eq("r_type", resource_type)
+    if status is not None:
+        query = query.eq("r_status", status)
+
+    if after:
+        cursor = decode_cursor(after)
+        last_id = cursor.get('id')
+        if not isinstance(last_id, int) or cursor.get('sort') != sort:
+            raise ValueError('Invalid cursor')
+        op = 'lt' if desc else 'gt'
+        if column == 'r_id':
+            query = query.filter("r_id", op, last_id)
+        else:
+            last_date = cursor.get('date')
+            if last_date is not None and not (isinstance(last_date, str) and _CURSOR_DATE_RE.match(last_date)):
+                raise ValueError('Invalid cursor')
+            # Postgres sorts NULL dates last in ascending order and first in descending order
+            if last_date is None:
+                condition = f"and(r_receivingDate.is.null,r_id.{op}.{last_id})"
+                if desc:
+                    condition += ",r_receivingDate.not.is.null"
+            else:
+                condition = f"r_receivingDate.{op}.{last_date},and(r_receivingDate.eq.{last_date},r_id.{op}.{last_id})"
+                if not desc:
+                    condition += ",r_receivingDate.is.null"
+            query = query.or_(condition)
+
+    if column != 'r_id':
+        query = query.order(column, desc=desc)
+    query = query.order("r_id", desc=desc)
+
+    # Read one extra row to know whether another page follows
+    response = query.limit(limit + 1).execute()
+    rows = response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        cursor = {'sort': sort, 'id': last['r_id']}
+        if column != 'r_id':
+            cursor['date'] = last['r_receivingDate']
+        next_cursor = encode_cursor(cursor)
+
+    return {
+        'resources': [format_resource(resource, fields) for resource in rows],
+        'next_cursor': next_cursor
+    }
+
+# Single-resource reads (book detail pages), keyed by r_id
+RESOURCE_CACHE_TTL = int(os.getenv('RESOURCE_CACHE_TTL', 60))
+resource_cache = LRUCache(maxsize=2048, ttl=RESOURCE_CACHE_TTL)
+
+def _resource_key(resource_id):
+    try:
+        return int(resource_id)
+    except (TypeError, ValueError):
+        return resource_id
+
+def get_resource_by_id(resource_id):
+    """
+    Retrieve a single resource (book) by its ID, in the same shape as get_resources.
+    Served from an LRU cache whose entries expire after RESOURCE_CACHE_TTL seconds.
+    Returns None if the resource does not exist; database errors are raised, so
+    callers can tell an outage from a missing resource.
+    """
+    key = _resource_key(resource_id)
+    cached = resource_cache.get(key)
+    if cached is not None:
+        return cached
+    response = supabase.from_("Resource").select(RESOURCE_COLUMNS).eq("r_id", key).limit(1).execute()
+    if not response.data:
+        return None
+    resource = format_resource(response.data[0])
+    resource_cache.set(key, resource)
+    return resource
+
+def get_resources_by_ids(resource_ids, fields=None):
+    """
+    Retrieve several resources in one query, in the get_resources format.
+    :param fields: Optional list of public keys to return (see RESOURCE_FIELDS).
+    """
+    if not resource_ids:
+        return []
+    try:
+        response = supabase.from_("Resource") \
+            .select(select_columns(RESOURCE_FIELDS, fields, required=['r_id'])) \
+            .in_("r_id", list(resource_ids)) \
+            .execute()
+        return [format_resource(resource, fields) for resource in response.data]
+    except Exception as e:
+        print(f"Error fetching resources {resource_ids}: {e}")
+        return []
+
+CATALOG_INDEX_MAX_AGE = int(os.getenv('CATALOG_INDEX_MAX_AGE', 900))
+_catalog_index_lock = threading.Lock()
+
+def _ensure_catalog_index():
+    """
+    Build the catalog search index (one keyset-paged load of the catalog) the first
+    time it is needed, and rebuild it every CATALOG_INDEX_MAX_AGE seconds so resources
+    written by other processes show up. Only one thread loads; while a rebuild runs,
+    other searches keep using the previous index.
+    """
+    if catalog_index.fresh(CATALOG_INDEX_MAX_AGE):
+        return
+    if not _catalog_index_lock.acquire(blocking=not catalog_index.built):
+        return
+    try:
+        if catalog_index.fresh(CATALOG_INDEX_MAX_AGE):
+            return
+        count = catalog_index.build(lambda: list(_iter_keyset("Resource", RESOURCE_COLUMNS, "r_id")),
+                                    format_resource)
+        print(f"Catalog search index built with {count} resources")
+    finally:
+        _catalog_index_lock.release()
+
+def _refresh_indexed_resource(resource_id):
+    """
+    Re-read one resource and update it in the search index (if the index is built).
+    """
+    if not catalog_index.active:
+        return
+    try:
+        response = supabase.from_("Resource").select(RESOURCE_COLUMNS).eq("r_id", resource_id).execute()
+        if response.data:
+            catalog_index.upsert(response.data[0], format_resource(response.data[0]))
+        else:
+            catalog_index.remove(resource_id)
+    except Exception as e:
+        # A stale index is worse than a missing one, rebuild on next search
+        print(f"Error refreshing search index for resource {resource_id}: {e}")
+        catalog_index.reset()
+
+def search_resources(query, limit=20):
+    """
+    Full-text search over the catalog, ranked by relevance.
+    :param query: Free text matched against title, author, editor, ISBN, cote and description.
+    :param limit: Maximum number of resources to return.
+    """
+    try:
+        _ensure_catalog_index()
+        return catalog_index.search(query, limit)
+    except Exception as e:
+        print(f"Error searching resources: {e}")
+        return []
+
 def get_resource_types():
     """
     Retrieve all resource types from the database.
     """
     try:
-        response = supabase.from_("Resource_type").select("rt_id, rt_name, rt_borrow").execute()
-
         resource_types = [{
             'id': resource_type['rt_id'],
             'name': resource_type['rt_name'],
             'borrow': resource_type['rt_borrow']
-        } for resource_type in response.data]
+        } for resource_type in _resource_type_rows().values()]
 
         return resource_types
     except Exception as e:
@@ -345,6 +634,7 @@ def add_resource_type(user_email,resource_type_data):
         response = supabase.from_("Resource_type").insert(resource_type_data).execute()
 
         if response.data:
+            reference_cache.invalidate('resource_types')
             add_log(user_email, f"added a resource type: {resource_type_data['rt_name']}")
             return {'success': True, 'resource_type': response.data[0]}
         else:
@@ -362,6 +652,10 @@ def delete_resource_type(user_email,resource_type_id):
         response = supabase.from_("Resource_type").delete().eq("rt_id", resource_type_id).execute()
 
         if response.data:
+            reference_cache.invalidate('resource_types')
+            # Resources embed the type name, drop their cached copies
+            resource_cache.clear()
+            catalog_index.reset()
             add_log(user_email, f"deleted a resource type with id: {resource_type_id}")
             return {'success': True, 'message': 'Resource type deleted successfully'}
         else:
@@ -380,6 +674,10 @@ def update_resource_type(user_email,resource_type_id, resource_type_data):
         response = supabase.from_("Resource_type").update(resource_type_data).eq("rt_id", resource_type_id).execute()
 
         if response.data:
+            reference_cache.invalidate('resource_types')
+            # Resources embed the type name, drop their cached copies
+            resource_cache.clear()
+            catalog_index.reset()
             add_log(user_email, f"updated a resource type, id: {resource_type_id}, data: {resource_type_data['rt_name'], resource_type_data['rt_borrow']}")
             return {
                 'success': True,
@@ -413,7 +711,9 @@ def add_resource(user_email,resource_data):
         response = supabase.from_("Resource").insert(resource_data).execute()
 
         if response.data:
+            stats_cache.invalidate('dashboard')
             add_log(user_email, f"added a resource with: title: {resource_data['r_title']}, author: {resource_data['r_author']}")
+            _refresh_indexed_resource(response.data[0]['r_id'])
             return {
                 'success': True,
                 'resource': response.data[0]
@@ -430,6 +730,81 @@ def add_resource(user_email,resource_data):
             'error': str(e)
         }
 
+def insert_resource_rows(rows, chunk_size=500):
+    """
+    Insert many resources with multi-row inserts of `chunk_size` rows each.
+    If a chunk is rejected, its rows are inserted one by one so the failing rows
+    can be reported.
+    :param rows: List of (row_number, resource_data) pairs; row_number is only used for error reports.
+    :return: (imported count, [(row_number, message), ...])
+    """
+    imported = 0
+    errors = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            response = supabase.from_("Resource").insert([data for _, data in chunk]).execute()
+            imported += len(response.data or [])
+            continue
+        except Exception as e:
+            print(f"Error inserting resources chunk at row {chunk[0][0]}: {e}")
+        for row_number, data in chunk:
+            try:
+                response = supabase.from_("Resource").insert(data).execute()
+                if response.data:
+                    imported += 1
+                else:
+                    errors.append((row_number, 'Failed to add resource'))
+            except Exception as e:
+                errors.append((row_number, str(e)))
+    return imported, errors
+
+def get_resource_identifiers(page_size=1000):
+    """
+    Load every inventory number, ISBN and RFID of the catalog, for duplicate detection on import.
+    :return: Dict of identifier field -> set of normalized values (see resource_import.IDENTIFIERS).
+    """
+    identifiers = {'inventoryNum': set(), 'ISBN': set(), 'rfid': set()}
+    columns = {'inventoryNum': 'r_inventoryNum', 'ISBN': 'r_ISBN', 'rfid': 'r_rfid'}
+    start = 0
+    while True:
+        response = supabase.from_("Resource").select("r_id, r_inventoryNum, r_ISBN, r_rfid") \
+            .order("r_id").range(start, start + page_size - 1).execute()
+        for resource in response.data or []:
+            for field, column in columns.items():
+                value = normalize_identifier(field, resource.get(column))
+                if value:
+                    identifiers[field].add(value)
+        if not response.data or len(response.data) < page_size:
+            return identifiers
+        start += page_size
+
+def record_resource_import(user_email, imported):
+    """
+    Bookkeeping after resources were bulk inserted: one summary log entry,
+    a dashboard counter reset and a search index reset (rebuilt on the next search).
+    """
+    if imported:
+        stats_cache.invalidate('dashboard')
+        catalog_index.reset()
+        add_log(user_email, f"imported {imported} resources")
+
+resource_import_jobs = ImportJobManager(
+    insert_resource_rows, record_resource_import, get_resource_identifiers,
+    max_running=int(os.getenv('RESOURCE_IMPORT_MAX_JOBS', 2)),
+    inline=bool(os.getenv('VERCEL'))
+)
+
+def add_resources_bulk(user_email, rows, chunk_size=500):
+    """
+    Insert many resources in chunks and write a single summary log entry.
+    :param rows: List of (row_number, resource_data) pairs; row_number is only used for error reports.
+    :return: {'success': bool, 'imported': int, 'errors': [(row_number, message), ...]}
+    """
+    imported, errors = insert_resource_rows(rows, chunk_size)
+    record_resource_import(user_email, imported)
+    return {'success': not errors, 'imported': imported, 'errors': errors}
+
 def delete_resource(user_email,resource_id):
     """
     Delete a resource from the database by its ID.
@@ -439,7 +814,11 @@ def delete_resource(user_email,resource_id):
         response = supabase.from_("Resource").delete().eq("r_id", resource_id).execute()
 
         if response.data:
+            stats_cache.invalidate('dashboard')
             add_log(user_email, f"deleted a resource with id: {resource_id}")
+            resource_cache.invalidate(_resource_key(resource_id))
+            catalog_index.remove(_resource_key(resource_id))
+            most_borrowed.remove(_resource_key(resource_id))
             return {'success': True, 'message': 'Resource deleted successfully'}
         else:
             return {'success': False, 'error': 'Resource not found or could not be deleted'}
@@ -464,6 +843,9 @@ def update_resource(user_email,resource_id, resource_data):
 
         if response.data:
             add_log(user_email, f"updated a resource with id: {resource_id}, title: {resource_data['r_title']}, author: {resource_data['r_author']}, ISBN: {resource_data['r_ISBN']}")
+            resource_cache.invalidate(_resource_key(resource_id))
+            _refresh_indexed_resource(resource_id)
+            most_borrowed.invalidate()
             return {
                 'success': True,
                 'resource': response.data[0],
@@ -488,8 +870,9 @@ def create_reservation(user_email, user_id, resource_id, transaction_type):
     """
     try:
         # Check reservation/borrow limit
-        user_type = supabase.from_("User").select("u_type, User_type(ut_books)").eq("u_id", user_id).single().execute().data
-        ut_books = user_type['User_type']['ut_books'] if user_type and user_type.get('User_type') else 0
+        user = supabase.from_("User").select("u_type").eq("u_id", user_id).single().execute().data
+        user_type = get_user_type_policy(user['u_type']) if user else None
+        ut_books = user_type['ut_books'] if user_type else 0
         active_statuses = [1, 3, 5]  # Borrow, Renew_1, Renew_2
         active_count = supabase.from_("Reservation").select("res_id").eq("res_user_id", user_id).in_("res_type", active_statuses).execute()
         if ut_books and active_count.data and len(active_count.data) >= ut_books:
@@ -536,11 +919,22 @@ def create_reservation(user_email, user_id, resource_id, transaction_type):
         if response.data:
             # Log reservation creation
             add_log(user_email, f"created a transaction of type: {transaction_type} for resource ID: {resource_id} for user ID: {user_id}")
+            stats_cache.invalidate('dashboard')
+            monthly_borrow_counts.record(new_res_id, response.data[0].get('res_date'), response.data[0].get('res_type'))
+
+            if reservation_data['res_type'] in ACTIVE_LOAN_TYPES:
+                try:
+                    resource = get_resource_by_id(resource_id)
+                except Exception as e:
+                    print(f"Error fetching resource {resource_id} for the loan schedule: {e}")
+                    resource = None
+                _schedule_loan(new_res_id, reservation_data['res_type'], reservation_data['res_date'],
+                               user['u_type'] if user else None, resource['type'] if resource else None)
 
             # If the transaction type is "Borrow", increment the r_num_of_borrows in the Resource table
             if transaction_type == "Borrow":
                 # Fetch the current number of borrows for the resource
-                resource_data = supabase.from_("Resource").select("r_num_of_borrows").eq('r_id', resource_id).execute()
+                resource_data = supabase.from_("Resource").select(MOST_BORROWED_COLUMNS).eq('r_id', resource_id).execute()
 
                 if resource_data.data and len(resource_data.data) > 0:
                     current_borrows = resource_data.data[0]['r_num_of_borrows']
@@ -554,6 +948,10 @@ def create_reservation(user_email, user_id, resource_id, transaction_type):
                     ).eq('r_id', resource_id).execute()
 
                     if update_response.data:
+                        resource_cache.invalidate(_resource_key(resource_id))
+                        catalog_index.patch(_resource_key(resource_id), {'numofborrows': updated_borrows})
+                        most_borrowed.update({**resource_data.data[0], 'r_num_of_borrows': updated_borrows})
+                        trending_borrows.record(new_res_id, _resource_key(resource_id), reservation_data['res_date'])
                         return {
                             'success': True,
                             'reservation': response.data[0],
@@ -593,6 +991,12 @@ def update_resource_status(resource_id, status):
     """
     try:
         response = supabase.from_("Resource").update({'r_status': status}).eq('r_id', resource_id).execute()
+        if response.data:
+            resource_cache.invalidate(_resource_key(resource_id))
+            catalog_index.patch(_resource_key(resource_id), {
+                'status': status,
+                'status_name': RESOURCE_STATUS_MAP.get(status, "Unknown")
+            })
         return response.data
     except Exception as e:
         print(f"Error updating resource status: {e}")
@@ -697,6 +1101,7 @@ def sign_up(email, password, name=None):
         response = supabase.from_("Staff").insert(new_user).execute()
 
         if response.data:
+            staff_id_cache.clear()
             return {
                 'success': True,
                 'user': {
@@ -738,6 +1143,7 @@ def sign_up_student(email, password, name, birthdate, phone, user_type):
         response = supabase.from_("User").insert(new_user).execute()
 
         if response.data:
+            stats_cache.invalidate('dashboard')
             return {
                 'success': True,
                 'user': {
@@ -847,18 +1253,7 @@ def update_user_by_email(email, fields):
 
         if response.data:  # If there's returned data, update was successful
             # Successful update, now insert a log
-            try:
-                user = get_user_by_email(email)
-                if user:
-                    supabase \
-                        .from_("Logs") \
-                        .insert({
-                            's_id': user['id'],
-                            'message': f"User {user['email']} updated their profile."
-                        }) \
-                        .execute()
-            except Exception as log_error:
-                print(f"Failed to insert update log: {log_error}")
+            add_log(email, f"User {email} updated their profile.")
 
             return True
         else:
@@ -1067,12 +1462,10 @@ def get_staff_types():
     Retrieve all staff types from the database.
     """
     try:
-        response = supabase.from_("Staff_type").select("st_id, st_name").execute()
-
         resource_types = [{
             'id': resource_type['st_id'],
             'name': resource_type['st_name']
-        } for resource_type in response.data]
+        } for resource_type in _staff_type_rows().values()]
 
         return resource_types
     except Exception as e:
@@ -1089,6 +1482,7 @@ def add_staff_type(user_email, staff_type_data):
         response = supabase.from_("Staff_type").insert(staff_type_data).execute()
 
         if response.data:
+            reference_cache.invalidate('staff_types')
             # Log the staff type creation
             type_name = staff_type_data.get('st_name', 'Unknown')
             add_log(user_email, f"added a new staff type: {type_name}")
@@ -1141,6 +1535,8 @@ def delete_staff_type(user_email, staff_type_id):
 
         # In Supabase, a successful delete operation returns an empty array
         if response.data is not None:
+            reference_cache.invalidate('staff_types')
+            reference_cache.invalidate('staff_type_privileges')
             # Log the deletion
             add_log(user_email, f"deleted staff type with ID: {staff_type_id}")
             return {'success': True, 'message': 'Staff type deleted successfully'}
@@ -1161,6 +1557,7 @@ def update_staff_type(staff_type_id, staff_type_data):
         response = supabase.from_("Staff_type").update(staff_type_data).eq("st_id", staff_type_id).execute()
 
         if response.data:
+            reference_cache.invalidate('staff_types')
             return {
                 'success': True,
                 'staff_type': response.data[0],
@@ -1220,6 +1617,7 @@ def add_staff_member(user_email, data):
         response = supabase.from_("Staff").insert(new_staff).execute()
 
         if response.data:
+            staff_id_cache.clear()
             # Log the staff creation
             add_log(user_email, f"added a new staff member with email: {email}")
             
@@ -1241,7 +1639,7 @@ def add_staff_member(user_email, data):
     
 def get_total_users():
     try:
-        response = supabase.from_("User").select("u_id", count="exact").execute()
+        response = supabase.from_("User").select("u_id", count="exact").limit(1).execute()
         return response.count or 0
     except Exception as e:
         print(f"Error getting total users: {e}")
@@ -1249,7 +1647,7 @@ def get_total_users():
 
 def get_total_resources():
     try:
-        response = supabase.from_("Resource").select("r_id", count="exact").execute()
+        response = supabase.from_("Resource").select("r_id", count="exact").limit(1).execute()
         return response.count or 0
     except Exception as e:
         print(f"Error getting total resources: {e}")
@@ -1257,22 +1655,27 @@ def get_total_resources():
 
 def get_total_reservations():
     try:
-        response = supabase.from_("Reservation").select("res_id", count="exact").execute()
+        response = supabase.from_("Reservation").select("res_id", count="exact").limit(1).execute()
         return response.count or 0
     except Exception as e:
         print(f"Error getting total reservations: {e}")
         return 0
 
+def _current_month_range():
+    now = datetime.now()
+    first_day = now.replace(day=1).date().isoformat()
+    last_day = now.replace(day=calendar.monthrange(now.year, now.month)[1]).date().isoformat()
+    return first_day, last_day
+
 def get_monthly_reservations():
     try:
-        now = datetime.now()
-        first_day = now.replace(day=1).date().isoformat()
-        last_day = now.replace(day=calendar.monthrange(now.year, now.month)[1]).date().isoformat()
+        first_day, last_day = _current_month_range()
 
         response = supabase.from_("Reservation") \
             .select("res_id", count="exact") \
             .gte("res_date", first_day) \
             .lte("res_date", last_day) \
+            .limit(1) \
             .execute()
 
         return response.count or 0
@@ -1280,14 +1683,56 @@ def get_monthly_reservations():
         print(f"Error getting monthly reservations: {e}")
         return 0
 
+# Set once the dashboard_stats function turned out to be missing, so it is not tried on every load
+_stats_rpc_available = True
+
+def _load_stats():
+    """
+    Compute the dashboard counters in one database call when the dashboard_stats
+    function exists, otherwise with the four count queries run concurrently.
+
+    The function can be created in Supabase with:
+
+        create or replace function dashboard_stats(first_day date, last_day date)
+        returns json language sql stable as $$
+          select json_build_object(
+            'total_users', (select count(*) from "User"),
+            'total_resources', (select count(*) from "Resource"),
+            'total_reservations', (select count(*) from "Reservation"),
+            'monthly_borrows', (select count(*) from "Reservation"
+                                where res_date >= first_day and res_date <= last_day)
+          )
+        $$;
+    """
+    global _stats_rpc_available
+    if _stats_rpc_available:
+        first_day, last_day = _current_month_range()
+        try:
+            response = supabase.rpc("dashboard_stats", {'first_day': first_day, 'last_day': last_day}).execute()
+            if response.data:
+                return response.data
+        except Exception as e:
+            print(f"dashboard_stats RPC failed, counting with separate queries: {e}")
+            # PGRST202: the function does not exist
+            if 'PGRST202' in str(e):
+                _stats_rpc_available = False
+
+    loaders = {
+        'total_users': get_total_users,
+        'total_resources': get_total_resources,
+        'total_reservations': get_total_reservations,
+        'monthly_borrows': get_monthly_reservations
+    }
+    with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+        futures = {key: executor.submit(loader) for key, loader in loaders.items()}
+        return {key: future.result() for key, future in futures.items()}
+
 def get_stats():
+    """
+    Dashboard counters, cached for STATS_TTL seconds.
+    """
     try:
-        return {
-            'total_users': get_total_users(),
-            'total_resources': get_total_resources(),
-            'total_reservations': get_total_reservations(),
-            'monthly_borrows': get_monthly_reservations()
-        }
+        return stats_cache.get_or_load('dashboard', _load_stats)
     except Exception as e:
         print(f"Error fetching dashboard stats: {e}")
         return {
@@ -1297,24 +1742,32 @@ def get_stats():
             'monthly_borrows': 0
         }
     
-def get_monthly_borrows():
-    try:
-        response = supabase.table("Reservation").select("res_id, res_date").execute()
+# Rebuild interval of the in-process borrow statistics (see app/borrow_stats.py)
+BORROW_STATS_MAX_AGE = int(os.getenv('BORROW_STATS_MAX_AGE', 3600))
 
-        borrow_counts = {}
+# Reservations per (year, month, res_type), built from history on first use and kept
+# current by the reservation write paths below
+monthly_borrow_counts = MonthlyBorrowCounts(
+    lambda: _iter_keyset("Reservation", "res_id, res_date, res_type", "res_id"),
+    max_age=BORROW_STATS_MAX_AGE
+)
 
-        for row in response.data:
-            res_date = row.get("res_date")
-            if res_date:
-                date = datetime.fromisoformat(res_date.replace("Z", "+00:00"))
-                month = date.strftime("%b")  # 'Jan', 'Feb', ...
-                borrow_counts[month] = borrow_counts.get(month, 0) + 1
-
-        # Return months in calendar order
-        ordered_months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        return [{"month": m, "borrows": borrow_counts.get(m, 0)} for m in ordered_months]
+MAX_MONTHLY_RANGE = 120
 
+def get_monthly_borrows(year=None, months=None):
+    """
+    Number of reservations per month, from the in-process rollup.
+    :param year: Calendar year to report, January to December (default: the current year).
+    :param months: Instead of a year, the last `months` months up to the current one.
+    :return: [{'year', 'month' ('Jan', ...), 'borrows', 'by_type': {res_type: count}}, ...]
+    """
+    if months is not None:
+        periods = last_months(months)
+    else:
+        year = year or datetime.now().year
+        periods = [(year, month) for month in range(1, 13)]
+    try:
+        return monthly_borrow_counts.monthly(periods)
     except Exception as e:
         print("Database error in get_monthly_borrows:", e)
         return []
@@ -1331,8 +1784,8 @@ def update_reservation(reservation_id, user_id=None, resource_id=None, transacti
         # Fetch current reservation
         current = supabase.from_("Reservation").select(
             "res_type, res_user_id, res_resource_id, res_date, "
-            "User(u_email, u_name), "
-            "Resource(r_title)"
+            "User(u_email, u_name, u_type), "
+            "Resource(r_title, r_type)"
         ).eq("res_id", reservation_id).single().execute().data
         
         if not current:
@@ -1399,50 +1852,35 @@ def update_reservation(reservation_id, user_id=None, resource_id=None, transacti
         if response.data:
             # If the transaction is being marked as late, send an email notification
             if transaction_type == "Late":
-                # Get user type info for due date calculation
-                user = supabase.from_("User").select("u_type, User_type(ut_borrow, ut_renew)").eq("u_id", current['res_user_id']).single().execute().data
-                ut_borrow = user['User_type']['ut_borrow'] if user and user.get('User_type') else 0
-                ut_renew = user['User_type']['ut_renew'] if user and user.get('User_type') else 0
-                
-                # Get resource type info
-                resource = supabase.from_("Resource").select("r_type, Resource_type(rt_borrow)").eq("r_id", current['res_resource_id']).single().execute().data
-                rt_borrow = resource.get('Resource_type', {}).get('rt_borrow') if resource else None
-                borrow_limit = rt_borrow if rt_borrow and rt_borrow > 1 else ut_borrow
-                
-                # Calculate due date
-                from datetime import datetime, timedelta
-                borrow_date = datetime.fromisoformat(current['res_date'].replace('Z', '+00:00'))
-                now = datetime.now(borrow_date.tzinfo)
-                
-                if current_type == 1:  # Borrow
-                    due_date = borrow_date + timedelta(days=borrow_limit)
-                elif current_type == 3:  # Renew_1
-                    due_date = borrow_date + timedelta(days=borrow_limit + ut_renew)
-                elif current_type == 5:  # Renew_2
-                    due_date = borrow_date + timedelta(days=borrow_limit + 2 * ut_renew)
-                else:
-                    due_date = borrow_date + timedelta(days=borrow_limit)
+                due_date = loan_due_date(
+                    current['res_date'], current_type,
+                    current['User']['u_type'] if current.get('User') else None,
+                    current['Resource']['r_type'] if current.get('Resource') else None
+                )
+                now = datetime.now(timezone.utc)
                 
                 # Calculate days late
                 days_late = (now - due_date).days
                 
-                # Send email notification
-                from app.email_service import send_late_return_email
-                email_result = send_late_return_email(
-                    current['User']['u_email'],
-                    current['User']['u_name'],
-                    current['Resource']['r_title'],
-                    due_date.strftime('%Y-%m-%d'),
-                    days_late
-                )
+                # Queue the email notification in the outbox
+                from app.email_service import queue_late_notices
+                email_result = queue_late_notices([{
+                    'email': current['User']['u_email'],
+                    'name': current['User']['u_name'],
+                    'book_title': current['Resource']['r_title'],
+                    'due_date': due_date.strftime('%Y-%m-%d'),
+                    'days_late': days_late
+                }])
                 
-                if email_result['success']:
-                    print(f"Email notification sent to {current['User']['u_email']}")
-                    # Log the email sending
-                    add_log("system", f"sent late return notice to {current['User']['u_email']} for book '{current['Resource']['r_title']}'")
-                else:
-                    print(f"Failed to send email notification to {current['User']['u_email']}: {email_result['message']}")
+                if not email_result['success']:
+                    print(f"Failed to queue email notification to {current['User']['u_email']}: {email_result['message']}")
             
+            _schedule_loan(reservation_id, new_type, current['res_date'],
+                           current['User']['u_type'] if current.get('User') else None,
+                           current['Resource']['r_type'] if current.get('Resource') else None)
+            monthly_borrow_counts.record(reservation_id, response.data[0].get('res_date'),
+                                         response.data[0].get('res_type'))
+
             # Log the update
             add_log(current['User']['u_email'], f"updated transaction {reservation_id} to type: {transaction_type}")
             return {
@@ -1472,6 +1910,9 @@ def delete_reservation(reservation_id):
         
         # If data is returned, it means the deletion was successful
         if response.data:
+            overdue_scheduler.cancel(reservation_id)
+            stats_cache.invalidate('dashboard')
+            monthly_borrow_counts.remove(reservation_id)
             return {
                 'success': True,
                 'message': 'Reservation deleted successfully'
@@ -1534,27 +1975,54 @@ def update_reader(user_email,reader_id, reader_data):
         return {'success': False, 'error': str(e)}
 
 
+MOST_BORROWED_COLUMNS = "r_id, r_author, r_title, r_cote, r_type, r_num_of_borrows"
+MAX_TOP_RESOURCES = int(os.getenv('MOST_BORROWED_CAPACITY', 50))
+
+# Top of the all-time borrow counts, updated on every Borrow in create_reservation
+most_borrowed = TopBorrowed(
+    lambda n: supabase.table("Resource").select(MOST_BORROWED_COLUMNS)
+        .order("r_num_of_borrows", desc=True).limit(n).execute().data or [],
+    capacity=MAX_TOP_RESOURCES,
+    max_age=BORROW_STATS_MAX_AGE
+)
+
+# Recent borrows with exponential decay. A loan's row changes type when it is renewed
+# or late, so every loan type counts when the view is rebuilt from history.
+trending_borrows = TrendingBorrows(
+    lambda since: _iter_keyset("Reservation", "res_id, res_resource_id, res_date", "res_id",
+                               filters=lambda query: query.gte("res_date", since).in_("res_type", [1, 3, 4, 5])),
+    half_life_days=float(os.getenv('TRENDING_HALF_LIFE_DAYS', 7)),
+    window_days=int(os.getenv('TRENDING_WINDOW_DAYS', 30)),
+    max_age=BORROW_STATS_MAX_AGE
+)
+
 def get_most_borrowed_resources(limit=5):
     """
-    Fetch the most borrowed resources from the Resource table.
+    Fetch the most borrowed resources, from the in-memory top list.
     Returns a list of dictionaries with resource info sorted by r_num_of_borrows.
     """
     try:
-        response = supabase.table("Resource") \
-            .select("r_id,r_author ,r_title, r_cote, r_type, r_num_of_borrows") \
-            .order("r_num_of_borrows", desc=True) \
-            .limit(limit) \
-            .execute()
-        print(response)
-
-        if response.data:
-            return response.data
-        else:
-            return []
+        return most_borrowed.top(limit)
     except Exception as e:
         print("Error fetching most borrowed resources:", e)
         return []
 
+def get_trending_resources(limit=5):
+    """
+    Resources borrowed the most recently (decayed borrow counts over the last
+    TRENDING_WINDOW_DAYS days), in the get_resources format plus a `trend_score`.
+    Falls back to the all-time most borrowed when nothing was borrowed in the window.
+    """
+    try:
+        ranked = trending_borrows.top(limit)
+        if not ranked:
+            ranked = [(row['r_id'], 0) for row in most_borrowed.top(limit)]
+        resources = {resource['id']: resource for resource in get_resources_by_ids([r_id for r_id, _ in ranked])}
+        return [{**resources[r_id], 'trend_score': round(score, 3)} for r_id, score in ranked if r_id in resources]
+    except Exception as e:
+        print("Error fetching trending resources:", e)
+        return []
+
 def get_reader_history(user_id):
     """
     Get the complete history of a reader including reservations, borrows, and returns.
@@ -1563,22 +2031,23 @@ def get_reader_history(user_id):
     try:
         print(f"\nFetching history for user_id: {user_id}")
         user_response = supabase.from_("User") \
-            .select("u_type, User_type(ut_borrow, ut_renew)") \
+            .select("u_type") \
             .eq("u_id", user_id) \
             .single() \
             .execute()
-        user_type_borrow_limit = user_response.data.get('User_type', {}).get('ut_borrow') if user_response.data else None
-        user_type_renew = user_response.data.get('User_type', {}).get('ut_renew') if user_response.data else None
+        user_type_id = user_response.data.get('u_type') if user_response.data else None
         response = supabase.from_("History") \
             .select("h_id, h_resource_id, h_user_id, h_status, h_date, h_res_id, " \
-                   "Resource(r_title, r_type, Resource_type(rt_borrow))") \
+                   "Resource(r_title, r_type)") \
             .eq("h_user_id", user_id) \
             .order("h_date", desc=True) \
             .execute()
         if not response.data:
             return []
+        due = _history_due_dates(response.data, [user_type_id] * len(response.data),
+                                 [(record.get('Resource') or {}).get('r_type') for record in response.data])
         resources = {}
-        for record in response.data:
+        for record, due_date in zip(response.data, due):
             resource_id = record['h_resource_id']
             if resource_id not in resources:
                 resources[resource_id] = {
@@ -1590,28 +2059,23 @@ def get_reader_history(user_id):
                     'return_date': None,
                     'status': 'Unknown'
                 }
-            rt_borrow = record.get('Resource', {}).get('Resource_type', {}).get('rt_borrow')
-            borrow_limit = rt_borrow if rt_borrow and rt_borrow > 1 else user_type_borrow_limit
             if record['h_status'] == 0:  # Reservation
                 resources[resource_id]['reservation_date'] = record['h_date']
                 resources[resource_id]['status'] = 'Reserved'
             elif record['h_status'] == 1:  # Borrow
                 resources[resource_id]['borrow_date'] = record['h_date']
-                if borrow_limit:
-                    due_date = datetime.fromisoformat(record['h_date'].replace('Z', '+00:00')) + timedelta(days=borrow_limit)
-                    resources[resource_id]['due_date'] = due_date.isoformat()
+                if due_date:
+                    resources[resource_id]['due_date'] = due_date
                 resources[resource_id]['status'] = 'Borrowed'
             elif record['h_status'] == 3:  # Renew_1
                 resources[resource_id]['borrow_date'] = record['h_date']
-                if borrow_limit and user_type_renew:
-                    due_date = datetime.fromisoformat(record['h_date'].replace('Z', '+00:00')) + timedelta(days=borrow_limit + user_type_renew)
-                    resources[resource_id]['due_date'] = due_date.isoformat()
+                if due_date:
+                    resources[resource_id]['due_date'] = due_date
                 resources[resource_id]['status'] = 'Renew_1'
             elif record['h_status'] == 5:  # Renew_2
                 resources[resource_id]['borrow_date'] = record['h_date']
-                if borrow_limit and user_type_renew:
-                    due_date = datetime.fromisoformat(record['h_date'].replace('Z', '+00:00')) + timedelta(days=borrow_limit + 2 * user_type_renew)
-                    resources[resource_id]['due_date'] = due_date.isoformat()
+                if due_date:
+                    resources[resource_id]['due_date'] = due_date
                 resources[resource_id]['status'] = 'Renew_2'
             elif record['h_status'] == 2:  # Return
                 resources[resource_id]['return_date'] = record['h_date']
@@ -1625,91 +2089,175 @@ def get_reader_history(user_id):
         print(f"Error in get_reader_history: {str(e)}")
         raise
 
+HISTORY_COLUMNS = "h_id, h_resource_id, h_user_id, h_status, h_date, h_res_id"
+
+def _history_due_dates(records, user_type_ids, resource_type_ids):
+    """
+    Due dates (ISO strings, None when the policies don't define one) of History rows,
+    computed in one vectorized call. h_status uses the same codes as res_type.
+    """
+    starts, aware = due_dates.parse_dates([record['h_date'] for record in records])
+    due, _ = due_dates.due_dates(starts, [record['h_status'] for record in records],
+                                 *_loan_policy_arrays(user_type_ids, resource_type_ids),
+                                 require_period=True)
+    return due_dates.to_isoformat(due, aware)
+
+def _fold_resource_history(records, resource_id):
+    """
+    Fold History rows of one resource into borrower interactions.
+    Rows of the same user on the same date form one interaction. Users and
+    their type policies are resolved in one batched pass.
+    """
+    user_ids = list({record['h_user_id'] for record in records if record.get('h_user_id') is not None})
+    users = {}
+    if user_ids:
+        user_response = supabase.from_("User").select("u_id, u_name, u_type").in_("u_id", user_ids).execute()
+        users = {user['u_id']: user for user in user_response.data or []}
+
+    resource = supabase.from_("Resource").select("r_type").eq("r_id", resource_id).limit(1).execute().data
+    resource_type_id = resource[0]['r_type'] if resource else None
+    due = _history_due_dates(
+        records,
+        [(users.get(record['h_user_id']) or {}).get('u_type') for record in records],
+        [resource_type_id] * len(records)
+    )
+
+    interactions = {}
+    for record, due_date in zip(records, due):
+        user_id = record['h_user_id']
+        key = f"{user_id}_{record['h_date']}"
+        user = users.get(user_id)
+        borrower_name = user['u_name'] if user and user.get('u_name') else 'Unknown User'
+        if key not in interactions:
+            interactions[key] = {
+                'borrower_name': borrower_name,
+                'reservation_date': None,
+                'borrow_date': None,
+                'due_date': None,
+                'return_date': None,
+                'status': 'Unknown'
+            }
+        else:
+            interactions[key]['borrower_name'] = borrower_name
+        if record['h_status'] == 0:
+            interactions[key]['reservation_date'] = record['h_date']
+            interactions[key]['status'] = 'Reserved'
+        elif record['h_status'] == 1:
+            interactions[key]['borrow_date'] = record['h_date']
+            if due_date:
+                interactions[key]['due_date'] = due_date
+            interactions[key]['status'] = 'Borrowed'
+        elif record['h_status'] == 3:
+            interactions[key]['borrow_date'] = record['h_date']
+            if due_date:
+                interactions[key]['due_date'] = due_date
+            interactions[key]['status'] = 'Renew_1'
+        elif record['h_status'] == 5:
+            interactions[key]['borrow_date'] = record['h_date']
+            if due_date:
+                interactions[key]['due_date'] = due_date
+            interactions[key]['status'] = 'Renew_2'
+        elif record['h_status'] == 2:
+            interactions[key]['return_date'] = record['h_date']
+            interactions[key]['status'] = 'Returned'
+        elif record['h_status'] == 4:
+            interactions[key]['status'] = 'Late'
+    result = list(interactions.values())
+    result.sort(key=lambda x: x['borrow_date'] or x['reservation_date'] or x['return_date'], reverse=True)
+    return result
+
 def get_resource_history(resource_id):
     """
     Get the complete history of a resource including all reservations, borrows, and returns.
     """
     try:
         history_query = supabase.table('History') \
-            .select('*') \
+            .select(HISTORY_COLUMNS) \
             .eq('h_resource_id', resource_id) \
             .order('h_date', desc=True) \
             .execute()
         if not history_query.data:
             return []
-        interactions = {}
-        for record in history_query.data:
-            user_id = record['h_user_id']
-            key = f"{user_id}_{record['h_date']}"
-            user_details = get_user_details(user_id)
-            borrower_name = user_details['u_name'] if user_details and user_details.get('u_name') else 'Unknown User'
-            if key not in interactions:
-                interactions[key] = {
-                    'borrower_name': borrower_name,
-                    'reservation_date': None,
-                    'borrow_date': None,
-                    'due_date': None,
-                    'return_date': None,
-                    'status': 'Unknown'
-                }
-            else:
-                interactions[key]['borrower_name'] = borrower_name
-            # Fetch user and resource type info for each record
-            user = supabase.from_("User").select("u_type, User_type(ut_borrow, ut_renew)").eq("u_id", user_id).single().execute().data
-            user_type_borrow_limit = user['User_type']['ut_borrow'] if user and user.get('User_type') else None
-            user_type_renew = user['User_type']['ut_renew'] if user and user.get('User_type') else None
-            resource = supabase.from_("Resource").select("r_type, Resource_type(rt_borrow)").eq("r_id", record['h_resource_id']).single().execute().data
-            rt_borrow = resource.get('Resource_type', {}).get('rt_borrow') if resource else None
-            borrow_limit = rt_borrow if rt_borrow and rt_borrow > 1 else user_type_borrow_limit
-            if record['h_status'] == 0:
-                interactions[key]['reservation_date'] = record['h_date']
-                interactions[key]['status'] = 'Reserved'
-            elif record['h_status'] == 1:
-                interactions[key]['borrow_date'] = record['h_date']
-                if borrow_limit:
-                    due_date = datetime.fromisoformat(record['h_date'].replace('Z', '+00:00')) + timedelta(days=borrow_limit)
-                    interactions[key]['due_date'] = due_date.isoformat()
-                interactions[key]['status'] = 'Borrowed'
-            elif record['h_status'] == 3:
-                interactions[key]['borrow_date'] = record['h_date']
-                if borrow_limit and user_type_renew:
-                    due_date = datetime.fromisoformat(record['h_date'].replace('Z', '+00:00')) + timedelta(days=borrow_limit + user_type_renew)
-                    interactions[key]['due_date'] = due_date.isoformat()
-                interactions[key]['status'] = 'Renew_1'
-            elif record['h_status'] == 5:
-                interactions[key]['borrow_date'] = record['h_date']
-                if borrow_limit and user_type_renew:
-                    due_date = datetime.fromisoformat(record['h_date'].replace('Z', '+00:00')) + timedelta(days=borrow_limit + 2 * user_type_renew)
-                    interactions[key]['due_date'] = due_date.isoformat()
-                interactions[key]['status'] = 'Renew_2'
-            elif record['h_status'] == 2:
-                interactions[key]['return_date'] = record['h_date']
-                interactions[key]['status'] = 'Returned'
-            elif record['h_status'] == 4:
-                interactions[key]['status'] = 'Late'
-        result = list(interactions.values())
-        result.sort(key=lambda x: x['borrow_date'] or x['reservation_date'] or x['return_date'], reverse=True)
-        return result
+        return _fold_resource_history(history_query.data, resource_id)
     except Exception as e:
         print(f"Error in get_resource_history: {str(e)}")
         return {'error': str(e)}
 
+def get_resource_history_page(resource_id, limit=50, after=None):
+    """
+    Get one page of a resource's history, newest first.
+    Pages end on a date boundary so an interaction (same user, same date) is never split.
+    :param limit: Approximate number of History rows per page.
+    :param after: Cursor returned as `next_cursor` by the previous page (None for the first page).
+    :return: {'history': [...], 'next_cursor': str or None}
+    Raises ValueError for a malformed cursor.
+    """
+    query = supabase.table('History') \
+        .select(HISTORY_COLUMNS) \
+        .eq('h_resource_id', resource_id)
+    if after:
+        cursor = decode_cursor(after)
+        last_date = cursor.get('date')
+        if not (isinstance(last_date, str) and _CURSOR_DATE_RE.match(last_date)):
+            raise ValueError('Invalid cursor')
+        query = query.lt('h_date', last_date)
+
+    records = query.order('h_date', desc=True).limit(limit + 1).execute().data or []
+    has_more = len(records) > limit
+    records = records[:limit]
+
+    next_cursor = None
+    if has_more and records:
+        # Complete the last date so its interactions are folded on this page
+        boundary = records[-1]['h_date']
+        seen = {record['h_id'] for record in records}
+        same_date = supabase.table('History') \
+            .select(HISTORY_COLUMNS) \
+            .eq('h_resource_id', resource_id) \
+            .eq('h_date', boundary) \
+            .execute().data or []
+        records.extend(record for record in same_date if record['h_id'] not in seen)
+        next_cursor = encode_cursor({'date': boundary})
+
+    return {
+        'history': _fold_resource_history(records, resource_id) if records else [],
+        'next_cursor': next_cursor
+    }
+
+# Staff IDs by email, so logging does not look up the Staff table on every write
+staff_id_cache = TTLCache(ttl=REFERENCE_TTL)
+
+def _insert_log_rows(rows):
+    supabase.from_("Logs").insert(rows).execute()
+
+log_writer = create_log_writer(_insert_log_rows)
+
+def get_staff_id_by_email(email):
+    """
+    Return the s_id of the staff member with this email (cached), or None.
+    """
+    def load():
+        user = get_user_by_email(email)
+        return user['id'] if user else None
+    staff_id = staff_id_cache.get_or_load(email, load)
+    if staff_id is None:
+        # Not found or the lookup failed: don't remember it, the next call asks again
+        staff_id_cache.invalidate(email)
+    return staff_id
+
 def add_log(email, message):
     """
     Add a log entry for a staff user based on their email and a message.
+    The row is queued and written in a batch by the background log writer.
     """
     try:
-        user = get_user_by_email(email)
-        if user:
-            s_id = user['id']
-            response = supabase \
-                .from_("Logs") \
-                .insert({
-                    's_id': s_id,
-                    'message': message
-                }) \
-                .execute()
-            return True
+        s_id = get_staff_id_by_email(email)
+        if s_id is not None:
+            return log_writer.write({
+                's_id': s_id,
+                'message': message,
+                'created_at': datetime.now(timezone.utc).isoformat()
+            })
         else:
             print("User not found. Cannot insert log.")
             return False
@@ -1738,45 +2286,143 @@ def get_user_email_by_id(staff_id):
         return None
 
 
-def get_logs():
+def _escape_like(value):
+    """
+    Escape LIKE wildcards so user input is matched literally.
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def get_logs(limit=15, after=None, staff_id=None, date_from=None, date_to=None, search=None):
+    """
+    Fetch one page of logs from the Logs table, newest first.
+    Staff emails for the whole page are resolved with a single batched Staff query.
+    :param limit: Number of logs per page.
+    :param after: Cursor returned as `next_cursor` by the previous page (None for the first page).
+    :param staff_id: Only logs written by this staff member.
+    :param date_from: Only logs created at or after this ISO date/time.
+    :param date_to: Only logs created strictly before this ISO date/time.
+    :param search: Only logs whose message contains this text (case-insensitive).
+    :return: {'logs': [...], 'next_cursor': str or None}
+    Raises ValueError for a malformed cursor.
+    """
+    query = supabase \
+        .from_("Logs") \
+        .select("id, message, created_at, s_id")
+
+    if staff_id is not None:
+        query = query.eq("s_id", staff_id)
+    if date_from:
+        query = query.gte("created_at", date_from)
+    if date_to:
+        query = query.lt("created_at", date_to)
+    if search:
+        query = query.ilike("message", f"%{_escape_like(search)}%")
+
+    if after:
+        cursor = decode_cursor(after)
+        last_id = cursor.get('id')
+        last_created = cursor.get('created_at')
+        if not isinstance(last_id, int) or not (isinstance(last_created, str) and _CURSOR_DATE_RE.match(last_created)):
+            raise ValueError('Invalid cursor')
+        query = query.or_(f"created_at.lt.{last_created},and(created_at.eq.{last_created},id.lt.{last_id})")
+
+    response = query \
+        .order("created_at", desc=True) \
+        .order("id", desc=True) \
+        .limit(limit + 1) \
+        .execute()
+
+    logs = response.data or []
+    has_more = len(logs) > limit
+    logs = logs[:limit]
+
+    # Resolve every staff email of the page in one query
+    staff_ids = list({log['s_id'] for log in logs if log.get('s_id') is not None})
+    emails = {}
+    if staff_ids:
+        staff = supabase.from_("Staff").select("s_id, s_email").in_("s_id", staff_ids).execute()
+        emails = {row['s_id']: row['s_email'] for row in staff.data or []}
+    for log in logs:
+        log['staff_email'] = emails.get(log['s_id'])
+
+    next_cursor = None
+    if has_more and logs:
+        next_cursor = encode_cursor({'created_at': logs[-1]['created_at'], 'id': logs[-1]['id']})
+
+    return {'logs': logs, 'next_cursor': next_cursor}
+
+
+EXPORT_PAGE_SIZE = 1000
+
+def _iter_keyset(table, columns, key, filters=None, page_size=EXPORT_PAGE_SIZE):
     """
-    Fetch logs from the Logs table.
-    Returns a list of logs with added staff email or an empty list if none found.
+    Yield every row of a table in `key` order, reading `page_size` rows per query.
+    :param columns: select() string; must include `key`.
+    :param filters: Optional callable applying filters to the query.
     """
-    try:
-        response = supabase \
-            .from_("Logs") \
-            .select("id, message, created_at, s_id") \
-            .order("created_at", desc=True) \
-            .limit(15) \
-            .execute()
+    last = None
+    while True:
+        query = supabase.from_(table).select(columns)
+        if filters:
+            query = filters(query)
+        if last is not None:
+            query = query.gt(key, last)
+        rows = query.order(key).limit(page_size).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1][key]
 
-        logs = []
-        
-        if response.data:
-            for log in response.data:
-                staff_email = get_user_email_by_id(log['s_id'])  # Get email for staff ID
-                log['staff_email'] = staff_email  # Add email to the log entry
-                logs.append(log)
-        
-        return logs if logs else []
-    except Exception as e:
-        print(f"Error fetching logs: {e}")
-        return []
+def iter_resources(fields=None):
+    """
+    Yield every resource, in the get_resources format, one page at a time (for exports).
+    """
+    columns = select_columns(RESOURCE_FIELDS, fields, required=['r_id'])
+    for resource in _iter_keyset("Resource", columns, "r_id"):
+        yield format_resource(resource, fields)
+
+def iter_readers(status=1, fields=None):
+    """
+    Yield every reader with the given u_status, in the get_readers_by_status format (for exports).
+    """
+    columns = select_columns(READER_FIELDS, fields, required=['u_id'])
+    for user in _iter_keyset("User", columns, "u_id", filters=lambda query: query.eq("u_status", status)):
+        yield project(READER_FIELDS, user, fields)
+
+def iter_transactions(fields=None):
+    """
+    Yield every transaction, in the get_transactions format (for exports).
+    """
+    columns = select_columns(TRANSACTION_FIELDS, fields, required=['res_id'])
+    for transaction in _iter_keyset("Reservation", columns, "res_id"):
+        yield project(TRANSACTION_FIELDS, transaction, fields)
+
+LOG_EXPORT_COLUMNS = ['id', 'created_at', 'staff_email', 's_id', 'message']
+
+def iter_logs(staff_id=None, date_from=None, date_to=None, search=None):
+    """
+    Yield every log matching the get_logs filters, newest first (for exports).
+    """
+    after = None
+    while True:
+        # One below the server's row cap, so get_logs can still see whether a next page exists
+        page = get_logs(limit=EXPORT_PAGE_SIZE - 1, after=after, staff_id=staff_id,
+                        date_from=date_from, date_to=date_to, search=search)
+        yield from page['logs']
+        after = page['next_cursor']
+        if not after:
+            return
 
 
 def assign_privileges_to_user_type(staff_type_id, privilege_labels):
     try:
-        # Fetch privilege IDs matching the given labels
-        priv_query = supabase.table('privileges')\
-            .select('id, name')\
-            .in_('name', privilege_labels)\
-            .execute()
+        # Resolve privilege IDs matching the given labels from the cached privileges table
+        known_privileges = _privilege_ids()
+        privilege_id_map = {name: known_privileges[name] for name in privilege_labels if name in known_privileges}
 
-        if not priv_query.data:
+        if not privilege_id_map:
             return {'success': False, 'error': "no priveleges sent to endpoint"}
 
-        privilege_id_map = {row['name']: row['id'] for row in priv_query.data}
         missing = [label for label in privilege_labels if label not in privilege_id_map]
 
         if missing:
@@ -1787,12 +2433,14 @@ def assign_privileges_to_user_type(staff_type_id, privilege_labels):
         # Delete old privileges
         delete_result = supabase.table('staff_type_privileges')\
             .delete().eq('staff_type_id', staff_type_id).execute()
+        reference_cache.invalidate('staff_type_privileges')
 
         # Insert new privileges
         new_entries = [{'staff_type_id': staff_type_id, 'privilege_id': pid} for pid in privilege_ids]
 
         insert_result = supabase.table('staff_type_privileges')\
             .insert(new_entries).execute()
+        reference_cache.invalidate('staff_type_privileges')
 
         # Check if insert was successful
         if not insert_result.data:
@@ -1818,19 +2466,8 @@ def get_user_privileges(email):
         if not user_type_id:
             return []
 
-        # Fetch privileges associated with the user_type_id
-        response = supabase \
-            .from_('staff_type_privileges') \
-            .select('privileges(id, name)') \
-            .eq('staff_type_id', user_type_id) \
-            .execute()
-
-        if not response.data:
-            return []
-
-        # Extract privilege objects
-        privileges = [entry['privileges']['name'] for entry in response.data if 'privileges' in entry]
-        return privileges
+        # Privileges associated with the user_type_id, from the reference cache
+        return list(_staff_type_privileges().get(user_type_id, []))
 
     except Exception as e:
         print(f"Error fetching user privileges: {str(e)}")
@@ -1852,6 +2489,7 @@ def delete_staff_member(user_email, staff_id):
         response = supabase.from_("Staff").delete().eq("s_id", staff_id).execute()
 
         if response.data:
+            staff_id_cache.clear()
             # Log the deletion
             add_log(user_email, f"deleted staff member with ID: {staff_id}")
             return {'success': True, 'message': 'Staff member deleted successfully'}
@@ -1896,6 +2534,7 @@ def update_staff_member(user_email, staff_id, staff_data):
         response = supabase.from_("Staff").update(update_data).eq("s_id", staff_id).execute()
 
         if response.data:
+            staff_id_cache.clear()
             # Log the update
             add_log(user_email, f"updated staff member with ID: {staff_id}")
             return {
@@ -1909,6 +2548,34 @@ def update_staff_member(user_email, staff_id, staff_data):
         return {'success': False, 'error': str(e)}
 
 
+TRANSACTION_DETAIL_COLUMNS = (
+    "res_id, res_type, res_date, res_user_id, "
+    "Resource(r_id, r_title, r_type), "
+    "User(u_id, u_name, u_email, u_type)"
+)
+
+def _format_transaction_details(transactions):
+    """
+    Build the late-notice details of reservation rows selected with TRANSACTION_DETAIL_COLUMNS.
+    Loan policies come from the reference cache and due dates are computed in one
+    vectorized call (14 days when no policy sets a borrow period).
+    """
+    starts, aware = due_dates.parse_dates([transaction['res_date'] for transaction in transactions])
+    policies = _loan_policy_arrays(
+        [(transaction.get('User') or {}).get('u_type') for transaction in transactions],
+        [(transaction.get('Resource') or {}).get('r_type') for transaction in transactions]
+    )
+    due, _ = due_dates.due_dates(starts, [transaction['res_type'] for transaction in transactions],
+                                 *policies, default_days=14)
+    return [{
+        'user_id': transaction['res_user_id'],
+        'title': (transaction.get('Resource') or {}).get('r_title'),
+        'due_date': due_date,
+        'user_email': (transaction.get('User') or {}).get('u_email'),
+        'user_name': (transaction.get('User') or {}).get('u_name'),
+        'is_late': transaction['res_type'] == 4  # Check if transaction is marked as late
+    } for transaction, due_date in zip(transactions, due_dates.to_isoformat(due, aware))]
+
 def get_transaction_details(transaction_id):
     """
     Get detailed information about a specific transaction by ID.
@@ -1921,71 +2588,53 @@ def get_transaction_details(transaction_id):
         dict: Transaction details including user_id, title, and due_date
     """
     try:
-        response = supabase.from_("Reservation").select(
-            "res_id, res_type, res_date, res_user_id, "
-            "Resource(r_id, r_title), "
-            "User(u_id, u_name, u_email)"
-        ).eq("res_id", transaction_id).execute()
+        response = supabase.from_("Reservation").select(TRANSACTION_DETAIL_COLUMNS).eq("res_id", transaction_id).execute()
 
         if not response.data or len(response.data) == 0:
             print(f"No transaction found for ID: {transaction_id}")
             return None
             
-        transaction = response.data[0]
-        
-        # Get the user's type to determine borrow limit
-        user_response = supabase.from_("User") \
-            .select("u_type, User_type(ut_borrow, ut_renew)") \
-            .eq("u_id", transaction["res_user_id"]) \
-            .single() \
-            .execute()
-        
-        user_type_borrow_limit = user_response.data.get('User_type', {}).get('ut_borrow') if user_response.data else None
-        user_type_renew_limit = user_response.data.get('User_type', {}).get('ut_renew') if user_response.data else None
-        
-        # Get the resource's type to determine borrow limit
-        resource_response = supabase.from_("Resource") \
-            .select("r_type, Resource_type(rt_borrow)") \
-            .eq("r_id", transaction["Resource"]["r_id"]) \
-            .single() \
-            .execute()
-            
-        resource_type_borrow_limit = resource_response.data.get('Resource_type', {}).get('rt_borrow') if resource_response.data else None
-        
-        # Use resource type limit first, then fall back to user type limit
-        borrow_limit = resource_type_borrow_limit or user_type_borrow_limit or 14  # Default to 14 days if no limit specified
-        
-        # Calculate due date based on reservation date and borrow limit
-        from datetime import datetime, timedelta
-        res_date = datetime.fromisoformat(transaction["res_date"].replace('Z', '+00:00'))
-        
-        # Calculate due date based on transaction type
-        if transaction["res_type"] == 1:  # Borrow
-            due_date = res_date + timedelta(days=borrow_limit)
-        elif transaction["res_type"] == 3:  # Renew_1
-            due_date = res_date + timedelta(days=borrow_limit + user_type_renew_limit)
-        elif transaction["res_type"] == 5:  # Renew_2
-            due_date = res_date + timedelta(days=borrow_limit + 2 * user_type_renew_limit)
-        else:
-            due_date = res_date + timedelta(days=borrow_limit)
-            
-        print(f"Transaction {transaction_id} details:")
-        print(f"Reservation date: {res_date}")
-        print(f"Due date: {due_date}")
-        print(f"Transaction type: {transaction['res_type']}")
-        
-        return {
-            'user_id': transaction['res_user_id'],
-            'title': transaction['Resource']['r_title'],
-            'due_date': due_date.isoformat(),
-            'user_email': transaction['User']['u_email'],
-            'user_name': transaction['User']['u_name'],
-            'is_late': transaction['res_type'] == 4  # Check if transaction is marked as late
-        }
+        return _format_transaction_details(response.data[:1])[0]
     except Exception as e:
         print(f"Error in get_transaction_details: {str(e)}")
         return None
 
+def get_transaction_details_bulk(transaction_ids):
+    """
+    Get the details of several transactions at once, in the same format as
+    get_transaction_details. Runs a single query whatever the number of ids.
+    
+    Args:
+        transaction_ids (list): The IDs of the transactions
+        
+    Returns:
+        dict: Transaction details keyed by transaction ID; missing IDs are left out
+    """
+    ids = list(dict.fromkeys(transaction_ids))
+    if not ids:
+        return {}
+    try:
+        response = supabase.from_("Reservation").select(TRANSACTION_DETAIL_COLUMNS).in_("res_id", ids).execute()
+        transactions = response.data or []
+        if not transactions:
+            return {}
+    except Exception as e:
+        print(f"Error in get_transaction_details_bulk: {str(e)}")
+        return {}
+    try:
+        details = _format_transaction_details(transactions)
+        return {transaction['res_id']: detail for transaction, detail in zip(transactions, details)}
+    except Exception as e:
+        # One malformed row must not drop the whole batch: format row by row and skip the bad ones
+        print(f"Error formatting transaction details, retrying row by row: {str(e)}")
+    result = {}
+    for transaction in transactions:
+        try:
+            result[transaction['res_id']] = _format_transaction_details([transaction])[0]
+        except Exception as e:
+            print(f"Error formatting transaction {transaction.get('res_id')}: {str(e)}")
+    return result
+
 def get_user_details(user_id):
     """
     Get user details for a specific user ID
@@ -2083,79 +2732,167 @@ def get_comments(resource_id):
         print(f"Error getting comments: {e}")
         return []
 
-def mark_late_reservations():
+ACTIVE_LOAN_TYPES = [1, 3, 5]  # 1: Borrow, 3: Renew_1, 5: Renew_2
+LOAN_COLUMNS = "res_id, res_type, res_date, User(u_email, u_name, u_type), Resource(r_title, r_type)"
+
+def _loan_policy_arrays(user_type_ids, resource_type_ids):
+    """
+    Look up the loan policies of many loans in the reference cache.
+    :return: (rt_borrow, ut_borrow, ut_renew) float arrays, NaN where a policy is missing.
+    """
+    def period(policy, field):
+        value = policy.get(field) if policy else None
+        return np.nan if value is None else value
+
+    user_policies = {type_id: get_user_type_policy(type_id) for type_id in set(user_type_ids)}
+    resource_policies = {type_id: get_resource_type_policy(type_id) for type_id in set(resource_type_ids)}
+    rt_borrow = np.array([period(resource_policies[t], 'rt_borrow') for t in resource_type_ids], dtype=float)
+    ut_borrow = np.array([period(user_policies[t], 'ut_borrow') for t in user_type_ids], dtype=float)
+    ut_renew = np.array([period(user_policies[t], 'ut_renew') for t in user_type_ids], dtype=float)
+    return rt_borrow, ut_borrow, ut_renew
+
+def loan_due_date(res_date, res_type, user_type_id, resource_type_id):
+    """
+    Compute the due date of a loan from its start date, status and loan policies.
+    :param res_date: Reservation date as stored in the Reservation table.
+    :param res_type: 1 (Borrow), 3 (Renew_1) or 5 (Renew_2); other types get the borrow period.
+    :return: Timezone-aware datetime (dates without a zone are taken as UTC).
+    """
+    user_type = get_user_type_policy(user_type_id)
+    resource_type = get_resource_type_policy(resource_type_id)
+    due_date = due_dates.due_date(
+        res_date, res_type,
+        resource_type.get('rt_borrow') if resource_type else None,
+        user_type['ut_borrow'] if user_type else None,
+        user_type['ut_renew'] if user_type else None
+    )
+    if due_date.tzinfo is None:
+        due_date = due_date.replace(tzinfo=timezone.utc)
+    return due_date
+
+def _mark_overdue(reservations, notify=True):
+    """
+    Flip the overdue loans among `reservations` (rows selected with LOAN_COLUMNS) to Late
+    with a single update, and schedule the others with the overdue scheduler.
+    Due dates are computed for all rows in one vectorized call.
+    :return: Counts for the mark_late_reservations summary.
+    """
+    counts = {'checked': len(reservations), 'overdue': 0, 'marked': 0, 'notified': 0}
+    if not reservations:
+        return counts
+
+    users = [res.get('User') or {} for res in reservations]
+    resources = [res.get('Resource') or {} for res in reservations]
+    starts, _ = due_dates.parse_dates([res['res_date'] for res in reservations])
+    policies = _loan_policy_arrays([user.get('u_type') for user in users],
+                                   [resource.get('r_type') for resource in resources])
+    due, days_late = due_dates.due_dates(starts, [res['res_type'] for res in reservations], *policies)
+    now = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), 'us')
+    # Rows without a usable res_date (or loan policy) have no due date and are left alone
+    has_due = ~np.isnat(due)
+    if not has_due.all():
+        print(f"Skipping {int((~has_due).sum())} active reservations without a computable due date")
+    is_overdue = has_due & (due < now)
+
+    overdue = {}
+    for i in np.flatnonzero(is_overdue):
+        overdue[reservations[i]['res_id']] = {
+            'email': users[i].get('u_email'),
+            'name': users[i].get('u_name'),
+            'book_title': resources[i].get('r_title'),
+            'due_date': str(due[i].astype('datetime64[D]')),
+            'days_late': int(days_late[i])
+        }
+    for i in np.flatnonzero(has_due & ~is_overdue):
+        overdue_scheduler.schedule(reservations[i]['res_id'],
+                                   due[i].astype(datetime).replace(tzinfo=timezone.utc))
+    counts['overdue'] = len(overdue)
+    if not overdue:
+        return counts
+    # Only flip rows that are still active, in case one was returned meanwhile
+    update_response = supabase.from_("Reservation").update({"res_type": 4}) \
+        .in_("res_id", list(overdue)).in_("res_type", ACTIVE_LOAN_TYPES).execute()
+    marked = [row['res_id'] for row in update_response.data or []]
+    counts['marked'] = len(marked)
+    for res_id in marked:
+        overdue_scheduler.cancel(res_id)
+    monthly_borrow_counts.retype(marked, 4)
+
+    notices = [overdue[res_id] for res_id in marked if overdue[res_id]['email']]
+    if notify and notices:
+        result = send_late_notifications(notices)
+        counts['notified'] = len(result['queued']) + len(result['sent'])
+    return counts
+
+def mark_late_reservations(notify=True):
+    """
+    Check all active reservations and set their status to 'Late' once the due date has passed.
+    Run on startup; afterwards the overdue scheduler marks loans as they become late.
+    Active loans are loaded in one query, loan policies come from the reference cache,
+    and every overdue reservation is flipped with a single update. Email notifications
+    are queued in the email outbox by send_late_notifications.
+    :param notify: Send late return emails for the reservations that were marked.
+    :return: Summary dict with counts and timing.
+    """
+    started = time.perf_counter()
+    summary = {'success': True, 'checked': 0, 'overdue': 0, 'marked': 0, 'notified': 0}
+    try:
+        reservations = supabase.from_("Reservation").select(LOAN_COLUMNS) \
+            .in_("res_type", ACTIVE_LOAN_TYPES).execute()
+        summary.update(_mark_overdue(reservations.data, notify))
+    except Exception as e:
+        print(f"Error in mark_late_reservations: {e}")
+        summary['success'] = False
+        summary['error'] = str(e)
+
+    summary['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"mark_late_reservations: checked {summary['checked']}, overdue {summary['overdue']}, "
+          f"marked {summary['marked']}, notifications queued {summary['notified']} "
+          f"in {summary['elapsed_ms']} ms")
+    return summary
+
+def mark_reservations_late(reservation_ids):
+    """
+    Called by the overdue scheduler with loans whose due date has just passed.
+    The rows are reloaded so renewals or returns the scheduler missed are respected;
+    loans that turn out not to be due yet are scheduled again.
+    """
+    reservations = supabase.from_("Reservation").select(LOAN_COLUMNS) \
+        .in_("res_id", list(reservation_ids)).in_("res_type", ACTIVE_LOAN_TYPES).execute()
+    counts = _mark_overdue(reservations.data)
+    if counts['marked']:
+        print(f"Overdue scheduler marked {counts['marked']} reservation(s) as late")
+    return counts
+
+overdue_scheduler = OverdueScheduler(mark_reservations_late)
+
+def start_overdue_scheduler():
+    """
+    Start the background worker that marks loans late as they become overdue.
+    The heap is seeded by mark_late_reservations, which should run first.
+    """
+    overdue_scheduler.start()
+
+def _schedule_loan(res_id, res_type, res_date, user_type_id, resource_type_id):
     """
-    This function checks all active reservations and sets their status to 'Late' if the due date is passed.
-    Should be run daily (e.g., via cron or scheduler).
-    Also sends email notifications to users when their reservations are marked as late.
+    Keep the overdue scheduler in sync after a reservation write.
     """
     try:
-        active_statuses = [1, 3, 5]  # 1: Borrow, 3: Renew_1, 5: Renew_2
-        reservations = supabase.from_("Reservation").select(
-            "res_id, res_user_id, res_resource_id, res_type, res_date, "
-            "User(u_email, u_name), "
-            "Resource(r_title)"
-        ).in_("res_type", active_statuses).execute()
-        
-        for res in reservations.data:
-            user_id = res['res_user_id']
-            res_type = res['res_type']
-            res_date = res['res_date']
-            
-            # Get user type info
-            user = supabase.from_("User").select("u_type, User_type(ut_borrow, ut_renew)").eq("u_id", user_id).single().execute().data
-            ut_borrow = user['User_type']['ut_borrow'] if user and user.get('User_type') else 0
-            ut_renew = user['User_type']['ut_renew'] if user and user.get('User_type') else 0
-            
-            # Get resource type info
-            resource = supabase.from_("Resource").select("r_type, Resource_type(rt_borrow)").eq("r_id", res['res_resource_id']).single().execute().data
-            rt_borrow = resource.get('Resource_type', {}).get('rt_borrow') if resource else None
-            borrow_limit = rt_borrow if rt_borrow and rt_borrow > 1 else ut_borrow
-            
-            # Calculate due date
-            from datetime import datetime, timedelta
-            borrow_date = datetime.fromisoformat(res_date.replace('Z', '+00:00'))
-            now = datetime.now(borrow_date.tzinfo)  # Use same timezone as borrow_date
-            
-            if res_type == 1:  # Borrow
-                due_date = borrow_date + timedelta(days=borrow_limit)
-            elif res_type == 3:  # Renew_1
-                due_date = borrow_date + timedelta(days=borrow_limit + ut_renew)
-            elif res_type == 5:  # Renew_2
-                due_date = borrow_date + timedelta(days=borrow_limit + 2 * ut_renew)
-            else:
-                continue
-                
-            # Check if the item is late
-            if now > due_date:
-                print(f"Marking reservation {res['res_id']} as late. Due date: {due_date}, Current time: {now}")
-                
-                # Update reservation status to late
-                update_response = supabase.from_("Reservation").update({"res_type": 4}).eq("res_id", res['res_id']).execute()
-                
-                if update_response.data:
-                    # Calculate days late for the email
-                    days_late = (now - due_date).days
-                    
-                    # Send email notification
-                    from app.email_service import send_late_return_email
-                    email_result = send_late_return_email(
-                        res['User']['u_email'],
-                        res['User']['u_name'],
-                        res['Resource']['r_title'],
-                        due_date.strftime('%Y-%m-%d'),
-                        days_late
-                    )
-                    
-                    if email_result['success']:
-                        print(f"Email notification sent to {res['User']['u_email']}")
-                        # Log the email sending
-                        add_log("system", f"sent late return notice to {res['User']['u_email']} for book '{res['Resource']['r_title']}'")
-                    else:
-                        print(f"Failed to send email notification to {res['User']['u_email']}: {email_result['message']}")
-                
+        if res_type in ACTIVE_LOAN_TYPES:
+            overdue_scheduler.schedule(res_id, loan_due_date(res_date, res_type, user_type_id, resource_type_id))
+        else:
+            overdue_scheduler.cancel(res_id)
     except Exception as e:
-        print(f"Error in mark_late_reservations: {e}")
+        print(f"Error scheduling reservation {res_id}: {e}")
+
+def send_late_notifications(notices):
+    """
+    Queue late return emails for reservations that were just marked as late.
+    Delivery happens in the background through the email outbox (inline where there is none).
+    :param notices: List of dicts with email, name, book_title, due_date and days_late.
+    """
+    from app.email_service import queue_late_notices
+    return queue_late_notices(notices)
 
 def delete_comment(comment_id):
     """
@@ -2205,12 +2942,38 @@ def add_suggestion(user_id, content):
             'error': str(e)
         }
 
+def _format_suggestions(rows):
+    """
+    Attach user names and emails to suggestion rows with one batched User query.
+    """
+    user_ids = list({row['sug_user_id'] for row in rows if row.get('sug_user_id') is not None})
+    users = {}
+    if user_ids:
+        user_response = supabase \
+            .from_('User') \
+            .select('u_id, u_name, u_email') \
+            .in_('u_id', user_ids) \
+            .execute()
+        users = {user['u_id']: user for user in user_response.data or []}
+
+    suggestions = []
+    for suggestion in rows:
+        user_data = users.get(suggestion['sug_user_id'])
+        suggestions.append({
+            'id': suggestion['sug_id'],
+            'content': suggestion['sug_content'],
+            'date': suggestion['sug_date'],
+            'user_id': suggestion['sug_user_id'],
+            'user_name': user_data['u_name'] if user_data else 'Unknown',
+            'user_email': user_data['u_email'] if user_data else 'Unknown'
+        })
+    return suggestions
+
 def fetch_all_suggestions():
     """
     Get all suggestions with user names from the Suggestions table
     """
     try:
-        # First get all suggestions
         response = supabase \
             .from_('Suggestions') \
             .select('sug_id, sug_content, sug_date, sug_user_id') \
@@ -2220,37 +2983,57 @@ def fetch_all_suggestions():
         if not response.data:
             return []
             
-        suggestions = []
-        for suggestion in response.data:
-            try:
-                # Get user details separately
-                user_response = supabase \
-                    .from_('User') \
-                    .select('u_name, u_email') \
-                    .eq('u_id', suggestion['sug_user_id']) \
-                    .single() \
-                    .execute()
-                
-                user_data = user_response.data if user_response.data else None
-                
-                suggestion_data = {
-                    'id': suggestion['sug_id'],
-                    'content': suggestion['sug_content'],
-                    'date': suggestion['sug_date'],
-                    'user_id': suggestion['sug_user_id'],
-                    'user_name': user_data['u_name'] if user_data else 'Unknown',
-                    'user_email': user_data['u_email'] if user_data else 'Unknown'
-                }
-                suggestions.append(suggestion_data)
-            except Exception as e:
-                print(f"Error processing suggestion {suggestion.get('sug_id')}: {e}")
-                continue
-        
-        return suggestions
+        return _format_suggestions(response.data)
     except Exception as e:
         print(f"Error getting suggestions: {e}")
         return []
 
+def get_suggestions_page(limit=50, after=None, user_id=None, date_from=None, date_to=None):
+    """
+    Get one page of suggestions, newest first, with user names and emails.
+    :param limit: Number of suggestions per page.
+    :param after: Cursor returned as `next_cursor` by the previous page (None for the first page).
+    :param user_id: Only suggestions made by this user.
+    :param date_from: Only suggestions made at or after this ISO date/time.
+    :param date_to: Only suggestions made strictly before this ISO date/time.
+    :return: {'suggestions': [...], 'next_cursor': str or None}
+    Raises ValueError for a malformed cursor.
+    """
+    query = supabase \
+        .from_('Suggestions') \
+        .select('sug_id, sug_content, sug_date, sug_user_id')
+
+    if user_id is not None:
+        query = query.eq('sug_user_id', user_id)
+    if date_from:
+        query = query.gte('sug_date', date_from)
+    if date_to:
+        query = query.lt('sug_date', date_to)
+
+    if after:
+        cursor = decode_cursor(after)
+        last_id = cursor.get('id')
+        last_date = cursor.get('date')
+        if not isinstance(last_id, int) or not (isinstance(last_date, str) and _CURSOR_DATE_RE.match(last_date)):
+            raise ValueError('Invalid cursor')
+        query = query.or_(f"sug_date.lt.{last_date},and(sug_date.eq.{last_date},sug_id.lt.{last_id})")
+
+    response = query \
+        .order('sug_date', desc=True) \
+        .order('sug_id', desc=True) \
+        .limit(limit + 1) \
+        .execute()
+
+    rows = response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor({'date': rows[-1]['sug_date'], 'id': rows[-1]['sug_id']})
+
+    return {'suggestions': _format_suggestions(rows), 'next_cursor': next_cursor}
+
 def delete_suggestion(suggestion_id):
     """
     Delete a suggestion from the Suggestions table
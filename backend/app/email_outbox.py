@@ -0,0 +1,258 @@
+"""
+Durable outbox for outbound email.
+
+Request handlers only insert a message record into a local SQLite database;
+worker threads deliver the messages in the background. A failed delivery is
+retried with exponential backoff, and a message that still fails after
+`max_attempts` is moved to the dead-letter state (status 'dead') where it
+stays until someone looks at it. Deliveries are rate limited across all
+workers so a large batch does not trip the SMTP provider's limits.
+
+Messages survive restarts: anything left 'pending' is picked up again when
+the outbox starts. Several processes may share the database file: a message
+is claimed with a conditional update, so only one worker sends it, and a
+'sending' message is only taken back once its lease has expired (its
+worker's process died), never while another process is still sending it.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+class RateLimiter:
+    """
+    Token bucket shared by the delivery workers.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class EmailOutbox:
+    """
+    SQLite-backed message queue delivered by `workers` background threads.
+    """
+
+    def __init__(self, path, handlers, workers=2, max_attempts=6, base_delay=30,
+                 max_delay=3600, rate_per_minute=60, sent_retention=7 * 24 * 3600, lease_timeout=300):
+        """
+        :param path: SQLite database file.
+        :param handlers: Dict mapping a message kind to a callable(payload) returning
+                         {'success': bool, 'message': str}.
+        :param max_attempts: Deliveries tried before a message is dead-lettered.
+        :param base_delay: Seconds before the first retry; doubled on every failure.
+        :param rate_per_minute: Maximum deliveries per minute across all workers (0 = unlimited).
+        :param sent_retention: Seconds delivered messages are kept for the stats.
+        :param lease_timeout: Seconds after which a message still 'sending' is considered
+                              abandoned and delivered again.
+        """
+        self.path = path
+        self.handlers = handlers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sent_retention = sent_retention
+        self.lease_timeout = lease_timeout
+        self.rate_limiter = RateLimiter(rate_per_minute)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stop = False
+        self._threads = []
+        self.stats_counters = {'delivered': 0, 'retried': 0, 'dead_lettered': 0}
+
+    def enqueue(self, kind, payload):
+        """
+        Store a message for delivery and wake a worker. Returns the message id.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown message kind: {kind}")
+        now = time.time()
+        with self._db_lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (kind, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), PENDING, now, now, now)
+            )
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return cursor.lastrowid
+
+    def start(self):
+        """
+        Start the delivery workers (once). Messages whose sender died are put
+        back in the queue first.
+        """
+        if self._threads:
+            return
+        with self._wakeup:
+            if self._threads:
+                return
+            self._stop = False
+            with self._db_lock:
+                self._reclaim_expired()
+                self._db.execute("DELETE FROM outbox WHERE status = ? AND updated_at < ?",
+                                 (SENT, time.time() - self.sent_retention))
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'email-outbox-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        with self._wakeup:
+            self._stop = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        """
+        Queue depth per status, age of the oldest pending message and delivery counters.
+        """
+        with self._db_lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+            oldest = self._db.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status IN (?, ?)", (PENDING, SENDING)
+            ).fetchone()[0]
+        counts = {PENDING: 0, SENDING: 0, SENT: 0, DEAD: 0}
+        counts.update(dict(rows))
+        return {
+            'depth': counts[PENDING] + counts[SENDING],
+            'by_status': counts,
+            'oldest_pending_seconds': round(time.time() - oldest, 1) if oldest else 0,
+            'workers': len(self._threads),
+            **self.stats_counters
+        }
+
+    def dead_letters(self, limit=50):
+        """
+        Most recent dead-lettered messages, for inspection.
+        """
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, kind, payload, attempts, last_error, created_at FROM outbox "
+                "WHERE status = ? ORDER BY id DESC LIMIT ?", (DEAD, limit)
+            ).fetchall()
+        return [{
+            'id': row[0], 'kind': row[1], 'payload': json.loads(row[2]),
+            'attempts': row[3], 'last_error': row[4], 'created_at': row[5]
+        } for row in rows]
+
+    def _reclaim_expired(self):
+        """
+        Put back in the queue the messages whose lease expired. Caller holds _db_lock.
+        """
+        self._db.execute("UPDATE outbox SET status = ? WHERE status = ? AND updated_at < ?",
+                         (PENDING, SENDING, time.time() - self.lease_timeout))
+
+    def _claim(self):
+        """
+        Mark the next due message as being sent and return it, or return the
+        number of seconds until the next one is due (None if the queue is empty).
+        The claim is a conditional update, so a message is never claimed by two
+        workers, even in different processes.
+        """
+        with self._db_lock:
+            self._reclaim_expired()
+            while True:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT id, kind, payload, attempts, next_attempt_at FROM outbox "
+                    "WHERE status = ? ORDER BY next_attempt_at, id LIMIT 1", (PENDING,)
+                ).fetchone()
+                if row is None:
+                    return None, None
+                if row[4] > now:
+                    return None, row[4] - now
+                claimed = self._db.execute("UPDATE outbox SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                                           (SENDING, now, row[0], PENDING)).rowcount
+                if claimed:
+                    return row, None
+                # Another process claimed it first
+
+    def _finish(self, message_id, attempts, error=None):
+        now = time.time()
+        with self._db_lock:
+            if error is None:
+                self._db.execute("UPDATE outbox SET status = ?, attempts = ?, last_error = NULL, updated_at = ? "
+                                 "WHERE id = ?", (SENT, attempts, now, message_id))
+                self.stats_counters['delivered'] += 1
+            elif attempts >= self.max_attempts:
+                self._db.execute("UPDATE outbox SET status = ?, attempts = ?, last_error = ?, updated_at = ? "
+                                 "WHERE id = ?", (DEAD, attempts, error, now, message_id))
+                self.stats_counters['dead_lettered'] += 1
+            else:
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+                delay *= random.uniform(0.8, 1.2)
+                self._db.execute("UPDATE outbox SET status = ?, attempts = ?, last_error = ?, "
+                                 "next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                                 (PENDING, attempts, error, now + delay, now, message_id))
+                self.stats_counters['retried'] += 1
+
+    def _deliver(self, row):
+        message_id, kind, payload, attempts, _ = row
+        self.rate_limiter.wait()
+        try:
+            result = self.handlers[kind](json.loads(payload))
+            error = None if result.get('success') else result.get('message') or 'Delivery failed'
+        except Exception as e:
+            error = str(e)
+        if error:
+            print(f"Error delivering outbox message {message_id} (attempt {attempts + 1}): {error}")
+        self._finish(message_id, attempts + 1, error)
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if self._stop:
+                    return
+            try:
+                row, wait = self._claim()
+            except Exception as e:
+                print(f"Error reading email outbox: {e}")
+                row, wait = None, 5
+            if row is not None:
+                self._deliver(row)
+                continue
+            with self._wakeup:
+                if not self._stop:
+                    self._wakeup.wait(min(wait, 60) if wait is not None else 60)
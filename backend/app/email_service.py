@@ -1,12 +1,177 @@
+import atexit
+import queue
 import smtplib
+import tempfile
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
+from app.email_outbox import EmailOutbox
 
 # Load environment variables
 load_dotenv()
 
+
+class SMTPPool:
+    """
+    Small pool of logged-in SMTP sessions shared by every email sent from this process.
+
+    Sessions are opened on demand (at most `size` at a time), reused across messages
+    and reopened when the server dropped them or they sat idle for too long.
+    """
+
+    def __init__(self, host, port, username=None, password=None, starttls=True,
+                 size=4, timeout=30, idle_timeout=60):
+        """
+        Args:
+            host (str): SMTP server host
+            port (int): SMTP server port
+            username (str): Login user, usually the sender address
+            password (str): Login password; no login is attempted when empty
+            starttls (bool): Upgrade the connection with STARTTLS before logging in
+            size (int): Maximum number of open sessions
+            timeout (float): Socket timeout in seconds
+            idle_timeout (float): Sessions idle for longer than this are reopened
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.stats = {'connections': 0, 'reconnects': 0, 'sent': 0}
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()  # Secure the connection
+            if self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._quit(server)
+            raise
+        self.stats['connections'] += 1
+        return server
+
+    @staticmethod
+    def _quit(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - last_used < self.idle_timeout:
+                    return server
+                self._quit(server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, server):
+        if server is not None:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    def send(self, msg):
+        """
+        Send a message on a pooled session. A session the server has dropped is
+        replaced and the message retried once; other SMTP errors are raised.
+        """
+        server = self._acquire()
+        try:
+            try:
+                server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._quit(server)
+                server = None
+                self.stats['reconnects'] += 1
+                server = self._connect()
+                server.send_message(msg)
+            self.stats['sent'] += 1
+        except Exception:
+            if server is not None:
+                self._quit(server)
+                server = None
+            raise
+        finally:
+            self._release(server)
+
+    def close(self):
+        """
+        Close every idle session.
+        """
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(server)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    """
+    Return the process-wide SMTP pool, built from the environment on first use.
+    Returns None if the email settings are missing.
+
+    Besides EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_SERVER and SMTP_PORT, the pool reads
+    SMTP_STARTTLS (default on), SMTP_POOL_SIZE (default 4), SMTP_TIMEOUT and
+    SMTP_IDLE_TIMEOUT. A local smtpd/aiosmtpd stand-in can be used by pointing
+    SMTP_SERVER/SMTP_PORT at it with SMTP_STARTTLS=0 and no EMAIL_PASSWORD.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            sender_email = os.getenv('EMAIL_ADDRESS')
+            smtp_server = os.getenv('SMTP_SERVER')
+            if not sender_email or not smtp_server:
+                return None
+            _pool = SMTPPool(
+                smtp_server,
+                int(os.getenv('SMTP_PORT', 587)),
+                username=sender_email,
+                password=os.getenv('EMAIL_PASSWORD'),
+                starttls=os.getenv('SMTP_STARTTLS', '1').lower() not in ('0', 'false', 'no'),
+                size=int(os.getenv('SMTP_POOL_SIZE', 4)),
+                timeout=float(os.getenv('SMTP_TIMEOUT', 30)),
+                idle_timeout=float(os.getenv('SMTP_IDLE_TIMEOUT', 60)),
+            )
+            atexit.register(_pool.close)
+    return _pool
+
+
+def reset_smtp_pool():
+    """
+    Close the current pool so the next email rebuilds it from the environment.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+
+
 def send_late_return_email(recipient_email, recipient_name, book_title, due_date, days_late):
     """
     Send an email notification to a user about their late return
@@ -22,14 +187,11 @@ def send_late_return_email(recipient_email, recipient_name, book_title, due_date
         dict: A dictionary containing success status and message
     """
     try:
-        # Get email credentials from environment variables
-        sender_email = os.getenv('EMAIL_ADDRESS')
-        password = os.getenv('EMAIL_PASSWORD')
-        smtp_server = os.getenv('SMTP_SERVER')
-        smtp_port = int(os.getenv('SMTP_PORT', 587))
+        # Get the shared SMTP pool configured from environment variables
+        pool = get_smtp_pool()
         
         # If credentials are not set, return an error
-        if not sender_email or not password or not smtp_server:
+        if pool is None:
             print("Email credentials not configured. Please set environment variables.")
             return {
                 "success": False,
@@ -38,6 +200,7 @@ def send_late_return_email(recipient_email, recipient_name, book_title, due_date
         
         # Create the email content
         msg = MIMEMultipart()
+        sender_email = pool.username
         msg['From'] = sender_email
         msg['To'] = recipient_email
         msg['Subject'] = f"LIBRARY NOTICE: Overdue Item - {book_title}"
@@ -75,14 +238,8 @@ def send_late_return_email(recipient_email, recipient_name, book_title, due_date
         print(f"DETAILS: Book '{book_title}' is {days_late} days overdue (Due: {due_date})")
         print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         
-        # Connect to the SMTP server
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()  # Secure the connection
-        server.login(sender_email, password)
-        
-        # Send email
-        server.send_message(msg)
-        server.quit()
+        # Send email on a pooled SMTP session
+        pool.send(msg)
         
         # Print success message
         print(f"✅ EMAIL SENT SUCCESSFULLY!\n")
@@ -133,17 +290,24 @@ def send_multiple_late_notices(recipients_data):
     print(f"\n📨 PROCESSING {total_recipients} LATE RETURN NOTIFICATIONS")
     print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     
-    for i, recipient in enumerate(recipients_data, 1):
+    def send(numbered):
+        i, recipient = numbered
         print(f"Processing notification {i}/{total_recipients}: {recipient['name']} ({recipient['email']})")
-        
-        result = send_late_return_email(
+        return send_late_return_email(
             recipient['email'],
             recipient['name'],
             recipient['book_title'],
             recipient['due_date'],
             recipient['days_late']
         )
-        
+    
+    # Send concurrently, one worker per pooled SMTP session
+    pool = get_smtp_pool()
+    workers = max(1, min(pool.size if pool else 1, total_recipients))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sent_results = list(executor.map(send, enumerate(recipients_data, 1)))
+    
+    for recipient, result in zip(recipients_data, sent_results):
         if result['success']:
             results['sent'].append(recipient['email'])
         else:
@@ -168,4 +332,104 @@ def send_multiple_late_notices(recipients_data):
     else:
         results['message'] = f"Successfully sent {len(results['sent'])} emails"
     
-    return results
\ No newline at end of file
+    return results
+
+def _deliver_late_notice(payload):
+    return send_late_return_email(
+        payload['email'],
+        payload['name'],
+        payload['book_title'],
+        payload['due_date'],
+        payload['days_late']
+    )
+
+
+_outbox = None
+_outbox_unavailable = False
+
+
+def get_email_outbox():
+    """
+    Return the process-wide email outbox, created on first use, or None when
+    emails have to be sent inline instead.
+
+    There is no outbox on Vercel (VERCEL is set): background workers do not run
+    between requests there. It is also skipped when its database cannot be opened.
+
+    Reads EMAIL_OUTBOX_PATH (SQLite file, default email_outbox.sqlite3 in the
+    temporary directory), EMAIL_OUTBOX_WORKERS (default 2), EMAIL_MAX_ATTEMPTS
+    (default 6) and EMAIL_RATE_PER_MINUTE (default 60, 0 disables the limit).
+    """
+    global _outbox, _outbox_unavailable
+    if _outbox is not None or _outbox_unavailable:
+        return _outbox
+    with _pool_lock:
+        if _outbox is None and not _outbox_unavailable:
+            if os.getenv('VERCEL'):
+                _outbox_unavailable = True
+                return None
+            default_path = os.path.join(tempfile.gettempdir(), 'email_outbox.sqlite3')
+            try:
+                _outbox = EmailOutbox(
+                    os.getenv('EMAIL_OUTBOX_PATH', default_path),
+                    {'late_notice': _deliver_late_notice},
+                    workers=int(os.getenv('EMAIL_OUTBOX_WORKERS', 2)),
+                    max_attempts=int(os.getenv('EMAIL_MAX_ATTEMPTS', 6)),
+                    rate_per_minute=float(os.getenv('EMAIL_RATE_PER_MINUTE', 60)),
+                )
+            except Exception as e:
+                print(f"Email outbox unavailable, sending emails inline: {e}")
+                _outbox_unavailable = True
+    return _outbox
+
+
+def queue_late_notices(recipients_data):
+    """
+    Queue late return emails in the outbox; without an outbox (see
+    get_email_outbox) they are sent inline with send_multiple_late_notices.
+    
+    Args:
+        recipients_data (list): Same format as send_multiple_late_notices
+    
+    Returns:
+        dict: Success status, the recipient emails that were sent (inline) or
+              queued, and the outbox message ids
+    """
+    outbox = get_email_outbox()
+    if outbox is None:
+        return {**send_multiple_late_notices(recipients_data), "queued": [], "message_ids": []}
+    try:
+        message_ids = [outbox.enqueue('late_notice', {
+            'email': recipient['email'],
+            'name': recipient['name'],
+            'book_title': recipient['book_title'],
+            'due_date': recipient['due_date'],
+            'days_late': recipient['days_late']
+        }) for recipient in recipients_data]
+        return {
+            "success": True,
+            "sent": [],
+            "failed": [],
+            "queued": [recipient['email'] for recipient in recipients_data],
+            "message_ids": message_ids,
+            "message": f"Queued {len(message_ids)} emails for delivery"
+        }
+    except Exception as e:
+        print(f"Error queueing late notices: {e}")
+        return {
+            "success": False,
+            "sent": [],
+            "failed": [{'email': recipient['email'], 'reason': str(e)} for recipient in recipients_data],
+            "queued": [],
+            "message_ids": [],
+            "message": f"Failed to queue emails: {str(e)}"
+        }
+
+
+def start_email_outbox():
+    """
+    Start the outbox workers so messages left over from a previous run are delivered.
+    """
+    outbox = get_email_outbox()
+    if outbox is not None:
+        outbox.start()
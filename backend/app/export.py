@@ -0,0 +1,111 @@
+"""
+Streaming CSV / XLSX exports.
+
+The export endpoints hand an iterator of row dicts (paged from Supabase by the
+iter_* functions in database.py) to export_response, which streams the file
+to the client as a generator response. Memory stays flat whatever the number
+of rows: CSV is written in small chunks, and XLSX uses an openpyxl write-only
+workbook (rows go to a temporary file) that is streamed once complete.
+"""
+
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+CSV_FLUSH_ROWS = 500
+STREAM_CHUNK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def parse_format(value):
+    """
+    Parse the `format` query parameter (csv by default).
+    Raises ValueError for an unsupported format.
+    """
+    fmt = (value or 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format: {value}. Expected one of: {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+def _cell(value):
+    """
+    Cell value for nested or non-scalar API values (written as text).
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def iter_csv(columns, rows):
+    """
+    Yield a CSV file in chunks of CSV_FLUSH_ROWS rows.
+    Starts with a UTF-8 byte order mark so spreadsheet programs detect the encoding.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_cell(row.get(column)) for column in columns])
+        if count % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_xlsx(columns, rows, sheet_title='Export'):
+    """
+    Yield an XLSX file built with a write-only workbook.
+    The file can only be sent once it is complete, so rows are written first and the
+    finished workbook is then streamed from a temporary file.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title[:31])
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([_cell(row.get(column)) for column in columns])
+
+    fd, path = tempfile.mkstemp(prefix='export-', suffix='.xlsx')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            workbook.save(output)
+        with open(path, 'rb') as output:
+            while True:
+                chunk = output.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_response(fmt, name, columns, rows):
+    """
+    Build the streamed download response.
+    :param fmt: 'csv' or 'xlsx' (see parse_format).
+    :param name: Base file name, e.g. 'resources'; the date is appended.
+    :param columns: Column keys, in order; also the header row.
+    :param rows: Iterator of row dicts.
+    """
+    filename = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    if fmt == 'xlsx':
+        body = iter_xlsx(columns, rows, sheet_title=name)
+        mimetype = XLSX_MIMETYPE
+    else:
+        body = iter_csv(columns, rows)
+        mimetype = 'text/csv; charset=utf-8'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
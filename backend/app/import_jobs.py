@@ -0,0 +1,239 @@
+"""
+Background jobs for spreadsheet imports.
+
+POST /api/resources/import spools the upload to a temporary file and starts a
+job. A worker process parses and validates the file
+(resource_import.parse_workbook) and streams validated batches back; the job
+thread inserts each batch as soon as it arrives. Clients poll
+GET /api/resources/import/<job_id> for progress.
+
+A dry run goes through the same validation and duplicate checks but writes
+nothing, so the report lists every row error and duplicate up front.
+
+Jobs are tracked in memory, per process: with several server processes the
+poll must reach the process that accepted the upload. On Vercel (VERCEL is
+set) there is no process left running after the response, so the import runs
+inline in the request instead and the finished job is returned directly.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from app.resource_import import parse_workbook, format_row_errors
+
+MAX_ERRORS_REPORTED = 1000
+
+
+class ImportJob:
+    """
+    Progress of one import; every field is read by the polling endpoint.
+    """
+
+    def __init__(self, path, user_email, chunk_size, dry_run=False):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.user_email = user_email
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.status = 'queued'
+        self.message = None
+        self.rows_read = 0
+        self.rows_valid = 0
+        self.rows_imported = 0
+        self.rows_failed = 0
+        self.errors = []
+        self.duplicates = []
+        self.duplicate_count = 0
+        self.done = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def add_errors(self, errors):
+        self.rows_failed += len(errors)
+        self.errors.extend(errors[:max(0, MAX_ERRORS_REPORTED - len(self.errors))])
+
+    def add_duplicates(self, duplicates):
+        self.duplicate_count += len(duplicates)
+        self.duplicates.extend(duplicates[:max(0, MAX_ERRORS_REPORTED - len(self.duplicates))])
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0
+        return {
+            'job_id': self.id,
+            'dry_run': self.dry_run,
+            'status': self.status,
+            'message': self.message,
+            'rows_processed': self.rows_read,
+            'rows_valid': self.rows_valid,
+            'rows_imported': self.rows_imported,
+            'rows_failed': self.rows_failed,
+            'errors': format_row_errors(self.errors) if self.errors else None,
+            'errors_truncated': self.rows_failed > len(self.errors),
+            'duplicates': sorted(self.duplicates, key=lambda d: d['row']) if self.duplicates else None,
+            'duplicates_truncated': self.duplicate_count > len(self.duplicates),
+            'elapsed_seconds': round(elapsed, 2),
+            'rows_per_second': round(self.rows_read / elapsed, 1) if elapsed else 0,
+            'done': self.status in ('completed', 'failed'),
+        }
+
+
+class ImportJobManager:
+    """
+    Runs import jobs (at most `max_running` at once) and keeps the most recent ones for polling.
+    """
+
+    def __init__(self, insert_rows, record_import, load_identifiers, max_running=2, keep=100,
+                 parse_timeout=3600, inline=False):
+        """
+        :param insert_rows: Callable(rows, chunk_size) -> (imported, errors), see database.insert_resource_rows.
+        :param record_import: Callable(user_email, imported) run once a job is finished.
+        :param load_identifiers: Callable returning the catalog's identifier sets, see
+                                 database.get_resource_identifiers.
+        :param inline: Run each job to completion inside submit(), without a thread or a
+                       worker process (serverless hosts freeze both once the response is sent).
+        """
+        self.insert_rows = insert_rows
+        self.record_import = record_import
+        self.load_identifiers = load_identifiers
+        self.keep = keep
+        self.parse_timeout = parse_timeout
+        self.inline = inline
+        self._slots = threading.Semaphore(max_running)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, path, user_email, chunk_size=500, dry_run=False):
+        """
+        Start importing the spooled file at `path`; the file is deleted once the job ends.
+        :param dry_run: Only validate and report, insert nothing.
+        """
+        job = ImportJob(path, user_email, chunk_size, dry_run)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                oldest = next(iter(self._jobs))
+                if not self._jobs[oldest].finished_at:
+                    break
+                self._jobs.pop(oldest)
+        if self.inline:
+            self._run(job)
+        else:
+            threading.Thread(target=self._run, args=(job,), name=f'import-{job.id[:8]}', daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        with self._slots:
+            job.started_at = time.time()
+            job.status = 'running'
+            try:
+                status = self._import(job)
+            except Exception as e:
+                print(f"Error in import job {job.id}: {e}")
+                status = 'failed'
+                job.message = str(e)
+            finally:
+                try:
+                    os.remove(job.path)
+                except OSError:
+                    pass
+            # Caches and the search index are reset before the job reports it is done,
+            # so a client that reloads the catalog then sees the imported rows
+            if not job.dry_run:
+                try:
+                    self.record_import(job.user_email, job.rows_imported)
+                except Exception as e:
+                    print(f"Error recording import job {job.id}: {e}")
+            job.finished_at = time.time()
+            job.status = status
+            job.done.set()
+
+    def _import(self, job):
+        """
+        Parse and insert the file; sets job.message and returns the final status.
+        """
+        existing = self.load_identifiers()
+        if self.inline:
+            results = _InlineResults(lambda message: self._handle(job, message))
+            parse_workbook(job.path, results, job.chunk_size, existing)
+            return results.status or 'failed'
+
+        # Spawn, not fork: a forked child would inherit the parent's threads' locks
+        # (log writer, schedulers, the Supabase client) in whatever state they were in
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue(maxsize=8)
+        worker = context.Process(target=parse_workbook, args=(job.path, results, job.chunk_size, existing),
+                                 daemon=True)
+        worker.start()
+        deadline = time.monotonic() + self.parse_timeout
+        try:
+            while True:
+                alive = worker.is_alive()
+                try:
+                    message = results.get(timeout=1)
+                except queue.Empty:
+                    # Checked before waiting, so anything the worker sent before exiting was read
+                    if not alive:
+                        raise RuntimeError('The import worker stopped unexpectedly')
+                    if time.monotonic() > deadline:
+                        raise RuntimeError('The import took too long')
+                    continue
+                status = self._handle(job, message)
+                if status:
+                    return status
+        finally:
+            worker.join(5)
+            if worker.is_alive():
+                worker.terminate()
+
+    def _handle(self, job, message):
+        """
+        Apply one message from parse_workbook; returns the final status once there is one.
+        """
+        if message[0] == 'batch':
+            _, rows, errors, duplicates, read = message
+            job.rows_valid += len(rows)
+            job.add_duplicates(duplicates)
+            if not job.dry_run:
+                imported, insert_errors = self.insert_rows(rows, job.chunk_size)
+                job.rows_imported += imported
+                errors = errors + insert_errors
+            job.add_errors(errors)
+            job.rows_read = read
+            return None
+        if message[0] == 'done':
+            job.rows_read = message[1]
+            if job.dry_run:
+                job.message = (f"Dry run completed. {job.rows_valid} resources would be imported, "
+                               f"{job.rows_failed} rows have errors.")
+            else:
+                job.message = f"Import completed. Successfully imported {job.rows_imported} resources."
+            return 'completed'
+        job.message = message[1]
+        return 'failed'
+
+
+class _InlineResults:
+    """
+    Stands in for the worker's queue when parse_workbook runs in the request thread:
+    every message is handled as soon as it is put.
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.status = None
+
+    def put(self, message):
+        status = self.handle(message)
+        if status:
+            self.status = status
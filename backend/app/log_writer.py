@@ -0,0 +1,148 @@
+"""
+Background writer for the audit log (Logs table).
+
+add_log used to insert one row per call on the request's critical path.
+Records are now put on a bounded queue and a worker thread flushes them as
+multi-row inserts, whenever `batch_size` records are waiting or
+`flush_interval` seconds have passed. Pending records are flushed when the
+process exits.
+
+Set LOG_WRITER_SYNC=1 to insert every record immediately instead (tests,
+one-off scripts). This is the default on Vercel (VERCEL is set), where the
+process is frozen between requests and a background thread would lose records;
+LOG_WRITER_SYNC=0 forces the background writer there.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+class LogWriter:
+    """
+    Batches log rows and hands them to `insert_rows(rows)` from a worker thread.
+    """
+
+    def __init__(self, insert_rows, batch_size=50, flush_interval=2.0, max_queue=10000,
+                 max_attempts=3, synchronous=False):
+        self.insert_rows = insert_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.synchronous = synchronous
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.stats = {'written': 0, 'failed': 0, 'batches': 0}
+
+    def write(self, row):
+        """
+        Queue a log row for insertion. Returns True once the row is accepted.
+        If the queue is full, the row is inserted synchronously instead of being dropped.
+        """
+        if self.synchronous or self._stop.is_set():
+            return self._insert([row])
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            return self._insert([row])
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued row has been written (or timeout expires).
+        """
+        if self._thread is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+
+    def close(self, timeout=10):
+        """
+        Stop the worker after writing everything still queued.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Anything left (worker never started or timed out) is written here
+        self._insert(self._drain())
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._insert(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _drain(self):
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                return rows
+            self._queue.task_done()
+
+    def _insert(self, rows):
+        if not rows:
+            return True
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.insert_rows(rows)
+                self.stats['written'] += len(rows)
+                self.stats['batches'] += 1
+                return True
+            except Exception as e:
+                print(f"Error inserting {len(rows)} log rows (attempt {attempt}/{self.max_attempts}): {e}")
+                if attempt < self.max_attempts:
+                    time.sleep(0.2 * attempt)
+        self.stats['failed'] += len(rows)
+        return False
+
+
+def create_log_writer(insert_rows):
+    """
+    Build the process-wide log writer from the environment and flush it on exit.
+    """
+    sync = os.getenv('LOG_WRITER_SYNC')
+    if sync is None or not sync.strip():
+        synchronous = bool(os.getenv('VERCEL'))
+    else:
+        synchronous = sync.strip().lower() in ('1', 'true', 'yes')
+    writer = LogWriter(
+        insert_rows,
+        batch_size=int(os.getenv('LOG_WRITER_BATCH_SIZE', 50)),
+        flush_interval=float(os.getenv('LOG_WRITER_FLUSH_INTERVAL', 2.0)),
+        max_queue=int(os.getenv('LOG_WRITER_MAX_QUEUE', 10000)),
+        synchronous=synchronous,
+    )
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,138 @@
+"""
+In-process scheduler that marks loans as late when their due date passes.
+
+Active loans are kept in a min-heap of (due timestamp, res_id). The heap is
+seeded once from the startup scan in mark_late_reservations and kept up to
+date by the reservation write functions, so a worker thread only wakes up
+for the loans that have just become overdue instead of rescanning every
+active loan.
+
+Entries are never removed from the heap directly: a later schedule() or
+cancel() for the same reservation makes the older heap entry stale and it is
+skipped when popped.
+"""
+
+import heapq
+import threading
+import time
+
+
+class OverdueScheduler:
+    """
+    Min-heap of loan due dates with a worker that hands expired loans to `mark_late(res_ids)`.
+    """
+
+    def __init__(self, mark_late, max_wait=300, batch_delay=1.0, retry_delay=60):
+        """
+        :param mark_late: Callable receiving a list of reservation ids whose due date has passed.
+        :param max_wait: Upper bound (seconds) between two wake-ups of the worker.
+        :param batch_delay: Extra wait so loans due at the same time are marked together.
+        :param retry_delay: Seconds before loans are retried when mark_late raises.
+        """
+        self.mark_late = mark_late
+        self.max_wait = max_wait
+        self.batch_delay = batch_delay
+        self.retry_delay = retry_delay
+        self._heap = []
+        self._due = {}
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    def schedule(self, res_id, due_date):
+        """
+        Add or move the due date of an active loan.
+        :param due_date: Timezone-aware datetime.
+        """
+        due = due_date.timestamp()
+        with self._cond:
+            if self._due.get(res_id) == due:
+                return
+            self._due[res_id] = due
+            heapq.heappush(self._heap, (due, res_id))
+            # Only wake the worker if this loan is now the next one due
+            if self._heap[0] == (due, res_id):
+                self._cond.notify()
+
+    def cancel(self, res_id):
+        """
+        Stop tracking a loan (returned, marked late or deleted).
+        """
+        with self._cond:
+            self._due.pop(res_id, None)
+
+    def next_due(self):
+        """
+        Timestamp of the next tracked due date, or None.
+        """
+        with self._cond:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self):
+        return len(self._due)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._cond:
+            if self.running:
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name='overdue-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pop_expired(self, now=None):
+        """
+        Remove and return the ids of every tracked loan whose due date is before `now`.
+        """
+        now = time.time() if now is None else now
+        expired = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due, res_id = heapq.heappop(self._heap)
+                if self._due.get(res_id) == due:
+                    del self._due[res_id]
+                    expired.append(res_id)
+        return expired
+
+    def _discard_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop:
+                    self._discard_stale()
+                    wait = self.max_wait
+                    if self._heap:
+                        wait = min(wait, self._heap[0][0] - time.time())
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._stop:
+                    return
+            time.sleep(self.batch_delay)
+            expired = self.pop_expired()
+            if not expired:
+                continue
+            try:
+                self.mark_late(expired)
+            except Exception as e:
+                print(f"Error marking {len(expired)} reservations as late: {e}")
+                retry_at = time.time() + self.retry_delay
+                with self._cond:
+                    for res_id in expired:
+                        if res_id not in self._due:
+                            self._due[res_id] = retry_at
+                            heapq.heappush(self._heap, (retry_at, res_id))
@@ -0,0 +1,72 @@
+"""
+Helpers shared by the cursor (keyset) paginated list endpoints.
+
+A cursor is an opaque, URL-safe token wrapping the sort key values of the
+last row of a page. Clients only pass it back as `after` to get the next page.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    """
+    Encode the sort key values of the last returned row into a cursor string.
+    :param values: JSON-serializable dict, e.g. {'id': 42, 'date': '2024-05-01'}
+    """
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, dict):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Parse a `limit` query parameter, clamped to [1, maximum].
+    Raises ValueError if the value is not a number.
+    """
+    if value is None or value == '':
+        return default
+    return max(1, min(int(value), maximum))
+
+
+def parse_int_param(value, name):
+    """
+    Parse an optional integer query parameter (None when absent or empty).
+    Raises ValueError naming the parameter if the value is not an integer.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+
+def parse_date_param(value, end_of_range=False):
+    """
+    Parse an ISO date or date-time query parameter into an ISO string.
+    A bare date used as the (exclusive) end of a range covers that whole day.
+    Raises ValueError if the value is not an ISO date.
+    """
+    parsed = datetime.fromisoformat(value)
+    if end_of_range and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
@@ -0,0 +1,50 @@
+"""
+Sparse field projection for the list endpoints (`?fields=title,author,...`).
+
+A field spec maps each public key of an API object to the Supabase columns it
+is built from and a getter that reads the value from a raw row:
+
+    {'title': (['r_title'], lambda row: row['r_title']), ...}
+
+From a list of requested keys we can then narrow the select() string and only
+build the keys that were asked for.
+"""
+
+
+def parse_fields(value, spec):
+    """
+    Parse a comma separated `fields` query parameter.
+    Returns the list of requested keys, or None when every key is wanted.
+    Raises ValueError for keys that are not in the spec.
+    """
+    if not value:
+        return None
+    keys = []
+    for key in value.split(','):
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    unknown = [key for key in keys if key not in spec]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(spec)}")
+    return keys or None
+
+
+def select_columns(spec, keys=None, required=()):
+    """
+    Build the select() string for the given keys (all keys when None).
+    :param required: Extra columns that must always be selected (e.g. keyset columns).
+    """
+    columns = list(required)
+    for key in (keys or spec):
+        for column in spec[key][0]:
+            if column not in columns:
+                columns.append(column)
+    return ", ".join(columns)
+
+
+def project(spec, row, keys=None):
+    """
+    Build the API dict for a raw row, limited to the given keys (all keys when None).
+    """
+    return {key: spec[key][1](row) for key in (keys or spec)}
@@ -0,0 +1,252 @@
+"""
+Spreadsheet import of resources (books).
+
+Records are validated column-wise with pandas/NumPy (validate_records) and
+turned into Resource row dicts up front; the valid ones are then inserted in
+chunks by database.insert_resource_rows. Errors are reported with the
+spreadsheet row number (the header is row 1).
+
+Identifiers are checked against the catalog (a preloaded set per identifier,
+see database.get_resource_identifiers) and against earlier rows of the same
+file. A duplicate inventory number or RFID rejects the row; a duplicate ISBN
+is only reported, since a library holds several copies of the same book.
+
+parse_workbook runs in a separate process for import jobs (see import_jobs.py):
+it streams the sheet with openpyxl in read-only mode and sends validated
+batches back over a queue, so large files never sit in memory as a whole.
+"""
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = ["inventoryNum", "title", "author", "editor", "ISBN", "price",
+                    "cote", "receivingDate", "status", "observation", "type", "description"]
+OPTIONAL_COLUMNS = ["edition", "resume", "rfid"]
+
+# Spreadsheet column -> Resource column for the plain text fields
+TEXT_COLUMNS = {
+    "inventoryNum": "r_inventoryNum",
+    "title": "r_title",
+    "author": "r_author",
+    "editor": "r_editor",
+    "edition": "r_edition",
+    "resume": "r_resume",
+    "ISBN": "r_ISBN",
+    "cote": "r_cote",
+    "observation": "r_observation",
+    "description": "r_description",
+}
+
+STATUS_MAP = {
+    "available": 1,
+    "unavailable": 0,
+}
+
+# Identifiers checked for duplicates; True when a duplicate rejects the row
+IDENTIFIERS = {
+    "inventoryNum": True,
+    "rfid": True,
+    "ISBN": False,
+}
+
+FIRST_DATA_ROW = 2
+
+
+def missing_columns(columns):
+    """
+    Required columns absent from the spreadsheet header.
+    """
+    return [col for col in REQUIRED_COLUMNS if col not in columns]
+
+
+def normalize_identifier(field, value):
+    """
+    Canonical form of an identifier, shared by the catalog sets and the import:
+    trimmed text, and ISBNs without dashes or spaces.
+    """
+    if value is None:
+        return ""
+    value = str(value).strip()
+    if field == "ISBN":
+        value = value.replace("-", "").replace(" ", "").upper()
+    return value
+
+
+def _text_column(column):
+    """
+    Cells as trimmed text; empty cells become "" and whole numbers read as
+    floats by the spreadsheet reader (e.g. 1234.0) lose their decimal part.
+    """
+    numbers = pd.to_numeric(column, errors='coerce')
+    whole = numbers.notna() & (numbers % 1 == 0) & column.map(lambda v: isinstance(v, float))
+    text = column.astype(object).where(column.notna(), "").astype(str).str.strip()
+    text[whole] = numbers[whole].astype(np.int64).astype(str)
+    return text
+
+
+def _first_error(checks, index):
+    """
+    Combine (mask, message series) checks into one message per row, keeping the first failing check.
+    """
+    errors = pd.Series([None] * len(index), index=index, dtype=object)
+    for mask, message in reversed(checks):
+        errors = errors.mask(mask, message)
+    return errors
+
+
+def validate_records(records, first_row=FIRST_DATA_ROW, existing=None, seen=None):
+    """
+    Validate spreadsheet records column-wise.
+    :param records: List of dicts (spreadsheet column -> cell value), in spreadsheet order.
+    :param first_row: Spreadsheet row number of the first record.
+    :param existing: Dict of identifier field -> set of normalized values already in the catalog.
+    :param seen: Dict of identifier field -> {normalized value: row number} for earlier rows of
+                 the same file; updated in place so consecutive batches share it.
+    :return: (rows, errors, duplicates): rows is a list of (row_number, resource_row),
+             errors a list of (row_number, message) and duplicates a list of dicts
+             with row, field, value and where the value already exists.
+    """
+    existing = existing or {}
+    seen = seen if seen is not None else {}
+    if not records:
+        return [], [], []
+
+    df = pd.DataFrame.from_records(records)
+    for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    df = df.replace(r'^\s*$', np.nan, regex=True)
+
+    # Blank lines
+    df = df[df[REQUIRED_COLUMNS + OPTIONAL_COLUMNS].notna().any(axis=1)]
+    if df.empty:
+        return [], [], []
+
+    raw_status = df["status"]
+    status_text = raw_status.astype(str).str.strip().str.lower()
+    status_value = pd.to_numeric(raw_status, errors='coerce') \
+        .fillna(status_text.map(STATUS_MAP).where(raw_status.map(lambda v: isinstance(v, str))))
+    type_value = pd.to_numeric(df["type"], errors='coerce')
+    price_value = pd.to_numeric(df["price"], errors='coerce')
+
+    checks = [
+        (df["title"].isna(), "Title is required"),
+        (raw_status.isna(), "Status is required"),
+        (status_value.isna(),
+         "Invalid status: " + raw_status.astype(str) + ". Expected: Available or Unavailable"),
+        (type_value.isna(), "Type must be a resource type ID number, not a text name"),
+        (df["price"].notna() & price_value.isna(), "Invalid price format: " + df["price"].astype(str)),
+    ]
+
+    # Duplicate identifiers, against the catalog and earlier rows of the file
+    duplicates = []
+    for field, rejects in IDENTIFIERS.items():
+        values = _text_column(df[field]).map(lambda v: normalize_identifier(field, v))
+        present = values != ""
+        in_catalog = present & values.isin(existing.get(field, ()))
+        field_seen = seen.setdefault(field, {})
+        earlier = present & ~in_catalog & values.isin(field_seen.keys())
+        in_batch = present & ~in_catalog & ~earlier & values.duplicated(keep='first')
+        first_rows = pd.Series(values.index, index=values.index).groupby(values).transform('first')
+
+        for row_number in values.index[in_catalog]:
+            duplicates.append({'row': int(row_number), 'field': field, 'value': values[row_number],
+                               'existing': 'catalog'})
+        for row_number in values.index[earlier | in_batch]:
+            first = field_seen.get(values[row_number], first_rows[row_number])
+            duplicates.append({'row': int(row_number), 'field': field, 'value': values[row_number],
+                               'existing': f"row {int(first)}"})
+        for value, row_number in zip(values[present & ~values.duplicated(keep='first')],
+                                     values.index[present & ~values.duplicated(keep='first')]):
+            field_seen.setdefault(value, int(row_number))
+
+        if rejects:
+            checks.append((in_catalog, f"Duplicate {field}: already in the catalog"))
+            checks.append((earlier | in_batch, f"Duplicate {field}: already in this file"))
+
+    errors = _first_error(checks, df.index)
+    valid = errors.isna()
+
+    rows_df = pd.DataFrame({
+        resource_column: _text_column(df[column]) for column, resource_column in TEXT_COLUMNS.items()
+    }, index=df.index)
+    rows_df["r_price"] = price_value.fillna(0)
+    rows_df["r_receivingDate"] = df["receivingDate"].map(lambda v: str(v) if pd.notna(v) else None)
+    rows_df["r_status"] = status_value
+    rows_df["r_type"] = type_value
+    rfid = _text_column(df["rfid"])
+    rows_df["r_rfid"] = rfid.where(rfid != "", None)
+    rows_df = rows_df[valid]
+    for column in ("r_price", "r_status", "r_type"):
+        rows_df[column] = rows_df[column].astype(np.int64)
+
+    rows_df = rows_df.astype(object).where(rows_df.notna(), None)
+
+    rows = list(zip((int(i) for i in rows_df.index), rows_df.to_dict('records')))
+    errors = [(int(row_number), message) for row_number, message in errors[~valid].items()]
+    return rows, errors, duplicates
+
+
+def format_row_errors(errors):
+    """
+    Turn (row_number, message) pairs into the "Row N: message" strings returned by the API.
+    """
+    return [f"Row {row_number}: {message}" for row_number, message in sorted(errors)]
+
+
+def iter_workbook_records(path):
+    """
+    Stream the first sheet of an .xlsx file as (header, records) without loading it
+    into memory. Records are dicts keyed by the header cells.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+
+        def records():
+            try:
+                for values in rows:
+                    yield dict(zip(header, values))
+            finally:
+                workbook.close()
+
+        return header, records()
+    except Exception:
+        workbook.close()
+        raise
+
+
+def parse_workbook(path, out_queue, batch_size=500, existing=None):
+    """
+    Worker process entry point: validate an .xlsx file and put the results on `out_queue`.
+    Messages are ('batch', rows, errors, duplicates, records_read) for every `batch_size`
+    records, then ('done', records_read), or ('failed', message).
+    :param existing: Identifier sets of the catalog, see validate_records.
+    """
+    try:
+        header, records = iter_workbook_records(path)
+        missing = missing_columns(header)
+        if missing:
+            out_queue.put(('failed', f"Missing columns: {', '.join(missing)}"))
+            return
+        read = 0
+        seen = {}
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                rows, errors, duplicates = validate_records(batch, FIRST_DATA_ROW + read, existing, seen)
+                read += len(batch)
+                out_queue.put(('batch', rows, errors, duplicates, read))
+                batch = []
+        if batch:
+            rows, errors, duplicates = validate_records(batch, FIRST_DATA_ROW + read, existing, seen)
+            read += len(batch)
+            out_queue.put(('batch', rows, errors, duplicates, read))
+        out_queue.put(('done', read))
+    except Exception as e:
+        out_queue.put(('failed', f"Error processing file: {str(e)}"))
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..database import get_transaction_details, get_user_details, add_log
-from ..email_service import send_late_return_email, send_multiple_late_notices
+from ..database import get_transaction_details_bulk, get_user_details, add_log
+from ..email_service import queue_late_notices, get_email_outbox
 from datetime import datetime
 
 late_returns_bp = Blueprint('late_returns', __name__)
@@ -27,9 +27,14 @@ def send_late_notices():
     
     recipients_data = []
     
+    # Get the details of every selected transaction in one go
+    try:
+        transactions = get_transaction_details_bulk([int(transaction_id) for transaction_id in transaction_ids])
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Invalid transaction ids"}), 400
+    
     for transaction_id in transaction_ids:
-        # Get transaction details
-        transaction = get_transaction_details(transaction_id)
+        transaction = transactions.get(int(transaction_id))
         if not transaction:
             print(f"No transaction details found for ID: {transaction_id}")
             continue
@@ -44,8 +49,13 @@ def send_late_notices():
             print(f"Transaction ID {transaction_id} is not marked as late")
             continue
             
-        # Format the due date for display
+        # Skip if the due date cannot be computed (e.g. no reservation date)
         due_date = transaction.get('due_date')
+        if not due_date:
+            print(f"No due date found for transaction ID: {transaction_id}")
+            continue
+            
+        # Format the due date for display
         formatted_due_date = due_date.split('T')[0] if 'T' in due_date else due_date
         
         # Calculate days late for display purposes only
@@ -67,11 +77,28 @@ def send_late_notices():
     if not recipients_data:
         return jsonify({"success": False, "message": "No valid recipients found"}), 400
     
-    # Send emails to all recipients
-    result = send_multiple_late_notices(recipients_data)
+    # Queue emails for all recipients; the outbox workers deliver them
+    result = queue_late_notices(recipients_data)
     
-    if result['success']:
-        # Log the action
+    # Log the action
+    if result['queued']:
+        add_log(user_email, f"queued late return notices to {len(result['queued'])} users")
+    if result['sent']:
         add_log(user_email, f"sent late return notices to {len(result['sent'])} users")
         
-    return jsonify(result)
\ No newline at end of file
+    return jsonify(result)
+
+@late_returns_bp.route('/email-outbox/stats', methods=['GET'])
+@jwt_required()
+def email_outbox_stats():
+    """
+    Queue depth and delivery stats of the email outbox.
+    Pass ?dead_letters=1 to include the most recent dead-lettered messages.
+    """
+    outbox = get_email_outbox()
+    if outbox is None:
+        return jsonify({"success": False, "message": "Emails are sent inline, there is no outbox"}), 404
+    stats = outbox.stats()
+    if request.args.get('dead_letters') in ('1', 'true'):
+        stats['dead_letters'] = outbox.dead_letters()
+    return jsonify({"success": True, "stats": stats})
\ No newline at end of file
@@ -4,14 +4,80 @@ from flask import jsonify, request
 from flask_jwt_extended import jwt_required
 from app import app
 import datetime
-from app.database import get_logs
+from app.database import LOG_EXPORT_COLUMNS, get_logs, iter_logs, get_staff_id_by_email
+from app.export import parse_format, export_response
+from app.pagination import parse_limit, parse_date_param
 
 
 @app.route('/api/logs', methods=['GET'])
 @jwt_required()
 def fetch_logs():
     """
-    Fetch logs (authentication required).
+    Fetch logs (authentication required), newest first.
+    Query parameters:
+      limit       page size (default 15)
+      after       next_cursor of the previous page
+      staff_id    only logs written by this staff member
+      staff_email only logs written by the staff member with this email
+      from, to    date range (ISO dates or date-times, `to` is inclusive for dates)
+      q           text contained in the message
     """
-    logs = get_logs()  # call the function
-    return jsonify({"success": True, "logs": logs}), 200
+    try:
+        limit = parse_limit(request.args.get('limit'), default=15)
+        staff_id = request.args.get('staff_id', type=int)
+        staff_email = request.args.get('staff_email')
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        date_from = parse_date_param(date_from) if date_from else None
+        date_to = parse_date_param(date_to, end_of_range=True) if date_to else None
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid parameter: {e}"}), 400
+
+    if staff_email:
+        staff_id = get_staff_id_by_email(staff_email)
+        if staff_id is None:
+            return jsonify({"success": True, "logs": [], "next_cursor": None}), 200
+
+    try:
+        page = get_logs(
+            limit=limit,
+            after=request.args.get('after'),
+            staff_id=staff_id,
+            date_from=date_from,
+            date_to=date_to,
+            search=request.args.get('q')
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        print(f"Error fetching logs: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({"success": True, "logs": page['logs'], "next_cursor": page['next_cursor']}), 200
+
+
+@app.route('/api/logs/export', methods=['GET'])
+@jwt_required()
+def export_logs():
+    """
+    Download logs as a spreadsheet (`format=csv` or `format=xlsx`, csv by default), newest first.
+    Takes the same staff_id, staff_email, from, to and q filters as /api/logs.
+    """
+    try:
+        fmt = parse_format(request.args.get('format'))
+        staff_id = request.args.get('staff_id', type=int)
+        staff_email = request.args.get('staff_email')
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        date_from = parse_date_param(date_from) if date_from else None
+        date_to = parse_date_param(date_to, end_of_range=True) if date_to else None
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid parameter: {e}"}), 400
+
+    if staff_email:
+        staff_id = get_staff_id_by_email(staff_email)
+        if staff_id is None:
+            return export_response(fmt, 'logs', LOG_EXPORT_COLUMNS, iter(()))
+
+    logs = iter_logs(staff_id=staff_id, date_from=date_from, date_to=date_to, search=request.args.get('q'))
+    return export_response(fmt, 'logs', LOG_EXPORT_COLUMNS, logs)
@@ -1,18 +1,45 @@
 from flask import jsonify, request
 import supabase
 from app import app
-from app.database import add_reader, delete_reader, get_readers_by_status, get_user_types, add_user_type, add_resource_type, update_reader_status_in_db,update_user_type, update_reader,delete_user_type, get_reader_history, get_transactions, add_suggestion, fetch_all_suggestions, delete_suggestion
+from app.database import READER_FIELDS, add_reader, delete_reader, get_readers_by_status, iter_readers, get_user_types, add_user_type, add_resource_type, update_reader_status_in_db,update_user_type, update_reader,delete_user_type, get_reader_history, get_transactions, add_suggestion, fetch_all_suggestions, get_suggestions_page, delete_suggestion
 from flask_jwt_extended import create_access_token,jwt_required, get_jwt_identity
+from app.projection import parse_fields
+from app.export import parse_format, export_response
+from app.pagination import parse_limit, parse_date_param
+from app.versioning import conditional_get
 
 @app.route('/api/readers', methods=['GET'])
 @jwt_required()
 def readers():
     """
     API endpoint to retrieve all readers.
+    Optional `fields` query parameter (comma separated keys) limits the returned keys.
     """
-    reader_list = get_readers_by_status()
+    try:
+        fields = parse_fields(request.args.get('fields'), READER_FIELDS)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    reader_list = get_readers_by_status(fields=fields)
     return jsonify(reader_list)
 
+@app.route('/api/readers/export', methods=['GET'])
+@jwt_required()
+def export_readers():
+    """
+    Download readers as a spreadsheet (`format=csv` or `format=xlsx`, csv by default).
+    `status` selects verified (1, default) or pending (0) readers; `fields` limits the columns.
+    """
+    try:
+        fmt = parse_format(request.args.get('format'))
+        fields = parse_fields(request.args.get('fields'), READER_FIELDS)
+        status = int(request.args.get('status', 1))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    name = 'readers' if status == 1 else 'pending-readers'
+    return export_response(fmt, name, fields or list(READER_FIELDS), iter_readers(status, fields))
+
 @app.route('/api/pending-readers', methods=['GET'])
 def pending_readers():
     """
@@ -22,6 +49,7 @@ def pending_readers():
     return jsonify(pending_reader_list)
 
 @app.route("/api/user-types", methods=["GET"])
+@conditional_get
 def user_types():
     return jsonify(get_user_types())
 
@@ -232,8 +260,32 @@ def create_suggestion():
 @jwt_required()
 def get_all_suggestions():
     """
-    API endpoint to get all suggestions
+    API endpoint to get suggestions.
+    Without query parameters every suggestion is returned as a list.
+    With any of limit, after, user_id, from or to the suggestions are paginated
+    (newest first): the response is {"suggestions": [...], "next_cursor": "..."}.
     """
+    page_params = ('limit', 'after', 'user_id', 'from', 'to')
+    if any(param in request.args for param in page_params):
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            user_id = request.args.get('user_id', type=int)
+            date_from = request.args.get('from')
+            date_to = request.args.get('to')
+            page = get_suggestions_page(
+                limit=limit,
+                after=request.args.get('after'),
+                user_id=user_id,
+                date_from=parse_date_param(date_from) if date_from else None,
+                date_to=parse_date_param(date_to, end_of_range=True) if date_to else None
+            )
+            return jsonify(page), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            print(f"Error in get_all_suggestions route: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
     try:
         suggestions = fetch_all_suggestions()
         if not isinstance(suggestions, list):
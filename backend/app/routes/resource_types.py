@@ -6,9 +6,11 @@ from flask import jsonify, request
 from app import app
 from app.database import get_resource_types, add_resource_type, delete_resource_type, update_resource_type
 from flask_jwt_extended import create_access_token,jwt_required, get_jwt_identity
+from app.versioning import conditional_get
 
 @app.route('/api/resource-types', methods=['GET'])
 @jwt_required()
+@conditional_get
 def resource_types():
     """
     API endpoint to retrieve all resource types
@@ -2,52 +2,197 @@
 Routes related to resources (books and other library items)
 """
 
-from flask import jsonify, request
+from flask import jsonify, request, send_file
 from app import app
-from app.database import get_resources, add_resource, delete_resource, update_resource, get_resource_history, add_comment, get_comments, add_report, delete_comment, supabase, delete_report
-import pandas as pd
+from app.database import MAX_TOP_RESOURCES, RESOURCE_EXPORT_FIELDS, RESOURCE_FIELDS, get_trending_resources, get_resources, get_resources_page, get_resources_by_ids, iter_resources, get_resource_by_id, search_resources, add_resource, resource_import_jobs, delete_resource, update_resource, get_resource_history, get_resource_history_page, add_comment, get_comments, add_report, delete_comment, supabase, delete_report
+from app.covers import get_cover_resolver
+from app.export import parse_format, export_response
+from app.pagination import parse_int_param, parse_limit
+from app.projection import parse_fields
+from app.thumbnails import FORMATS, cover_version, get_thumbnail_store, snap_width
+from app.versioning import conditional_get
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 import io
-import requests
+import os
+import tempfile
 
 
+MAX_COVER_BATCH = 100
+
 @app.route("/api/book-cover", methods=['GET'])
 def get_cover():
+    """
+    Cover thumbnail of a book, looked up by `isbn` or by `title` (and optional `author`).
+    Answers are cached, see app/covers.py.
+    """
     title = request.args.get("title")
     author = request.args.get("author")
-    if not title:
+    isbn = request.args.get("isbn")
+    if not title and not isbn:
         return jsonify({"error": "Title parameter is required"}), 400
-    
+
+    thumbnail = get_cover_resolver().resolve(title, author, isbn)
+    return jsonify({"thumbnail": thumbnail})
+
+@app.route("/api/book-covers", methods=['POST'])
+def get_covers():
+    """
+    Prefetch the covers of several resources at once.
+    Body: {"resource_ids": [1, 2, ...]} (at most MAX_COVER_BATCH ids).
+    Returns {"covers": {"<id>": thumbnail or null}}; a resource's own cover_url wins over a lookup.
+    """
+    data = request.get_json(silent=True) or {}
+    resource_ids = data.get("resource_ids")
+    if not isinstance(resource_ids, list) or not all(isinstance(i, int) for i in resource_ids):
+        return jsonify({"error": "resource_ids must be a list of resource IDs"}), 400
+    if len(resource_ids) > MAX_COVER_BATCH:
+        return jsonify({"error": f"At most {MAX_COVER_BATCH} resources per request"}), 400
+
+    resources = get_resources_by_ids(set(resource_ids), fields=['id', 'title', 'author', 'isbn', 'image_url'])
+    covers = {resource['id']: resource['image_url'] for resource in resources if resource['image_url']}
+    missing = [resource for resource in resources if not resource['image_url']]
+    for resource, thumbnail in zip(missing, get_cover_resolver().resolve_many(missing)):
+        covers[resource['id']] = thumbnail
+    return jsonify({"covers": {str(resource_id): covers.get(resource_id) for resource_id in resource_ids}})
+
+COVER_MAX_AGE = int(os.getenv('COVER_MAX_AGE', 30 * 24 * 3600))
+
+@app.route('/api/covers/<int:resource_id>', methods=['GET'])
+def get_cover_thumbnail(resource_id):
+    """
+    Resized cover of a resource, from its cover_url or else the cover lookup.
+    Query parameters:
+      w       width in pixels (default 240), rounded up to a supported size
+      format  webp or jpeg (default: webp when the browser accepts it)
+      v       the resource's cover_version
+    Thumbnails are cached on disk and served with an ETag. Only a URL carrying the
+    current cover_version gets a long max-age: the cover behind an unversioned URL
+    can change, so browsers must revalidate it.
+    """
     try:
-        query = f"intitle:{title}"
-        if author:
-            query += f"+inauthor:{author}"
-        
-        res = requests.get(f"https://www.googleapis.com/books/v1/volumes?q={query}")
-        res.raise_for_status()
-        
-        data = res.json()
-        if not data.get("items"):
-            return jsonify({"thumbnail": None})
-        
-        item = data["items"][0]
-        image_links = item.get("volumeInfo", {}).get("imageLinks", {})
-        print(image_links)
-        
-        return jsonify({"thumbnail": image_links.get("thumbnail")})
-        
-    except requests.RequestException:
-        return jsonify({"thumbnail": None})
-    except Exception:
-        return jsonify({"thumbnail": None})
+        width = snap_width(request.args.get('w', 240))
+    except ValueError:
+        return jsonify({"error": f"Invalid width: {request.args.get('w')}"}), 400
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Invalid format: {fmt}. Expected one of: {', '.join(FORMATS)}"}), 400
+
+    try:
+        resource = get_resource_by_id(resource_id)
+    except Exception as e:
+        print(f"Error fetching resource {resource_id}: {e}")
+        return jsonify({"error": "Failed to fetch resource"}), 500
+    if resource is None:
+        return jsonify({"error": "Resource not found"}), 404
+    source = resource['image_url'] or get_cover_resolver().resolve(resource['title'], resource['author'], resource['isbn'])
+    if not source:
+        return jsonify({"error": "No cover for this resource"}), 404
+
+    try:
+        path, etag = get_thumbnail_store().thumbnail(source, width, fmt)
+    except Exception as e:
+        print(f"Error rendering cover of resource {resource_id}: {e}")
+        return jsonify({"error": "Cover image unavailable"}), 502
+
+    versioned = request.args.get('v') == cover_version(resource['image_url'], resource['title'],
+                                                       resource['author'], resource['isbn'])
+    response = send_file(path, mimetype=FORMATS[fmt][1], etag=etag, max_age=COVER_MAX_AGE if versioned else 0,
+                         conditional=True)
+    if not versioned:
+        response.cache_control.no_cache = True
+    if 'format' not in request.args:
+        response.vary.add('Accept')
+    return response
 
 @app.route('/api/resources', methods=['GET'])
+@conditional_get
 def resources():
     """
-    API endpoint to retrieve all resources (books)
+    API endpoint to retrieve resources (books).
+    Without query parameters the whole catalog is returned as a list.
+    With any of limit, after, sort, type or status the catalog is paginated:
+    the response is {"resources": [...], "next_cursor": "..."} and the next page
+    is requested by passing next_cursor back as `after`.
+    `fields` (comma separated keys, e.g. fields=id,title,author,image_url,status)
+    limits the keys returned for each resource.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), RESOURCE_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    page_params = ('limit', 'after', 'sort', 'type', 'status')
+    if not any(param in request.args for param in page_params):
+        resource_list = get_resources(fields)
+        return jsonify(resource_list)
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        resource_type = parse_int_param(request.args.get('type'), 'type')
+        status = parse_int_param(request.args.get('status'), 'status')
+        page = get_resources_page(
+            limit=limit,
+            after=request.args.get('after'),
+            sort=request.args.get('sort', 'id'),
+            resource_type=resource_type,
+            status=status,
+            fields=fields
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error fetching resources page: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(page)
+
+@app.route('/api/resources/export', methods=['GET'])
+@jwt_required()
+def export_resources():
+    """
+    Download the whole catalog as a spreadsheet (`format=csv` or `format=xlsx`, csv by default).
+    The columns are the keys of /api/resources; `fields` limits them.
     """
-    resource_list = get_resources()
-    return jsonify(resource_list)
+    try:
+        fmt = parse_format(request.args.get('format'))
+        fields = parse_fields(request.args.get('fields'), RESOURCE_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    fields = fields or RESOURCE_EXPORT_FIELDS
+    return export_response(fmt, 'resources', fields, iter_resources(fields))
+
+@app.route('/api/resources/trending', methods=['GET'])
+def trending_resources():
+    """
+    Resources borrowed the most lately (exponentially decayed borrow counts), for the
+    student home page. `limit` (default 5) sets how many.
+    """
+    limit = request.args.get('limit', default=5, type=int)
+    if not 0 < limit <= MAX_TOP_RESOURCES:
+        return jsonify({"error": f"limit must be between 1 and {MAX_TOP_RESOURCES}"}), 400
+    return jsonify(get_trending_resources(limit))
+
+@app.route('/api/resources/search', methods=['GET'])
+@conditional_get
+def search_resources_endpoint():
+    """
+    API endpoint to search resources (books) by title, author, editor, ISBN, cote or description.
+    Query parameters: q (search text), limit (maximum number of results, default 20)
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify([])
+
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    limit = max(1, min(limit, 100))
+
+    return jsonify(search_resources(query, limit))
 
 @app.route('/api/resources', methods=['POST'])
 @jwt_required()
@@ -79,6 +224,21 @@ def add_resource_endpoint():
             "error": result.get('error', 'An unknown error occurred')
         }), 500
 
+@app.route('/api/resources/<int:resource_id>', methods=['GET'])
+@conditional_get
+def get_resource_endpoint(resource_id):
+    """
+    API endpoint to retrieve a single resource by ID.
+    """
+    try:
+        resource = get_resource_by_id(resource_id)
+    except Exception as e:
+        print(f"Error fetching resource {resource_id}: {e}")
+        return jsonify({"error": "Failed to fetch resource"}), 500
+    if resource is None:
+        return jsonify({"error": "Resource not found"}), 404
+    return jsonify(resource)
+
 @app.route('/api/resources/<int:resource_id>', methods=['DELETE'])
 @jwt_required()
 def remove_resource(resource_id):
@@ -119,10 +279,21 @@ def update_resource_endpoint(resource_id):
         }), 400
 
 @app.route('/api/resources/import', methods=['POST'])
+@jwt_required()
 def import_resources():
     """
     API endpoint to import resources from Excel file
+    The upload is spooled to a temporary file and imported by a background job;
+    the response carries the job id to poll at /api/resources/import/<job_id>.
+    Valid rows are inserted in chunks of `chunk_size` rows (query parameter,
+    default RESOURCE_IMPORT_CHUNK_SIZE or 500); errors are reported per spreadsheet row.
+    With ?dry_run=1 nothing is written: the file is only validated and checked for
+    duplicates, and the full report is returned directly when it is ready within
+    RESOURCE_IMPORT_DRY_RUN_WAIT seconds (default 30).
+    On Vercel the import runs inside the request and the finished job is returned
+    with status 200 (there is nothing left to poll).
     """
+    user_email = get_jwt_identity()
     if 'file' not in request.files:
         return jsonify({"error": "No file provided"}), 400
         
@@ -134,107 +305,49 @@ def import_resources():
         return jsonify({"error": "File must be an Excel file (.xlsx)"}), 400
 
     try:
-        # Read Excel file
-        df = pd.read_excel(file, engine='openpyxl')
-        
-        # For debugging: Print first few rows
-        print("DEBUG - First 2 rows of Excel data:")
-        print(df.head(2))
-        
-        # Expected columns
-        required_columns = ["inventoryNum", "title", "author", "editor", "ISBN", "price", 
-                          "cote", "receivingDate", "status", "observation", "type", "description"]
-        
-        # Check if all required columns are present
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            return jsonify({"error": f"Missing columns: {', '.join(missing_columns)}"}), 400
-
-        # Map text values to integers for status and type
-        status_map = {
-            "Available": 1,
-            "Unavailable": 0,
-            "available": 1,
-            "unavailable": 0,
-        }
-
-        success_count = 0
-        errors = []
-
-        # Process each row
-        for index, row in df.iterrows():
-            try:
-                # Convert status from text to integer if needed
-                if isinstance(row["status"], str):
-                    if row["status"] in status_map:
-                        status_value = status_map[row["status"]]
-                    else:
-                        raise ValueError(f"Invalid status: {row['status']}. Expected: Available or Unavailable")
-                else:
-                    status_value = int(row["status"])
-                    
-                # Convert type to integer if it's not already
-                if isinstance(row["type"], str):
-                    # Try to convert it directly if it's a number in string form
-                    try:
-                        type_value = int(row["type"])
-                    except ValueError:
-                        # If conversion fails, add error message with hint about using type IDs
-                        errors.append(f"Row {index + 2}: Type must be a resource type ID number, not a text name")
-                        continue
-                else:
-                    type_value = int(row["type"])
-                
-                # Handle price properly - make sure it's a clean integer without decimal
-                price_raw = row["price"]
-                try:
-                    price_value = int(float(price_raw)) if price_raw else 0
-                except ValueError:
-                    errors.append(f"Row {index + 2}: Invalid price format: {price_raw}")
-                    continue
-                
-                resource_data = {
-                    "r_inventoryNum": str(row["inventoryNum"]),
-                    "r_title": str(row["title"]),
-                    "r_author": str(row["author"]),
-                    "r_editor": str(row["editor"]),
-                    "r_edition": str(row["edition"]),
-                    "r_resume": str(row["resume"]),
-                    "r_ISBN": str(row["ISBN"]),
-                    "r_price": price_value,  # Using the cleaned price value
-                    "r_cote": str(row["cote"]),
-                    "r_receivingDate": str(row["receivingDate"]),
-                    "r_status": status_value,
-                    "r_observation": str(row["observation"]),
-                    "r_type": type_value,
-                    "r_description": str(row["description"])
-                }
-                
-                print(f"DEBUG - Adding resource: {resource_data}")
-                result = add_resource(resource_data)
-                if result.get('success'):
-                    success_count += 1
-                else:
-                    errors.append(f"Row {index + 2}: {result.get('error', 'Unknown error')}")
-            
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-                print(f"Exception for row {index + 2}: {str(e)}")
-
-        return jsonify({
-            "message": f"Import completed. Successfully imported {success_count} resources.",
-            "errors": errors if errors else None,
-            "success": True
-        }), 200 if not errors else 207  # 207 Multi-Status if there were some errors
+        chunk_size = parse_limit(request.args.get('chunk_size'),
+                                 default=int(os.getenv('RESOURCE_IMPORT_CHUNK_SIZE', 500)), maximum=1000)
+    except ValueError:
+        return jsonify({"error": "chunk_size must be a number"}), 400
 
+    try:
+        # Spool the upload to disk; the job deletes the file when it is done
+        fd, path = tempfile.mkstemp(prefix='resource-import-', suffix='.xlsx')
+        os.close(fd)
+        file.save(path)
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true')
+        job = resource_import_jobs.submit(path, user_email, chunk_size=chunk_size, dry_run=dry_run)
     except Exception as e:
         print(f"Global error in import: {str(e)}")
         return jsonify({"error": f"Error processing file: {str(e)}"}), 500
 
+    if job.done.is_set() or (dry_run and job.done.wait(float(os.getenv('RESOURCE_IMPORT_DRY_RUN_WAIT', 30)))):
+        return jsonify({"success": job.status == 'completed', **job.to_dict()}), 200
+
+    return jsonify({
+        "success": True,
+        "message": "Dry run started." if dry_run else "Import started.",
+        "job_id": job.id,
+        "status_url": f"/api/resources/import/{job.id}"
+    }), 202
+
+@app.route('/api/resources/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_import_job(job_id):
+    """
+    Progress of a resource import job: rows processed, imported and failed,
+    throughput, and the per-row errors once available.
+    """
+    job = resource_import_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Import job not found"}), 404
+    return jsonify({"success": True, **job.to_dict()}), 200
+
 @app.route('/api/resource-history', methods=['GET'])
 def get_resource_history_route():
     """
-    API endpoint to retrieve the history of a resource
+    API endpoint to retrieve the history of a resource.
+    Pass limit (and then after=next_cursor) to page through long histories.
     """
     try:
         resource_id = request.args.get('resource_id')
@@ -250,6 +363,18 @@ def get_resource_history_route():
             print("Error: Invalid resource_id format")
             return jsonify({'error': 'Resource ID must be a number'}), 400
 
+        # Paginated form: {"history": [...], "next_cursor": "..."}
+        if 'limit' in request.args or 'after' in request.args:
+            try:
+                page = get_resource_history_page(
+                    resource_id,
+                    limit=parse_limit(request.args.get('limit')),
+                    after=request.args.get('after')
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify(page)
+
         print(f"Fetching history for resource {resource_id}")
         history = get_resource_history(resource_id)
         print(f"Retrieved history data: {history}")
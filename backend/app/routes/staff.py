@@ -3,6 +3,7 @@ from flask import jsonify, request, make_response
 from app.database import get_all_staff_members, add_staff_member, get_staff_types, add_staff_type, delete_staff_type, update_staff_type, assign_privileges_to_user_type, delete_staff_member, update_staff_member
 from app import app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.versioning import conditional_get
 
 @app.route('/api/staff', methods=['GET'])
 @jwt_required()  # Require a valid JWT to access this route
@@ -24,6 +25,7 @@ def handle_add_staff():
 
 @app.route('/api/staff-types', methods=['GET'])
 @jwt_required()
+@conditional_get
 def staff_types():
     """
     API endpoint to retrieve all staff types
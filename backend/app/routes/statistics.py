@@ -1,9 +1,9 @@
 # app/routes/dashboard.py or wherever your route handlers live
-from flask import jsonify
+from flask import jsonify, request
 from flask_jwt_extended import jwt_required
 from app import app
 from app.database import (
-    get_stats, get_monthly_borrows, get_most_borrowed_resources
+    MAX_MONTHLY_RANGE, MAX_TOP_RESOURCES, get_stats, get_monthly_borrows, get_most_borrowed_resources
 )
 
 @app.route('/api/stats', methods=['GET'])
@@ -19,8 +19,19 @@ def dashboard_stats():
 @app.route('/api/stats/monthly-borrows', methods=['GET'])
 @jwt_required()
 def monthly_borrows_chart():
+    """
+    Reservations per month: `year` for January to December of that year (default: current year),
+    or `range` for the last N months up to the current one.
+    """
+    year = request.args.get('year', type=int)
+    months = request.args.get('range', type=int)
+    if 'year' in request.args and not year:
+        return jsonify({'error': f"Invalid year: {request.args.get('year')}"}), 400
+    if 'range' in request.args and not (months and 0 < months <= MAX_MONTHLY_RANGE):
+        return jsonify({'error': f"range must be a number of months between 1 and {MAX_MONTHLY_RANGE}"}), 400
+
     try:
-        borrows = get_monthly_borrows()
+        borrows = get_monthly_borrows(year=year, months=months)
         return jsonify(borrows), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -28,8 +39,14 @@ def monthly_borrows_chart():
 @app.route('/api/stats/most-borrowed-books', methods=['GET'])
 @jwt_required()
 def most_borrowed():
+    """
+    Most borrowed resources of all time; `limit` (default 5) sets how many.
+    """
+    limit = request.args.get('limit', default=5, type=int)
+    if not 0 < limit <= MAX_TOP_RESOURCES:
+        return jsonify({"success": False, "error": f"limit must be between 1 and {MAX_TOP_RESOURCES}"}), 400
     try:
-        most_borrowed = get_most_borrowed_resources()
+        most_borrowed = get_most_borrowed_resources(limit)
         return jsonify({
             "success": True,
             "data": most_borrowed
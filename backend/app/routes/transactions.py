@@ -5,17 +5,40 @@ Routes related to transactions (borrowing and reservations)
 from flask import jsonify, request
 from app import app
 from flask_jwt_extended import create_access_token,jwt_required, get_jwt_identity
-from app.database import get_transactions, create_reservation, update_reservation, delete_reservation, get_transactions_by_user
+from app.projection import parse_fields
+from app.export import parse_format, export_response
+from app.database import TRANSACTION_FIELDS, get_transactions, iter_transactions, create_reservation, update_reservation, delete_reservation, get_transactions_by_user
 
 @app.route('/api/transactions', methods=['GET'])
 @jwt_required()
 def transactions():
     """
     API endpoint to retrieve all reservations (transactions)
+    Optional `fields` query parameter (comma separated keys) limits the returned keys.
     """
-    transaction_list = get_transactions()
+    try:
+        fields = parse_fields(request.args.get('fields'), TRANSACTION_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    transaction_list = get_transactions(fields)
     return jsonify(transaction_list)
 
+@app.route('/api/transactions/export', methods=['GET'])
+@jwt_required()
+def export_transactions():
+    """
+    Download all transactions as a spreadsheet (`format=csv` or `format=xlsx`, csv by default).
+    Optional `fields` query parameter (comma separated keys) limits the columns.
+    """
+    try:
+        fmt = parse_format(request.args.get('format'))
+        fields = parse_fields(request.args.get('fields'), TRANSACTION_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return export_response(fmt, 'transactions', fields or list(TRANSACTION_FIELDS), iter_transactions(fields))
+
 @app.route('/api/transactions', methods=['POST'])
 @jwt_required()
 def create_transaction_endpoint():
@@ -0,0 +1,262 @@
+"""
+In-process full-text index over the library catalog.
+
+The index maps accent-folded terms to the resources that contain them and
+ranks matches with BM25. It is filled from a paged bulk load of the catalog,
+kept in sync by the resource write functions in database.py, and rebuilt
+periodically so writes made by other processes become searchable too.
+"""
+
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+# Resource columns that are searchable, with the weight given to each field
+INDEXED_FIELDS = {
+    'r_title': 3,
+    'r_author': 2,
+    'r_editor': 1,
+    'r_ISBN': 2,
+    'r_cote': 2,
+    'r_description': 1,
+}
+
+# BM25 tuning constants
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text):
+    """
+    Lowercase a string and strip its accents ("Éducation" -> "education").
+    """
+    if text is None:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    """
+    Split a string into accent-folded alphanumeric terms.
+    """
+    return _TOKEN_RE.findall(fold(text))
+
+
+class CatalogIndex:
+    """
+    Inverted index of resources keyed by r_id.
+    Each indexed document keeps the serialized resource so search results
+    can be returned without going back to the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}      # term -> {r_id: weighted term frequency}
+        self._doc_terms = {}     # r_id -> {term: weighted term frequency}
+        self._doc_length = {}    # r_id -> weighted document length
+        self._documents = {}     # r_id -> serialized resource
+        self._total_length = 0
+        self._sorted_terms = None
+        self._journal = None  # Writes made while a rebuild is loading the catalog
+        self._generation = 0  # Bumped by reset() so a load started before it is discarded
+        self.built = False
+        self.built_at = None
+
+    def fresh(self, max_age):
+        """
+        True when the index was built less than `max_age` seconds ago.
+        """
+        return self.built and time.monotonic() - self.built_at < max_age
+
+    @property
+    def active(self):
+        """
+        True when writes must be applied: the index is built or being built.
+        """
+        return self.built or self._journal is not None
+
+    def build(self, load_rows, serialize):
+        """
+        Replace the whole index with the rows returned by load_rows().
+        Writes made while the rows are loading are replayed on top of them
+        (they may or may not be in the loaded rows).
+        :param load_rows: Callable returning the list of Resource rows (with r_* columns);
+                          it runs without holding the index lock.
+        :param serialize: Function turning a raw row into the API resource dict.
+        :return: Number of rows loaded.
+        """
+        with self._lock:
+            self._journal = []
+            generation = self._generation
+        try:
+            rows = load_rows()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            if generation != self._generation:
+                return len(rows)
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_length = {}
+            self._documents = {}
+            self._total_length = 0
+            for row in rows:
+                self._add(row, serialize(row))
+            journal, self._journal = self._journal or [], None
+            for write in journal:
+                write()
+            self._sorted_terms = None
+            self.built = True
+            self.built_at = time.monotonic()
+        return len(rows)
+
+    def _write(self, write):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(write)
+            write()
+
+    def upsert(self, row, resource):
+        """
+        Insert or replace a single resource in the index.
+        """
+        def write():
+            self._remove(row['r_id'])
+            self._add(row, resource)
+            self._sorted_terms = None
+        self._write(write)
+
+    def remove(self, resource_id):
+        """
+        Remove a resource from the index if it is present.
+        """
+        def write():
+            if self._remove(resource_id):
+                self._sorted_terms = None
+        self._write(write)
+
+    def patch(self, resource_id, changes):
+        """
+        Update non-indexed keys (status, borrow count...) of a stored resource.
+        """
+        def write():
+            resource = self._documents.get(resource_id)
+            if resource is not None:
+                self._documents[resource_id] = {**resource, **changes}
+        self._write(write)
+
+    def reset(self):
+        """
+        Drop the index so the next search rebuilds it.
+        """
+        with self._lock:
+            self.built = False
+            self.built_at = None
+            self._journal = None
+            self._generation += 1
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_length = {}
+            self._documents = {}
+            self._total_length = 0
+            self._sorted_terms = None
+
+    def search(self, query, limit=20):
+        """
+        Return up to `limit` resources matching every term of the query,
+        best BM25 score first. The last query term also matches as a prefix
+        so results stay useful while the user is still typing.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            doc_count = len(self._documents)
+            if doc_count == 0:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores = None
+            for position, term in enumerate(terms):
+                if position == len(terms) - 1:
+                    candidates = self._expand_prefix(term)
+                else:
+                    candidates = [term] if term in self._postings else []
+
+                term_scores = {}
+                for candidate in candidates:
+                    postings = self._postings[candidate]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for resource_id, tf in postings.items():
+                        norm = K1 * (1 - B + B * self._doc_length[resource_id] / avg_length)
+                        score = idf * tf * (K1 + 1) / (tf + norm)
+                        term_scores[resource_id] = max(term_scores.get(resource_id, 0), score)
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {rid: scores[rid] + s for rid, s in term_scores.items() if rid in scores}
+                if not scores:
+                    return []
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [self._documents[resource_id] for resource_id, _ in ranked]
+
+    def _expand_prefix(self, prefix):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        matches = []
+        start = bisect_left(self._sorted_terms, prefix)
+        for term in self._sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def _add(self, row, resource):
+        resource_id = row['r_id']
+        frequencies = {}
+        for field, weight in INDEXED_FIELDS.items():
+            value = row.get(field)
+            terms = tokenize(value)
+            if field == 'r_ISBN' and value:
+                # Also index the ISBN without dashes or spaces
+                compact = ''.join(terms)
+                if compact and compact not in terms:
+                    terms.append(compact)
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + weight
+
+        length = sum(frequencies.values())
+        for term, tf in frequencies.items():
+            self._postings.setdefault(term, {})[resource_id] = tf
+        self._doc_terms[resource_id] = frequencies
+        self._doc_length[resource_id] = length
+        self._documents[resource_id] = resource
+        self._total_length += length
+
+    def _remove(self, resource_id):
+        frequencies = self._doc_terms.pop(resource_id, None)
+        if frequencies is None:
+            return False
+        for term in frequencies:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(resource_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_length.pop(resource_id, 0)
+        self._documents.pop(resource_id, None)
+        return True
+
+
+catalog_index = CatalogIndex()
@@ -0,0 +1,211 @@
+"""
+Cover thumbnails served by /api/covers/<r_id>.
+
+The source image of a cover is downloaded once and stored under its SHA-256
+(content addressing), together with an index from source URL to hash. Resized
+WebP / JPEG thumbnails are rendered from it with Pillow in a worker pool and
+stored next to it as <hash>-<width>.<ext>, so identical images shared by
+several resources are stored and rendered once, and a changed cover URL
+never serves a stale thumbnail. Concurrent requests for the same source or
+thumbnail wait for a single download or render.
+
+The hash also gives a strong, cross-process ETag for the response.
+
+Layout of the cache directory:
+    urls/<sha256 of url>        hash of the image downloaded from that URL
+    <hh>/<hash>                 source image
+    <hh>/<hash>-<width>.<ext>   thumbnails
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+WIDTHS = (80, 160, 240, 320, 480, 640)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def cover_version(image_url, title, author, isbn):
+    """
+    Short hash of the resource fields its cover is derived from. Clients put it
+    in the thumbnail URL (?v=), so a changed cover gets a new URL instead of an
+    image cached by the browser or a CDN for up to COVER_MAX_AGE.
+    """
+    source = '\x1f'.join(str(value or '') for value in (image_url, title, author, isbn))
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+
+
+def snap_width(value):
+    """
+    Smallest supported width >= the requested one, so the cache holds a bounded
+    number of sizes. Raises ValueError for a malformed width.
+    """
+    width = int(value)
+    if width <= 0:
+        raise ValueError(f"Invalid width: {value}")
+    for candidate in WIDTHS:
+        if candidate >= width:
+            return candidate
+    return WIDTHS[-1]
+
+
+def render_thumbnail(source_path, width, fmt, quality):
+    """
+    Resize an image to `width` pixels wide (never upscaled) and encode it.
+    :return: Encoded image bytes.
+    """
+    from PIL import Image
+
+    with Image.open(source_path) as image:
+        image.draft('RGB', (width, width))  # Lets JPEG decoding skip most of the pixels
+        image = image.convert('RGB')
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, FORMATS[fmt][0], quality=quality, optimize=True)
+        return output.getvalue()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class ThumbnailStore:
+    """
+    Content-addressed disk cache of cover images and their thumbnails.
+    """
+
+    def __init__(self, root, workers=2, quality=80, timeout=(3, 10), max_source_bytes=10 * 1024 * 1024,
+                 session=None):
+        """
+        :param root: Cache directory.
+        :param workers: Pillow render threads (Pillow releases the GIL while decoding and resizing).
+        :param timeout: (connect, read) timeout in seconds for downloading source images.
+        :param max_source_bytes: Larger source images are rejected.
+        """
+        self.root = root
+        self.quality = quality
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self.session = session or requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _path(self, digest, suffix=''):
+        return os.path.join(self.root, digest[:2], digest + suffix)
+
+    def source_digest(self, url):
+        """
+        Hash of the image at `url`, downloading and storing it the first time.
+        """
+        index = os.path.join(self.root, 'urls', hashlib.sha256(url.encode('utf-8')).hexdigest())
+        try:
+            with open(index) as f:
+                digest = f.read().strip()
+            if os.path.exists(self._path(digest)):
+                return digest
+        except FileNotFoundError:
+            pass
+        return self._once(index, lambda: self._store_source(url, index))
+
+    def _store_source(self, url, index):
+        data = self._download(url)
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self._path(digest)):
+            _write_atomic(self._path(digest), data)
+        _write_atomic(index, digest.encode('ascii'))
+        return digest
+
+    def _download(self, url):
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > self.max_source_bytes:
+                    raise ValueError(f"Cover image larger than {self.max_source_bytes} bytes: {url}")
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+    def thumbnail(self, url, width, fmt='webp'):
+        """
+        Path of the thumbnail of the image at `url`, rendering it if needed.
+        :param width: One of WIDTHS (see snap_width).
+        :param fmt: 'webp' or 'jpeg'.
+        :return: (path, etag)
+        """
+        digest = self.source_digest(url)
+        path = self._path(digest, f'-{width}.{fmt}')
+        etag = f'{digest[:24]}-{width}-{fmt}'
+        if os.path.exists(path):
+            return path, etag
+
+        self._once(path, lambda: self._executor.submit(self._render, digest, path, width, fmt).result())
+        return path, etag
+
+    def _once(self, key, fn):
+        """
+        Run fn() for `key`, or wait for the result of the call already running for it.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if owner:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        return future.result()
+
+    def _render(self, digest, path, width, fmt):
+        if not os.path.exists(path):
+            _write_atomic(path, render_thumbnail(self._path(digest), width, fmt, self.quality))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_thumbnail_store():
+    """
+    Return the process-wide thumbnail store, created on first use.
+
+    Reads THUMBNAIL_CACHE_DIR (default thumbnail_cache in the system temporary
+    directory, the only writable place on Vercel), THUMBNAIL_WORKERS (default 2)
+    and THUMBNAIL_QUALITY (default 80).
+    """
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            _store = ThumbnailStore(
+                os.getenv('THUMBNAIL_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'thumbnail_cache')),
+                workers=int(os.getenv('THUMBNAIL_WORKERS', 2)),
+                quality=int(os.getenv('THUMBNAIL_QUALITY', 80)),
+            )
+    return _store
@@ -0,0 +1,31 @@
+"""
+Conditional GET support (ETag / If-None-Match) for read endpoints.
+
+The ETag is a hash of the response body, so it only depends on the data the
+response was built from: every server instance produces the same tag for the
+same data, and a write made by another instance, the Supabase dashboard or a
+script changes the tag of the next response. A matching If-None-Match is
+answered with 304 Not Modified and no body, which saves the transfer and the
+client's JSON parsing; the view itself still runs.
+"""
+
+from functools import wraps
+
+from flask import request, make_response
+
+
+def conditional_get(view):
+    """
+    Decorator for GET endpoints: tag 200 responses with a strong ETag of their body
+    and answer a matching If-None-Match with 304.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        response.add_etag()
+        # Let browsers keep the body but always revalidate it
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    return wrapper
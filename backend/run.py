@@ -1,7 +1,10 @@
 from app import app
-from app.database import mark_late_reservations
+from app.database import mark_late_reservations, start_overdue_scheduler
+from app.email_service import start_email_outbox
 
 if __name__ == '__main__':
+    start_email_outbox()
     print("Running mark_late_reservations on backend startup...")
     mark_late_reservations()
+    start_overdue_scheduler()
     app.run()
@@ -0,0 +1,13 @@
+import os
+import sys
+import types
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The helper modules under test don't need the Flask app or Supabase: register the
+# `app` package without running app/__init__.py, so `app.<module>` imports resolve
+# straight to the files.
+if 'app' not in sys.modules:
+    package = types.ModuleType('app')
+    package.__path__ = [os.path.join(BACKEND_DIR, 'app')]
+    sys.modules['app'] = package
@@ -0,0 +1,121 @@
+import threading
+from datetime import date
+
+from app.borrow_stats import MonthlyBorrowCounts, TopBorrowed, TrendingBorrows, last_months, month_key
+
+
+class BlockingLoad:
+    """
+    Loader that waits until the test releases it, to simulate writes landing
+    while the view is reading the database.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return list(self.rows)
+
+
+def test_month_helpers():
+    assert month_key('2025-03-14T10:00:00') == (2025, 3)
+    assert month_key(None) is None
+    assert month_key('garbage') is None
+    assert last_months(3, now=type('t', (), {'tm_year': 2025, 'tm_mon': 2})) == [(2024, 12), (2025, 1), (2025, 2)]
+
+
+def test_monthly_counts_apply_writes():
+    counts = MonthlyBorrowCounts(lambda: [
+        {'res_id': 1, 'res_date': '2025-01-10', 'res_type': 1},
+        {'res_id': 2, 'res_date': '2025-01-12', 'res_type': 1},
+    ])
+    counts.monthly([(2025, 1)])
+    counts.record(3, '2025-01-20', 1)
+    counts.retype([1], 3)
+    counts.remove(2)
+    counts.record(3, '2025-02-01', 1)  # Date changed: moves to the next month
+
+    january, february = counts.monthly([(2025, 1), (2025, 2)], res_types={1, 3})
+    assert january['by_type'] == {'3': 1}
+    assert january['borrows'] == 1
+    assert february['borrows'] == 1
+
+
+def test_writes_during_a_load_are_replayed():
+    load = BlockingLoad([{'res_id': 1, 'res_date': '2025-01-10', 'res_type': 1}])
+    counts = MonthlyBorrowCounts(load)
+    result = []
+    reader = threading.Thread(target=lambda: result.append(counts.monthly([(2025, 1)])))
+    reader.start()
+    load.started.wait(5)
+
+    # Neither write is in the rows being loaded
+    counts.record(2, '2025-01-11', 1)
+    counts.remove(1)
+    load.release.set()
+    reader.join()
+
+    assert result[0][0]['borrows'] == 1
+    assert counts.monthly([(2025, 1)])[0]['borrows'] == 1
+    assert load.calls == 1
+
+
+def test_replay_is_idempotent_when_the_load_already_has_the_write():
+    load = BlockingLoad([
+        {'res_id': 1, 'res_date': '2025-01-10', 'res_type': 1},
+        {'res_id': 2, 'res_date': '2025-01-11', 'res_type': 1},
+    ])
+    counts = MonthlyBorrowCounts(load)
+    reader = threading.Thread(target=lambda: counts.monthly([(2025, 1)]))
+    reader.start()
+    load.started.wait(5)
+    counts.record(2, '2025-01-11', 1)  # Committed before the load read it
+    load.release.set()
+    reader.join()
+
+    assert counts.monthly([(2025, 1)])[0]['borrows'] == 2
+
+
+def test_failed_load_stops_journaling():
+    def fail():
+        raise RuntimeError('database down')
+
+    counts = MonthlyBorrowCounts(fail)
+    try:
+        counts.monthly([(2025, 1)])
+    except RuntimeError:
+        pass
+    counts.record(1, '2025-01-10', 1)
+    assert counts._journal is None
+
+
+def test_top_borrowed_keeps_the_largest_counts():
+    top = TopBorrowed(lambda n: [
+        {'r_id': 1, 'r_num_of_borrows': 5},
+        {'r_id': 2, 'r_num_of_borrows': 3},
+    ], capacity=2)
+    top.update({'r_id': 3, 'r_num_of_borrows': 1})
+    assert [row['r_id'] for row in top.top(10)] == [1, 2]
+
+    top.update({'r_id': 3, 'r_num_of_borrows': 4})
+    assert [row['r_id'] for row in top.top(10)] == [1, 3]
+
+
+def test_trending_counts_each_borrow_once():
+    trending = TrendingBorrows(lambda since: [], half_life_days=7)
+    today = date.today().isoformat()
+    trending.top(5)
+    trending.record(1, 10, today)
+    trending.record(1, 10, today)
+    trending.record(2, 20, today)
+    trending.record(3, 20, today)
+
+    ranked = trending.top(5)
+    assert [resource_id for resource_id, _ in ranked] == [20, 10]
+    assert round(ranked[1][1]) == 1
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from app.cache import LRUCache, TTLCache
+
+
+def test_ttl_cache_loads_once_until_expiry():
+    cache = TTLCache(ttl=0.05)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_load('k', load) == 1
+    assert cache.get_or_load('k', load) == 1
+    time.sleep(0.06)
+    assert cache.get_or_load('k', load) == 2
+
+
+def test_ttl_cache_does_not_cache_loader_errors():
+    cache = TTLCache()
+
+    def fail():
+        raise RuntimeError('database down')
+
+    try:
+        cache.get_or_load('k', fail)
+    except RuntimeError:
+        pass
+    assert cache.get_or_load('k', lambda: 'ok') == 'ok'
+
+
+def test_ttl_cache_drops_a_load_that_raced_an_invalidation():
+    cache = TTLCache()
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        loading.set()
+        release.wait(5)
+        return 'old'
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(cache.get_or_load('k', slow_load)))
+    thread.start()
+    loading.wait(5)
+    # A write lands while the old value is being read
+    cache.invalidate('k')
+    release.set()
+    thread.join()
+
+    assert result == ['old']
+    assert cache.get_or_load('k', lambda: 'new') == 'new'
+
+
+def test_ttl_cache_clear_also_drops_in_flight_loads():
+    cache = TTLCache()
+    cache.get_or_load('k', lambda: 'cached')
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        loading.set()
+        release.wait(5)
+        return 'old'
+
+    cache.invalidate('k')
+    thread = threading.Thread(target=lambda: cache.get_or_load('k', slow_load))
+    thread.start()
+    loading.wait(5)
+    cache.get_or_load('other', lambda: 1)
+    cache.clear()
+    release.set()
+    thread.join()
+
+    assert cache.get_or_load('k', lambda: 'new') == 'new'
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    assert cache.get(1) == 'a'
+    cache.set(3, 'c')
+
+    assert cache.get(2) is None
+    assert cache.get(1) == 'a'
+    assert cache.get(3) == 'c'
+
+
+def test_lru_cache_entries_expire():
+    cache = LRUCache(maxsize=2, ttl=0.05)
+    cache.set(1, 'a')
+    assert cache.get(1) == 'a'
+    time.sleep(0.06)
+    assert cache.get(1) is None
+    assert len(cache) == 0
@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.covers import CoverCache, CoverResolver
+
+
+class BooksStub:
+    """
+    Local stand-in for the Google Books volumes API.
+    `covers` maps a query string to a thumbnail URL (missing: no items).
+    """
+
+    def __init__(self):
+        self.covers = {}
+        self.queries = []
+        self.status = 200
+        self.delay = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)['q'][0]
+                with stub._lock:
+                    stub.queries.append(query)
+                time.sleep(stub.delay)
+                if stub.status != 200:
+                    self.send_response(stub.status)
+                    self.end_headers()
+                    return
+                thumbnail = stub.covers.get(query)
+                items = [{'volumeInfo': {'imageLinks': {'thumbnail': thumbnail}}}] if thumbnail else []
+                body = json.dumps({'items': items}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/volumes'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = BooksStub()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def resolver(stub, tmp_path):
+    return CoverResolver(CoverCache(str(tmp_path / 'covers.sqlite3')), api_url=stub.url, timeout=(2, 5))
+
+
+def test_cache_hit_skips_upstream(stub, resolver):
+    stub.covers['isbn:9782070368228'] = 'http://covers/etranger.jpg'
+
+    assert resolver.resolve(isbn='978-2-07-036822-8') == 'http://covers/etranger.jpg'
+    assert resolver.resolve(isbn='9782070368228') == 'http://covers/etranger.jpg'
+
+    assert stub.queries == ['isbn:9782070368228']
+    assert resolver.stats['hits'] == 1
+
+
+def test_no_cover_answer_is_cached(stub, resolver):
+    assert resolver.resolve('Unknown Book', 'Nobody') is None
+    assert resolver.resolve('  unknown   book ', 'NOBODY') is None
+
+    assert stub.queries == ['intitle:Unknown Book inauthor:Nobody']
+
+
+def test_expired_no_cover_answer_is_looked_up_again(stub, tmp_path):
+    cache = CoverCache(str(tmp_path / 'covers.sqlite3'), negative_ttl=0)
+    resolver = CoverResolver(cache, api_url=stub.url)
+
+    resolver.resolve('Unknown Book')
+    time.sleep(0.01)
+    resolver.resolve('Unknown Book')
+
+    assert len(stub.queries) == 2
+
+
+def test_concurrent_lookups_are_coalesced(stub, resolver):
+    stub.covers['intitle:Le Petit Prince inauthor:Saint-Exupéry'] = 'http://covers/prince.jpg'
+    stub.delay = 0.3
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(resolver.resolve('Le Petit Prince', 'Saint-Exupéry')))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['http://covers/prince.jpg'] * 8
+    assert len(stub.queries) == 1
+    assert resolver.stats['coalesced'] == 7
+
+
+def test_upstream_errors_are_not_cached(stub, resolver):
+    stub.status = 503
+    assert resolver.resolve(isbn='2070368228') is None
+    assert resolver.stats['errors'] == 1
+
+    stub.status = 200
+    stub.covers['isbn:2070368228'] = 'http://covers/etranger.jpg'
+    assert resolver.resolve(isbn='2070368228') == 'http://covers/etranger.jpg'
+    assert len(stub.queries) == 2
+
+
+def test_resolve_many_keeps_order(stub, resolver):
+    stub.covers['isbn:1'] = 'http://covers/1.jpg'
+    stub.covers['isbn:3'] = 'http://covers/3.jpg'
+
+    books = [{'isbn': '1'}, {'isbn': '2'}, {'isbn': '3'}, {'title': ''}]
+    assert resolver.resolve_many(books) == ['http://covers/1.jpg', None, 'http://covers/3.jpg', None]
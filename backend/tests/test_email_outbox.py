@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from app.email_outbox import DEAD, PENDING, SENDING, SENT, EmailOutbox
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'outbox.sqlite3')
+
+
+def make_outbox(path, handler, **kwargs):
+    options = {'workers': 2, 'rate_per_minute': 0, 'base_delay': 0}
+    options.update(kwargs)
+    return EmailOutbox(path, {'notice': handler}, **options)
+
+
+def status_of(outbox, message_id):
+    return outbox._db.execute("SELECT status FROM outbox WHERE id = ?", (message_id,)).fetchone()[0]
+
+
+def test_two_outboxes_on_one_file_deliver_each_message_once(path):
+    delivered = Counter()
+    lock = threading.Lock()
+
+    def handler(payload):
+        with lock:
+            delivered[payload['n']] += 1
+        return {'success': True}
+
+    first = make_outbox(path, handler, workers=3)
+    second = make_outbox(path, handler, workers=3)
+    for n in range(200):
+        (first if n % 2 else second).enqueue('notice', {'n': n})
+    try:
+        assert wait_until(lambda: sum(delivered.values()) >= 200)
+        time.sleep(0.2)
+    finally:
+        first.stop()
+        second.stop()
+
+    assert sorted(delivered) == list(range(200))
+    assert set(delivered.values()) == {1}
+    assert first.stats()['by_status'][SENT] == 200
+
+
+def test_failing_message_is_retried_then_dead_lettered(path):
+    attempts = []
+
+    def handler(payload):
+        attempts.append(payload)
+        return {'success': False, 'message': 'mailbox unavailable'}
+
+    outbox = make_outbox(path, handler, workers=1, max_attempts=3)
+    message_id = outbox.enqueue('notice', {'to': 'reader@example.com'})
+    try:
+        assert wait_until(lambda: status_of(outbox, message_id) == DEAD)
+    finally:
+        outbox.stop()
+
+    assert len(attempts) == 3
+    assert outbox.dead_letters()[0]['last_error'] == 'mailbox unavailable'
+    assert outbox.stats_counters == {'delivered': 0, 'retried': 2, 'dead_lettered': 1}
+
+
+def test_handler_exception_counts_as_a_failed_attempt(path):
+    calls = []
+
+    def handler(payload):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError('SMTP down')
+        return {'success': True}
+
+    outbox = make_outbox(path, handler, workers=1)
+    message_id = outbox.enqueue('notice', {})
+    try:
+        assert wait_until(lambda: status_of(outbox, message_id) == SENT)
+    finally:
+        outbox.stop()
+    assert len(calls) == 2
+
+
+def test_only_expired_leases_are_reclaimed(path):
+    outbox = make_outbox(path, lambda payload: {'success': True}, lease_timeout=60)
+    now = time.time()
+    with outbox._db_lock:
+        for message_id, updated_at in ((1, now - 120), (2, now - 10)):
+            outbox._db.execute(
+                "INSERT INTO outbox (id, kind, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, 'notice', '{}', ?, ?, ?, ?)", (message_id, SENDING, now, now, updated_at)
+            )
+        outbox._reclaim_expired()
+
+    assert status_of(outbox, 1) == PENDING
+    assert status_of(outbox, 2) == SENDING
+
+
+def test_claim_skips_a_message_claimed_by_another_process(path):
+    outbox = make_outbox(path, lambda payload: {'success': True})
+    other = make_outbox(path, lambda payload: {'success': True})
+    now = time.time()
+    with outbox._db_lock:
+        for message_id in (1, 2):
+            outbox._db.execute(
+                "INSERT INTO outbox (id, kind, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, 'notice', '{}', ?, ?, ?, ?)", (message_id, PENDING, now - 1, now, now)
+            )
+
+    first, _ = outbox._claim()
+    second, _ = other._claim()
+    third, wait = outbox._claim()
+
+    assert {first[0], second[0]} == {1, 2}
+    assert third is None and wait is None
+
+
+def test_future_message_reports_the_wait(path):
+    outbox = make_outbox(path, lambda payload: {'success': True})
+    now = time.time()
+    outbox._db.execute(
+        "INSERT INTO outbox (kind, payload, status, next_attempt_at, created_at, updated_at) "
+        "VALUES ('notice', '{}', ?, ?, ?, ?)", (PENDING, now + 30, now, now)
+    )
+    row, wait = outbox._claim()
+    assert row is None
+    assert 25 < wait <= 30
+
+
+def test_unknown_kind_is_rejected(path):
+    outbox = make_outbox(path, lambda payload: {'success': True})
+    with pytest.raises(ValueError):
+        outbox.enqueue('sms', {})
@@ -0,0 +1,28 @@
+import pytest
+
+from app.pagination import decode_cursor, encode_cursor, parse_int_param, parse_limit
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor({'id': 42, 'date': '2024-09-01'})) == {'id': 42, 'date': '2024-09-01'}
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+
+def test_parse_limit_clamps():
+    assert parse_limit(None) == 50
+    assert parse_limit('0') == 1
+    assert parse_limit('1000') == 200
+    with pytest.raises(ValueError):
+        parse_limit('ten')
+
+
+def test_parse_int_param():
+    assert parse_int_param(None, 'type') is None
+    assert parse_int_param('', 'type') is None
+    assert parse_int_param('3', 'type') == 3
+    with pytest.raises(ValueError, match='status must be an integer'):
+        parse_int_param('available', 'status')
@@ -0,0 +1,81 @@
+from app.resource_import import normalize_identifier, validate_records
+
+
+def record(**overrides):
+    values = {
+        "inventoryNum": "INV-1", "title": "L'Étranger", "author": "Camus", "editor": "Gallimard",
+        "ISBN": "978-2-07-036002-4", "price": 1200, "cote": "843 CAM", "receivingDate": "2024-09-01",
+        "status": "Available", "observation": "", "type": 1, "description": "",
+    }
+    values.update(overrides)
+    return values
+
+
+def test_valid_record_becomes_a_resource_row():
+    rows, errors, duplicates = validate_records([record()])
+
+    assert errors == [] and duplicates == []
+    row_number, row = rows[0]
+    assert row_number == 2
+    assert row["r_title"] == "L'Étranger"
+    assert row["r_ISBN"] == "978-2-07-036002-4"
+    assert row["r_status"] == 1 and row["r_type"] == 1 and row["r_price"] == 1200
+    assert row["r_rfid"] is None
+
+
+def test_first_failing_check_is_reported_per_row():
+    rows, errors, _ = validate_records([
+        record(inventoryNum="A", title="  "),
+        record(inventoryNum="B", status="lost"),
+        record(inventoryNum="C", type="Roman"),
+        record(inventoryNum="D", price="cheap"),
+        record(inventoryNum="E", status="unavailable", price=None),
+    ])
+
+    assert errors == [
+        (2, "Title is required"),
+        (3, "Invalid status: lost. Expected: Available or Unavailable"),
+        (4, "Type must be a resource type ID number, not a text name"),
+        (5, "Invalid price format: cheap"),
+    ]
+    assert [(number, row["r_status"], row["r_price"]) for number, row in rows] == [(6, 0, 0)]
+
+
+def test_blank_lines_are_skipped():
+    blank = {column: "" for column in record()}
+    rows, errors, _ = validate_records([blank, record()], first_row=10)
+    assert errors == []
+    assert [number for number, _ in rows] == [11]
+
+
+def test_spreadsheet_floats_read_as_whole_numbers():
+    rows, _, _ = validate_records([record(inventoryNum=1234.0, cote=12.5)])
+    assert rows[0][1]["r_inventoryNum"] == "1234"
+    assert rows[0][1]["r_cote"] == "12.5"
+
+
+def test_duplicates_against_the_catalog_and_the_file():
+    existing = {"inventoryNum": {"INV-1"}, "ISBN": {normalize_identifier("ISBN", "978 2 07 036002 4")}}
+    rows, errors, duplicates = validate_records([
+        record(),                                            # inventoryNum and ISBN in the catalog
+        record(inventoryNum="INV-2", ISBN="111"),
+        record(inventoryNum="INV-2", ISBN="111"),            # same file: rejected, ISBN only reported
+    ], existing=existing)
+
+    assert errors == [(2, "Duplicate inventoryNum: already in the catalog"),
+                      (4, "Duplicate inventoryNum: already in this file")]
+    assert [number for number, _ in rows] == [3]
+    assert sorted((d['row'], d['field'], d['existing']) for d in duplicates) == [
+        (2, "ISBN", "catalog"), (2, "inventoryNum", "catalog"),
+        (4, "ISBN", "row 3"), (4, "inventoryNum", "row 3"),
+    ]
+
+
+def test_duplicates_across_batches_share_seen():
+    seen = {}
+    validate_records([record(inventoryNum="X", ISBN="")], first_row=2, seen=seen)
+    rows, errors, duplicates = validate_records([record(inventoryNum=" X ", ISBN="")], first_row=3, seen=seen)
+
+    assert rows == []
+    assert errors == [(3, "Duplicate inventoryNum: already in this file")]
+    assert duplicates == [{'row': 3, 'field': 'inventoryNum', 'value': 'X', 'existing': 'row 2'}]